@@ -33,6 +33,19 @@ class Settings(BaseSettings):
     SCOPUS_API_KEY: str
     SCOPUS_API_BASE_URL: str = "https://api.elsevier.com/content"
     
+    # Connection graph cache (per worker process)
+    CONNECTION_CACHE_TTL_SECONDS: int = 60
+    CONNECTION_CACHE_MAX_USERS: int = 10000
+    
+    # In-memory social graph (per worker process)
+    SOCIAL_GRAPH_RELOAD_SECONDS: int = 300
+    
+    # WebSocket broadcast and presence backplane: "memory" (single worker) or "postgres" (LISTEN/NOTIFY across workers)
+    WEBSOCKET_BACKPLANE: str = "memory"
+    
+    # Outbound frames queued per WebSocket before the client is evicted as too slow
+    WEBSOCKET_SEND_QUEUE_SIZE: int = 256
+    
     # Application
     APP_NAME: str = "Academic Platform API"
     APP_VERSION: str = "1.0.0"
@@ -109,28 +109,10 @@ def require_2fa_configured(
     return current_user
 
 
-def get_current_user_websocket(token: str, db: Session) -> Optional[User]:
-    """Get current user from JWT token (for WebSocket connections)"""
-    from sqlalchemy.orm import joinedload
-    
+def get_user_id_websocket(token: str) -> Optional[int]:
+    """Verify a WebSocket access token and return its user ID, without touching the database"""
     try:
         payload = AuthService.verify_token(token, token_type="access")
-        user_id: int = AuthService.get_user_id_from_token(payload)
-        
-        if user_id is None:
-            return None
-        
-        user = db.query(User).options(
-            joinedload(User.university),
-            joinedload(User.etablissement),
-            joinedload(User.departement),
-            joinedload(User.laboratoire),
-            joinedload(User.equipe),
-            joinedload(User.specialite),
-            joinedload(User.thematiqueDeRecherche),
-            joinedload(User.googleScholarIntegration)
-        ).filter(User.id == user_id).first()
-        
-        return user
-    except Exception:
-        return None
\ No newline at end of file
+    except HTTPException:
+        return None
+    return AuthService.get_user_id_from_token(payload)
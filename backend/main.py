@@ -7,7 +7,11 @@ from starlette.middleware.base import BaseHTTPMiddleware
 from starlette.requests import Request
 from starlette.middleware.trustedhost import TrustedHostMiddleware
 from config import settings
-from routes import auth_routes, admin_routes, cv_routes ,connection_routes, chat_routes, google_scholar_routes, post_routes, projet_routes, upload_routes, websocket_routes, scopus_routes
+from services.message_ingest import message_ingest
+from services.presence_service import presence
+from services.websocket_manager import manager
+from services.backplane import create_backplane
+from routes import auth_routes, admin_routes, cv_routes ,connection_routes, chat_routes, google_scholar_routes, post_routes, projet_routes, upload_routes, websocket_routes, scopus_routes, badge_routes
 from collections import defaultdict
 from time import time
 from fastapi import HTTPException, status
@@ -101,6 +105,20 @@ async def global_exception_handler(request: Request, exc: Exception):
         content={"detail": "An unexpected error occurred. Please try again later."}
     )
 
+@app.on_event("startup")
+async def start_websocket_backplane():
+    """Share WebSocket broadcasts between workers (see WEBSOCKET_BACKPLANE)"""
+    await manager.start_backplane(create_backplane(settings.WEBSOCKET_BACKPLANE))
+    await presence.start()
+
+
+@app.on_event("shutdown")
+async def stop_websocket_services():
+    """Store chat messages still queued by WebSocket clients, then leave the backplane"""
+    await message_ingest.stop()
+    await presence.stop()
+    await manager.stop_backplane()
+
 app.include_router(auth_routes.router)
 app.include_router(admin_routes.router)
 app.include_router(cv_routes.router)
@@ -112,6 +130,7 @@ app.include_router(post_routes.router)
 app.include_router(projet_routes.router)
 app.include_router(upload_routes.router)
 app.include_router(websocket_routes.router)
+app.include_router(badge_routes.router)
 
 @app.get("/")
 def root():
@@ -2,11 +2,11 @@ from database import Base
 
 
 from models.associations import user_thematique_association, user_specialite_association
-from models.user import User, Projet, UserType
+from models.user import User, Projet, UserType, UserBadges
 from models.organisation import University, Etablissement, Departement, Laboratoire,ThematiqueDeRecherche, Specialite, Equipe
 from models.google_scholar import GoogleScholarIntegration, Publication
 from models.scopus import ScopusIntegration, ScopusPublication
 from models.cv import CV,Contact,Competence,Formation,Langue,Experience
 from models.chat import Chat, Message
 from models.connection import Connection
-from models.post import Post, Comment, Reaction
\ No newline at end of file
+from models.post import Post, Comment, Reaction, TimelineEntry, PostCounters, CommentCounters
\ No newline at end of file
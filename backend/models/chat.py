@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer,ForeignKey, Text,DateTime
+from sqlalchemy import Column, Integer,ForeignKey, Text,DateTime, Index
 from sqlalchemy.orm import relationship
 from models import Base
 from datetime import datetime,timezone
@@ -6,6 +6,10 @@ from datetime import datetime,timezone
 
 class Chat(Base):
     __tablename__ = "chats"
+    __table_args__ = (
+        # user1Id is always the smaller user ID, so (user1Id, user2Id) is the canonical pair key
+        Index("uq_chats_pair", "user1Id", "user2Id", unique=True),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     
@@ -13,23 +17,51 @@ class Chat(Base):
     user1Id = Column(Integer, ForeignKey("users.id"), nullable=False)
     user2Id = Column(Integer, ForeignKey("users.id"), nullable=False)
 
+    # Read watermarks: the newest message ID each participant has read
+    user1LastReadMessageId = Column(Integer, nullable=False, default=0, server_default="0")
+    user2LastReadMessageId = Column(Integer, nullable=False, default=0, server_default="0")
+
+    # Sequence number of the newest message; each message takes the next one
+    lastSeq = Column(Integer, nullable=False, default=0, server_default="0")
+
     user1 = relationship("User", foreign_keys=[user1Id], back_populates="chatsAsUser1")
     user2 = relationship("User", foreign_keys=[user2Id], back_populates="chatsAsUser2")
     messages = relationship("Message", back_populates="chat", cascade="all, delete-orphan")
 
+    def last_read_message_id(self, user_id: int) -> int:
+        """Return the read watermark of a participant"""
+        if user_id == self.user1Id:
+            return self.user1LastReadMessageId or 0
+        return self.user2LastReadMessageId or 0
+
 
 class Message(Base):
     __tablename__ = "messages"
+    __table_args__ = (
+        # Backs per-chat history and the inbox's last-activity lookups
+        Index("ix_messages_chat_timestamp", "chatId", "timestamp"),
+        # Backs id-cursor pagination of chat history
+        Index("ix_messages_chat_id", "chatId", "id"),
+        # Per-chat sequence numbers, used to replay missed messages on reconnect
+        Index("uq_messages_chat_seq", "chatId", "seq", unique=True),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     content = Column(Text, nullable=False)
     attachment = Column(Text, nullable=True)
-    is_read = Column(Integer, default=0)  # 0 = unread, 1 = read
     timestamp = Column(DateTime,default=datetime.now(timezone.utc))
+    seq = Column(Integer, nullable=False)  # 1, 2, 3... within the chat, assigned by ChatService.reserve_seqs
 
     #Relationships
     chatId = Column(Integer, ForeignKey("chats.id"), nullable=False)
     senderId = Column(Integer, ForeignKey("users.id"), nullable=False)
 
     chat = relationship("Chat", back_populates="messages")
-    sender = relationship("User", back_populates="messagesSent")
\ No newline at end of file
+    sender = relationship("User", back_populates="messagesSent")
+
+    @property
+    def is_read(self) -> int:
+        """1 once the recipient's read watermark has reached this message, else 0"""
+        chat = self.chat
+        recipient_id = chat.user2Id if self.senderId == chat.user1Id else chat.user1Id
+        return int(self.id is not None and self.id <= chat.last_read_message_id(recipient_id))
\ No newline at end of file
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer,ForeignKey, Text,DateTime,Enum
+from sqlalchemy import Column, Integer,ForeignKey, Text,DateTime,Enum, Index
 import enum
 from sqlalchemy.orm import relationship
 from models import Base
@@ -14,6 +14,11 @@ class ConnectionStatus(str, enum.Enum):
 
 class Connection(Base):
     __tablename__ = "connections"
+    __table_args__ = (
+        # At most one row per pair of users, whoever sent the request
+        Index("uq_connections_pair", "lowUserId", "highUserId", unique=True),
+        Index("ix_connections_high_user", "highUserId"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     status = Column(Enum(ConnectionStatus), nullable=False)
@@ -23,6 +28,14 @@ class Connection(Base):
     # Relationships
     senderId = Column(Integer, ForeignKey("users.id"), nullable=False)
     receiverId = Column(Integer, ForeignKey("users.id"), nullable=False)
+    # Canonical, direction-free pair key: (min(senderId, receiverId), max(senderId, receiverId))
+    lowUserId = Column(Integer, ForeignKey("users.id"), nullable=False)
+    highUserId = Column(Integer, ForeignKey("users.id"), nullable=False)
 
     sender = relationship("User", foreign_keys=[senderId], back_populates="connectionsSent")
-    receiver = relationship("User", foreign_keys=[receiverId], back_populates="connectionsReceived")
\ No newline at end of file
+    receiver = relationship("User", foreign_keys=[receiverId], back_populates="connectionsReceived")
+
+    @staticmethod
+    def pair_key(user1_id: int, user2_id: int):
+        """Return the (lowUserId, highUserId) key of a pair of users"""
+        return min(user1_id, user2_id), max(user1_id, user2_id)
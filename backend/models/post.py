@@ -1,4 +1,4 @@
-from sqlalchemy import Boolean, Column, Integer,ForeignKey, String, Text,DateTime,Enum
+from sqlalchemy import Boolean, Column, Integer,ForeignKey, String, Text,DateTime,Enum, Index
 import enum
 from sqlalchemy.orm import relationship
 from models import Base
@@ -15,8 +15,22 @@ class ReactionType(str, enum.Enum):
     DISLIKE = "dislike"
 
 
+class ReactionCountersMixin:
+    """One counter column per ReactionType, named "<type>Count" """
+    likeCount = Column(Integer, nullable=False, default=0, server_default="0")
+    loveCount = Column(Integer, nullable=False, default=0, server_default="0")
+    funnyCount = Column(Integer, nullable=False, default=0, server_default="0")
+    angryCount = Column(Integer, nullable=False, default=0, server_default="0")
+    sadCount = Column(Integer, nullable=False, default=0, server_default="0")
+    dislikeCount = Column(Integer, nullable=False, default=0, server_default="0")
+
+
 class Post(Base):
     __tablename__ = "posts"
+    __table_args__ = (
+        # Serves keyset pagination of the feed ordered by (timestamp, id)
+        Index("ix_posts_timestamp_id", "timestamp", "id"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
 
@@ -37,8 +51,34 @@ class Post(Base):
     scopusPublication = relationship("ScopusPublication", foreign_keys=[scopusPublicationId])
 
 
+# Serves the public half of the feed, which is read straight from posts
+Index(
+    "ix_posts_public_timestamp_id",
+    Post.timestamp,
+    Post.id,
+    postgresql_where=Post.isPublic == True
+)
+
+
+class TimelineEntry(Base):
+    """Materialized home timeline: one row per post delivered to a user's feed"""
+    __tablename__ = "timeline_entries"
+    __table_args__ = (
+        Index("ix_timeline_entries_user_timestamp_post", "userId", "timestamp", "postId"),
+    )
+
+    userId = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    postId = Column(Integer, ForeignKey("posts.id", ondelete="CASCADE"), primary_key=True)
+    # Copy of Post.timestamp so the feed can be range-scanned without touching posts
+    timestamp = Column(DateTime, nullable=False)
+
+
 class Comment(Base):
     __tablename__ = "comments"
+    __table_args__ = (
+        # Serves keyset pagination of a post's comments ordered by (timestamp, id)
+        Index("ix_comments_post_timestamp_id", "postId", "timestamp", "id"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     content = Column(Text, nullable=False)
@@ -68,3 +108,18 @@ class Reaction(Base):
     post = relationship("Post", back_populates="reactions")
     user = relationship("User", back_populates="reactions")
     comment = relationship("Comment", back_populates="reactions")
+
+
+class PostCounters(ReactionCountersMixin, Base):
+    """Engagement counters of a post, maintained on write by CounterService"""
+    __tablename__ = "post_counters"
+
+    postId = Column(Integer, ForeignKey("posts.id", ondelete="CASCADE"), primary_key=True)
+    commentCount = Column(Integer, nullable=False, default=0, server_default="0")
+
+
+class CommentCounters(ReactionCountersMixin, Base):
+    """Reaction counters of a comment, maintained on write by CounterService"""
+    __tablename__ = "comment_counters"
+
+    commentId = Column(Integer, ForeignKey("comments.id", ondelete="CASCADE"), primary_key=True)
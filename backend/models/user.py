@@ -88,3 +88,12 @@ class Projet(Base):
     user = relationship("User", back_populates="projets")
 
 
+
+
+class UserBadges(Base):
+    """Per-user badge counters, maintained on write by BadgeService"""
+    __tablename__ = "user_badges"
+
+    userId = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    unreadMessages = Column(Integer, nullable=False, default=0, server_default="0")
+    pendingConnections = Column(Integer, nullable=False, default=0, server_default="0")
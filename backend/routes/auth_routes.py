@@ -25,6 +25,7 @@ from dependencies import get_current_user, get_current_active_user
 from models.user import User, UserType
 from models.organisation import Specialite, ThematiqueDeRecherche
 from services.file_utils import delete_file_from_url
+from services.recommendation_service import people_recommender
 
 router = APIRouter(prefix="/auth", tags=["Authentication"])
 
@@ -309,6 +310,7 @@ def complete_profile(
     current_user.profile_completed = True
     db.commit()
     db.refresh(current_user)
+    people_recommender.refresh_user(db, current_user.id)
 
     return user_to_response(current_user)
 
@@ -0,0 +1,14 @@
+from fastapi import APIRouter, Depends
+from sqlalchemy.orm import Session
+
+from dependencies import get_db, get_current_user
+from services.badge_service import BadgeService
+from schemas.badge_schemas import BadgesResponse
+from models.user import User
+
+router = APIRouter(prefix="/me", tags=["me"])
+
+@router.get("/badges", response_model=BadgesResponse)
+def get_badges(db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+    """Get the current user's unread-message and pending-connection counts"""
+    return BadgeService.get_badges(db, current_user.id)
@@ -1,6 +1,6 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 from pathlib import Path
 
 from dependencies import get_db, get_current_user
@@ -8,8 +8,10 @@ from services.chat_service import ChatService
 from services.malware_detection import detect_malware, get_file_type_category
 from services.file_utils import get_file_path_from_url
 from services.websocket_manager import manager
-from schemas.chat_schemas import MessageCreate, MessageResponse, ChatResponse, ChatDetailResponse
+from services.badge_service import push_badges
+from schemas.chat_schemas import MessageCreate, MessageResponse, ChatResponse, ChatDetailResponse, InboxEntry
 from models.user import User
+from models.chat import Message
 
 router = APIRouter(prefix="/chats", tags=["chats"])
 
@@ -59,15 +61,11 @@ async def send_message(request: MessageCreate, db: Session = Depends(get_db), cu
     await manager.broadcast_to_users(
         f"messages_{chat.id}",
         [current_user.id, request.receiverId],
-        {
-            "type": "new_message",
-            "message_id": message.id,
-            "sender_id": message.senderId,
-            "content": message.content,
-            "attachment": message.attachment,
-            "timestamp": message.timestamp.isoformat() if message.timestamp else None,
-        },
+        ChatService.new_message_event(
+            message.id, message.senderId, message.seq, message.content, message.attachment, message.timestamp
+        ),
     )
+    await push_badges(db, request.receiverId)
     
     return message
 
@@ -77,16 +75,32 @@ def list_chats(db: Session = Depends(get_db), current_user: User = Depends(get_c
     chats = ChatService.list_user_chats(db, current_user)
     return chats
 
+@router.get("/inbox", response_model=List[InboxEntry])
+def get_inbox(db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+    """List chats with their last message and unread count, most recent first"""
+    return ChatService.get_inbox(db, current_user)
+
 @router.get("/{chat_id}", response_model=ChatDetailResponse)
-def get_chat_detail(chat_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    """Get all messages in a specific chat"""
-    chat = ChatService.get_chat(db, chat_id, current_user)
-    return chat
+def get_chat_detail(
+    chat_id: int,
+    limit: Optional[int] = Query(None, ge=1, le=200, description="Only include the latest N messages (default 50)"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Get a specific chat with its messages"""
+    return ChatService.get_chat_detail(db, chat_id, current_user, limit)
 
 @router.get("/{chat_id}/messages", response_model=List[MessageResponse])
-def get_chat_messages(chat_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    """Get messages from a specific chat"""
-    messages = ChatService.get_chat_messages(db, chat_id, current_user)
+def get_chat_messages(
+    chat_id: int,
+    before: Optional[int] = Query(None, description="Return messages older than this message ID"),
+    after: Optional[int] = Query(None, description="Return messages newer than this message ID"),
+    limit: Optional[int] = Query(None, ge=1, le=200, description="Page size (default 50)"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Get one page of messages from a specific chat, oldest first (latest page when no cursor is given)"""
+    messages = ChatService.get_chat_messages(db, chat_id, current_user, before, after, limit)
     return messages
 
 @router.post("/with/{user_id}", response_model=ChatResponse)
@@ -96,20 +110,28 @@ def get_or_create_chat_with_user(user_id: int, db: Session = Depends(get_db), cu
     return chat
 
 @router.post("/{chat_id}/mark-as-read", response_model=dict)
-def mark_chat_as_read(chat_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+async def mark_chat_as_read(chat_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
     """Mark all messages in a chat as read by the current user"""
     result = ChatService.mark_chat_as_read(db, chat_id, current_user)
+    await push_badges(db, current_user.id)
     return result
 
 @router.delete("/messages/{message_id}", response_model=dict)
-def delete_message(message_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+async def delete_message(message_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
     """Delete a specific message"""
+    # Get the chat participants before deleting to know whose badges to refresh
+    message = db.query(Message).filter(Message.id == message_id).first()
+    participant_ids = (message.chat.user1Id, message.chat.user2Id) if message else ()
     result = ChatService.delete_message(db, message_id, current_user)
+    await push_badges(db, *participant_ids)
     return result
 
 @router.delete("/{chat_id}", response_model=dict)
-def delete_chat(chat_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+async def delete_chat(chat_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
     """Delete a chat and all its messages"""
+    chat = ChatService.get_chat(db, chat_id, current_user)
+    participant_ids = (chat.user1Id, chat.user2Id)
     result = ChatService.delete_chat(db, chat_id, current_user)
+    await push_badges(db, *participant_ids)
     return result
 
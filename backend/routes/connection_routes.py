@@ -1,12 +1,14 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
 from typing import List
 
 from dependencies import get_db, get_current_user
 from services.connection_service import ConnectionService
-from schemas.connection_schemas import ConnectionCreate, ConnectionResponse
+from schemas.connection_schemas import ConnectionCreate, ConnectionResponse, MutualCountsRequest, MutualCountsResponse, DegreeOfSeparationResponse, ConnectionSuggestion, ConnectionStatusRequest, ConnectionStatusResponse, OnlineStatusRequest, OnlineStatusResponse
 from models.user import User
 from services.websocket_manager import manager
+from services.badge_service import push_badges
+from services.presence_service import presence
 
 router = APIRouter(prefix="/connections", tags=["connections"])
 
@@ -26,6 +28,7 @@ async def send_connection(request: ConnectionCreate, db: Session = Depends(get_d
             "receiver_id": request.receiverId,
         }
     )
+    await push_badges(db, request.receiverId)
     
     return conn
 
@@ -46,6 +49,7 @@ async def accept_connection(connection_id: int, db: Session = Depends(get_db), c
             "receiver_id": conn.receiverId,
         }
     )
+    await push_badges(db, conn.receiverId)
     
     return conn
 
@@ -65,6 +69,7 @@ async def reject_connection(connection_id: int, db: Session = Depends(get_db), c
             "receiver_id": conn.receiverId,
         }
     )
+    await push_badges(db, conn.receiverId)
     
     return conn
 
@@ -73,6 +78,10 @@ def list_accepted(db: Session = Depends(get_db), current_user: User = Depends(ge
     conns = ConnectionService.list_accepted(db, current_user)
     return conns
 
+@router.get("/suggestions", response_model=List[ConnectionSuggestion])
+def get_suggestions(limit: int = Query(20, ge=1, le=50), db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+    return ConnectionService.get_suggestions(db, current_user, limit)
+
 @router.get("/pending/incoming", response_model=List[ConnectionResponse])
 def list_pending_incoming(db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
     conns = ConnectionService.list_pending_incoming(db, current_user)
@@ -114,3 +123,21 @@ def get_mutual_connections(user_id: int, db: Session = Depends(get_db), current_
     conns = ConnectionService.get_mutual_connections(db, current_user, user_id)
     return conns
 
+@router.get("/{user_id}/degree", response_model=DegreeOfSeparationResponse)
+def get_degree_of_separation(user_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+    degree = ConnectionService.get_degree_of_separation(db, current_user, user_id)
+    return {"userId": user_id, "degree": degree}
+
+@router.post("/mutual/counts", response_model=MutualCountsResponse)
+def get_mutual_counts(request: MutualCountsRequest, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+    counts = ConnectionService.get_mutual_counts(db, current_user, request.userIds)
+    return {"counts": counts}
+
+@router.post("/status", response_model=ConnectionStatusResponse)
+def get_connection_statuses(request: ConnectionStatusRequest, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+    statuses = ConnectionService.get_statuses(db, current_user, request.userIds)
+    return {"statuses": statuses}
+
+@router.post("/online", response_model=OnlineStatusResponse)
+def get_online_connections(request: OnlineStatusRequest, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+    return {"online": presence.online_among(db, current_user.id, request.userIds)}
@@ -4,6 +4,7 @@ from fastapi.responses import FileResponse
 from sqlalchemy.orm import Session
 from database import get_db
 from services.cv_service import CVService
+from services.connection_graph_cache import ConnectionGraphCache
 from models.cv import Contact, Formation, Competence, Langue, Experience
 
 from schemas.cv_schemas import ContactCreate, FormationCreate, CompetenceCreate, LangueCreate, ExperienceCreate, CVCreate, CVUpdate
@@ -136,6 +137,7 @@ from fastapi import APIRouter, Depends, status, HTTPException
 from sqlalchemy.orm import Session
 from database import get_db
 from services.cv_service import CVService
+from services.connection_graph_cache import ConnectionGraphCache
 from models.cv import Contact, Formation, Competence, Langue, Experience
 
 from schemas.cv_schemas import ContactCreate, FormationCreate, CompetenceCreate, LangueCreate, ExperienceCreate, CVCreate
@@ -291,7 +293,6 @@ def get_cv(db: Session = Depends(get_db), current_user: User = Depends(get_curre
 def get_user_cv(user_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
     """Get a user's CV if it's public or if there's a connection"""
     from models.cv import CV
-    from models.connection import Connection
     
     # Get the target user's CV
     cv = db.query(CV).filter(CV.userId == user_id, CV.cv_enabled == True).first()
@@ -304,14 +305,7 @@ def get_user_cv(user_id: int, db: Session = Depends(get_db), current_user: User
         return cv
     
     # Check if current user has a connection with the target user
-    from models.connection import ConnectionStatus
-    has_connection = db.query(Connection).filter(
-        Connection.status == ConnectionStatus.ACCEPTED,
-        (
-            (Connection.senderId == current_user.id and Connection.receiverId == user_id) |
-            (Connection.senderId == user_id and Connection.receiverId == current_user.id)
-        )
-    ).first()
+    has_connection = ConnectionGraphCache.are_connected(db, current_user.id, user_id)
     
     if has_connection:
         return cv
@@ -725,7 +719,6 @@ def download_cv_as_pdf(db: Session = Depends(get_db), current_user: User = Depen
 def download_user_cv_as_pdf(user_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
     """Generate and download another user's CV as a professionally styled PDF (with access control)"""
     from models.cv import CV
-    from models.connection import Connection
     
     # Get the target user's CV
     cv = db.query(CV).filter(CV.userId == user_id, CV.cv_enabled == True).first()
@@ -736,14 +729,7 @@ def download_user_cv_as_pdf(user_id: int, db: Session = Depends(get_db), current
     # Check if CV is public
     if not cv.isPublic:
         # Check if current user has a connection with the target user
-        from models.connection import ConnectionStatus
-        has_connection = db.query(Connection).filter(
-            Connection.status == ConnectionStatus.ACCEPTED,
-            (
-                (Connection.senderId == current_user.id and Connection.receiverId == user_id) |
-                (Connection.senderId == user_id and Connection.receiverId == current_user.id)
-            )
-        ).first()
+        has_connection = ConnectionGraphCache.are_connected(db, current_user.id, user_id)
         
         if not has_connection:
             raise HTTPException(status_code=403, detail="You don't have access to this CV")
@@ -7,9 +7,11 @@ from schemas.post_schemas import (
     PostUpdate,
     PostResponse,
     PostListResponse,
+    PostSummaryListResponse,
     CommentCreate,
     CommentUpdate,
     CommentResponse,
+    CommentListResponse,
     ReactionCreate,
     ReactionResponse
 )
@@ -42,6 +44,8 @@ def create_post(
 def get_feed(
     skip: int = Query(0, ge=0, description="Number of posts to skip"),
     limit: int = Query(50, ge=1, le=100, description="Maximum number of posts to return"),
+    cursor: Optional[str] = Query(None, description="Opaque cursor from a previous page's next_cursor"),
+    include_total: bool = Query(True, description="Whether to compute the total number of posts"),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
@@ -54,8 +58,34 @@ def get_feed(
     - Public posts from all users
     
     Ordered by most recent first.
+    
+    Pagination:
+    - Pass the returned **next_cursor** as **cursor** to fetch the next page (skip is ignored)
+    - Set **include_total=false** to skip counting all visible posts
+    """
+    return PostService.get_feed(db, current_user, skip, limit, cursor, include_total)
+
+
+@router.get("/feed/summary", status_code=status.HTTP_200_OK, response_model=PostSummaryListResponse)
+def get_feed_summary(
+    skip: int = Query(0, ge=0, description="Number of posts to skip"),
+    limit: int = Query(50, ge=1, le=100, description="Maximum number of posts to return"),
+    cursor: Optional[str] = Query(None, description="Opaque cursor from a previous page's next_cursor"),
+    include_total: bool = Query(True, description="Whether to compute the total number of posts"),
+    comments_limit: int = Query(3, ge=0, le=20, description="Number of first comments to include per post"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Get the personalized feed as lightweight post summaries.
+    
+    Same posts and pagination as **/posts/feed**, but each post carries:
+    - Reaction counts by type and your own reaction
+    - Comment count and the first **comments_limit** comments
+    
+    Page through the rest with **GET /posts/{post_id}/comments**.
     """
-    return PostService.get_feed(db, current_user, skip, limit)
+    return PostService.get_feed_summary(db, current_user, skip, limit, cursor, include_total, comments_limit)
 
 
 @router.get("/user/{user_id}", status_code=status.HTTP_200_OK, response_model=PostListResponse)
@@ -77,6 +107,23 @@ def get_user_posts(
     return PostService.get_user_posts(db, user_id, current_user, skip, limit)
 
 
+@router.get("/user/{user_id}/summary", status_code=status.HTTP_200_OK, response_model=PostSummaryListResponse)
+def get_user_posts_summary(
+    user_id: int,
+    skip: int = Query(0, ge=0, description="Number of posts to skip"),
+    limit: int = Query(50, ge=1, le=100, description="Maximum number of posts to return"),
+    comments_limit: int = Query(3, ge=0, le=20, description="Number of first comments to include per post"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Get posts by a specific user as lightweight post summaries.
+    
+    Same access control as **/posts/user/{user_id}**.
+    """
+    return PostService.get_user_posts_summary(db, user_id, current_user, skip, limit, comments_limit)
+
+
 @router.get("/{post_id}", status_code=status.HTTP_200_OK, response_model=PostResponse)
 def get_post(
     post_id: int,
@@ -143,6 +190,23 @@ def add_comment(
     return PostService.add_comment(db, post_id, current_user, data)
 
 
+@router.get("/{post_id}/comments", status_code=status.HTTP_200_OK, response_model=CommentListResponse)
+def get_post_comments(
+    post_id: int,
+    limit: int = Query(20, ge=1, le=100, description="Maximum number of comments to return"),
+    cursor: Optional[str] = Query(None, description="Opaque cursor from a previous page's next_cursor"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Get the comments of a post, oldest first.
+    
+    Pass the returned **next_cursor** as **cursor** to fetch the next page.
+    Same access control as **GET /posts/{post_id}**.
+    """
+    return PostService.get_post_comments(db, post_id, current_user, limit, cursor)
+
+
 @router.patch("/comments/{comment_id}", status_code=status.HTTP_200_OK, response_model=CommentResponse)
 def update_comment(
     comment_id: int,
@@ -2,12 +2,18 @@
 WebSocket routes for real-time updates.
 Handles messaging, connection requests, notifications, and feed updates.
 """
-from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Query
+from fastapi import APIRouter, Depends, WebSocket, WebSocketDisconnect, Query
+from typing import Dict, Optional, Tuple
 from database import SessionLocal
-from dependencies import get_current_user_websocket
-from services.websocket_manager import manager
+from models.user import User
+from dependencies import get_user_id_websocket, get_current_admin
+from services.websocket_manager import manager, TopicSocket
+from services.message_ingest import message_ingest
+from services.presence_service import presence
 from services.chat_service import ChatService
-from services.connection_service import ConnectionService
+from services.chat_membership_cache import ChatMembershipCache
+from services.active_user_cache import ActiveUserCache
+from schemas.websocket_schemas import WebSocketStats
 import logging
 import asyncio
 import json
@@ -15,20 +21,26 @@ import json
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/ws", tags=["WebSocket"])
 
+# Largest gap replayed on reconnect; beyond it the client refetches history over HTTP
+REPLAY_LIMIT = 500
+
 
 async def authenticate_websocket(websocket: WebSocket, token: str):
     """Authenticate WebSocket connection and return user_id"""
     # Accept the websocket connection first
     await websocket.accept()
     
-    db = SessionLocal()
     try:
-        current_user = get_current_user_websocket(token, db)
-        if not current_user:
+        # Verify the JWT, then check the user still exists: from memory, or one small query on a cache miss
+        user_id = get_user_id_websocket(token)
+        if user_id is not None and not ActiveUserCache.is_cached(user_id):
+            if not await asyncio.to_thread(ActiveUserCache.exists, user_id):
+                user_id = None
+        if user_id is None:
             logger.warning(f"WebSocket authentication failed - invalid token")
             await websocket.close(code=4001, reason="Unauthorized - invalid token")
             return None
-        return current_user.id
+        return user_id
     except Exception as e:
         logger.error(f"WebSocket authentication error: {type(e).__name__}: {e}")
         try:
@@ -36,8 +48,12 @@ async def authenticate_websocket(websocket: WebSocket, token: str):
         except:
             pass  # Connection may already be closed
         return None
-    finally:
-        db.close()
+
+
+@router.get("/stats", response_model=WebSocketStats)
+def get_websocket_stats(current_admin: User = Depends(get_current_admin)):
+    """Send-queue depth and drop counters of the worker serving the request (Admin only)"""
+    return manager.get_stats()
 
 
 async def websocket_receive_with_timeout(websocket: WebSocket, timeout: int = 35):
@@ -57,23 +73,186 @@ async def websocket_receive_with_timeout(websocket: WebSocket, timeout: int = 35
 
 
 
+class TypingCoalescer:
+    """
+    Forwards one user's typing indicator in a chat at most once per INTERVAL_SECONDS.
+    Frames arriving sooner are folded into a single trailing update carrying the latest state.
+
+    There is one coalescer per (user, chat) on a worker, shared by every socket
+    the user has open on that chat (tabs, devices, /ws/stream topics), so
+    extra sockets cannot multiply the rate. Sockets take it with acquire()
+    and give it back with release().
+    """
+
+    INTERVAL_SECONDS = 2.0
+
+    # (user_id, chat_id) -> coalescer, kept while a socket holds it
+    _active: Dict[Tuple[int, int], "TypingCoalescer"] = {}
+
+    def __init__(self, chat_id: int, user_id: int, recipient_id: int):
+        self.chat_id = chat_id
+        self.channel = f"messages_{chat_id}"
+        self.user_id = user_id
+        self.recipient_id = recipient_id
+        self._holders = 0
+        self._sent_state: Optional[bool] = None
+        self._sent_at = 0.0
+        self._latest_state = False
+        self._trailing: Optional[asyncio.Task] = None
+
+    @classmethod
+    def acquire(cls, chat_id: int, user_id: int, recipient_id: int) -> "TypingCoalescer":
+        coalescer = cls._active.get((user_id, chat_id))
+        if coalescer is None:
+            coalescer = cls._active[(user_id, chat_id)] = cls(chat_id, user_id, recipient_id)
+        coalescer._holders += 1
+        return coalescer
+
+    def release(self):
+        self._holders -= 1
+        if self._holders > 0:
+            return
+        if self._active.get((self.user_id, self.chat_id)) is self:
+            del self._active[(self.user_id, self.chat_id)]
+        if self._trailing is not None:
+            self._trailing.cancel()
+
+    async def update(self, is_typing: bool):
+        self._latest_state = is_typing
+        if self._trailing is not None:
+            return  # The pending trailing update will carry the latest state
+        wait = self._sent_at + self.INTERVAL_SECONDS - asyncio.get_running_loop().time()
+        if wait <= 0:
+            await self._send()
+        elif is_typing != self._sent_state:
+            self._trailing = asyncio.create_task(self._send_later(wait))
+
+    async def _send_later(self, delay: float):
+        await asyncio.sleep(delay)
+        self._trailing = None
+        if self._latest_state != self._sent_state:
+            await self._send()
+
+    async def _send(self):
+        self._sent_state = self._latest_state
+        self._sent_at = asyncio.get_running_loop().time()
+        await manager.broadcast_to_user(
+            self.channel,
+            self.recipient_id,
+            {
+                "type": "typing",
+                "user_id": self.user_id,
+                "is_typing": self._sent_state,
+            },
+        )
+
+
+async def replay_missed_messages(websocket: WebSocket, chat_id: int, since_seq: int) -> Optional[int]:
+    """
+    Send the messages of a chat with seq > since_seq, oldest first.
+    Returns the last seq sent, or None (after sending resync_required) if the gap exceeds REPLAY_LIMIT.
+    """
+    def load_events():
+        db = SessionLocal()
+        try:
+            return [
+                ChatService.new_message_event(
+                    message.id, message.senderId, message.seq, message.content, message.attachment, message.timestamp
+                )
+                for message in ChatService.get_messages_since(db, chat_id, since_seq, REPLAY_LIMIT + 1)
+            ]
+        finally:
+            db.close()
+
+    events = await asyncio.to_thread(load_events)
+    if len(events) > REPLAY_LIMIT:
+        await manager.send(websocket, {"type": "resync_required", "since_seq": since_seq})
+        return None
+    for event in events:
+        await manager.send(websocket, event)
+    return events[-1]["seq"] if events else since_seq
+
+
+def resolve_chat_peer(chat_id: int, user_id: int) -> Optional[int]:
+    """Return the other participant of a chat, or None if user_id is not part of it.
+
+    May query the database on a membership-cache miss: call it with asyncio.to_thread.
+    """
+    db = SessionLocal()
+    try:
+        return ChatMembershipCache.get_other_participant(db, chat_id, user_id)
+    finally:
+        db.close()
+
+
+async def join_chat(websocket, chat_id: int, user_id: int, since_seq: Optional[int] = None):
+    """
+    Register a socket for a chat's live messages, first replaying what the client
+    missed since since_seq (followed by {"type": "replay_complete", "seq": n}).
+    """
+    replayed_seq = None
+    if since_seq is not None:
+        replayed_seq = await replay_missed_messages(websocket, chat_id, since_seq)
+
+    # Live messages wait until the gap below is closed, so they never overtake the replay
+    await manager.connect(websocket, f"messages_{chat_id}", user_id, hold=replayed_seq is not None)
+
+    if replayed_seq is not None:
+        try:
+            # Close the gap between the replay and registering for live delivery
+            replayed_seq = await replay_missed_messages(websocket, chat_id, replayed_seq)
+            if replayed_seq is not None:
+                await manager.send(websocket, {"type": "replay_complete", "seq": replayed_seq})
+        finally:
+            await manager.release(websocket)
+
+
+async def submit_chat_message(websocket, chat_id: int, user_id: int, other_user_id: int, msg: dict):
+    """Hand a message to the ingest pipeline's next group commit, which also broadcasts it"""
+    try:
+        await message_ingest.submit(
+            chat_id,
+            user_id,
+            other_user_id,
+            msg.get("content"),
+            msg.get("attachment"),
+        )
+    except ValueError as e:
+        await manager.send(websocket, {"type": "error", "detail": str(e)})
+    except Exception:
+        await manager.send(websocket, {"type": "error", "detail": "Message could not be sent"})
+
+
 
 @router.websocket("/messages/{chat_id}")
 async def websocket_messages(
     websocket: WebSocket,
     chat_id: int,
     token: str = Query(...),
+    since_seq: Optional[int] = Query(None),
 ):
     """
     WebSocket endpoint for real-time chat messages.
     
-    Usage: ws://localhost:8000/ws/messages/{chat_id}?token={access_token}
+    Usage: ws://localhost:8000/ws/messages/{chat_id}?token={access_token}[&since_seq={last_seen_seq}]
+
+    With since_seq, messages the client missed are replayed before live
+    delivery starts, followed by {"type": "replay_complete", "seq": n}. Every
+    new_message carries its seq; a message can arrive both live and in the
+    replay around that switch, so clients drop any seq they have already seen.
     """
     user_id = await authenticate_websocket(websocket, token)
     if user_id is None:
         return
 
-    await manager.connect(websocket, f"messages_{chat_id}", user_id)
+    # Resolve the chat once: every event on this socket goes to the same participant
+    other_user_id = await asyncio.to_thread(resolve_chat_peer, chat_id, user_id)
+    if other_user_id is None:
+        await websocket.close(code=4003, reason="Not a participant of this chat")
+        return
+
+    await join_chat(websocket, chat_id, user_id, since_seq)
+    typing = TypingCoalescer.acquire(chat_id, user_id, other_user_id)
     logger.info(f"User {user_id} connected to chat {chat_id}")
 
     try:
@@ -91,61 +270,21 @@ async def websocket_messages(
             message_type = msg.get("type")
 
             if message_type == "message":
-                db = SessionLocal()
-                try:
-                    message_content = msg.get("content")
-                    attachment = msg.get("attachment")
-                    message = ChatService.send_message(
-                        db=db,
-                        chat_id=chat_id,
-                        sender_id=user_id,
-                        content=message_content,
-                        attachment=attachment,
-                    )
-                    chat = ChatService.get_chat(db, chat_id, user_id)
-                    other_user_id = chat.user2Id if chat.user1Id == user_id else chat.user1Id
-
-                    await manager.broadcast_to_users(
-                        f"messages_{chat_id}",
-                        [user_id, other_user_id],
-                        {
-                            "type": "new_message",
-                            "message_id": message.id,
-                            "sender_id": message.senderId,
-                            "content": message.content,
-                            "attachment": message.attachment,
-                            "timestamp": message.timestamp.isoformat() if message.timestamp else None,
-                        },
-                    )
-                finally:
-                    db.close()
+                await submit_chat_message(websocket, chat_id, user_id, other_user_id, msg)
 
             elif message_type == "typing":
-                db = SessionLocal()
-                try:
-                    chat = ChatService.get_chat(db, chat_id, user_id)
-                    other_user_id = chat.user2Id if chat.user1Id == user_id else chat.user1Id
-                    await manager.broadcast_to_user(
-                        f"messages_{chat_id}",
-                        other_user_id,
-                        {
-                            "type": "typing",
-                            "user_id": user_id,
-                            "is_typing": msg.get("is_typing", True),
-                        },
-                    )
-                finally:
-                    db.close()
+                await typing.update(bool(msg.get("is_typing", True)))
 
             elif message_type == "ping":
-                await websocket.send_text(json.dumps({"type": "pong"}))
+                await manager.send(websocket, {"type": "pong"})
 
     except WebSocketDisconnect:
         logger.info(f"User {user_id} disconnected from chat {chat_id}")
     except Exception as e:
         logger.error(f"Error in messages WebSocket: {e}")
     finally:
-        manager.disconnect(f"messages_{chat_id}", user_id)
+        typing.release()
+        manager.disconnect(websocket, f"messages_{chat_id}", user_id)
 
 
 
@@ -180,7 +319,7 @@ async def websocket_connections(
                 try:
                     msg = json.loads(data)
                     if msg.get("type") == "ping":
-                        await websocket.send_text(json.dumps({"type": "pong"}))
+                        await manager.send(websocket, {"type": "pong"})
                 except json.JSONDecodeError:
                     continue
 
@@ -194,7 +333,7 @@ async def websocket_connections(
     
     finally:
         if user_id is not None:
-            manager.disconnect("connections", user_id)
+            manager.disconnect(websocket, "connections", user_id)
 
 
 
@@ -229,7 +368,7 @@ async def websocket_notifications(
                 try:
                     msg = json.loads(data)
                     if msg.get("type") == "ping":
-                        await websocket.send_text(json.dumps({"type": "pong"}))
+                        await manager.send(websocket, {"type": "pong"})
                 except json.JSONDecodeError:
                     continue
 
@@ -242,7 +381,7 @@ async def websocket_notifications(
             logger.error(f"Error in notifications WebSocket for user {user_id}: {type(e).__name__}: {e}", exc_info=True)
     finally:
         if user_id is not None:
-            manager.disconnect("notifications", user_id)
+            manager.disconnect(websocket, "notifications", user_id)
 
 
 
@@ -281,7 +420,7 @@ async def websocket_feed(
                 try:
                     msg = json.loads(data)
                     if msg.get("type") == "ping":
-                        await websocket.send_text(json.dumps({"type": "pong"}))
+                        await manager.send(websocket, {"type": "pong"})
                 except json.JSONDecodeError:
                     continue
 
@@ -294,7 +433,7 @@ async def websocket_feed(
             logger.error(f"Error in feed WebSocket for user {user_id}: {type(e).__name__}: {e}", exc_info=True)
     finally:
         if user_id is not None:
-            manager.disconnect("feed", user_id)
+            manager.disconnect(websocket, "feed", user_id)
 
 
 
@@ -308,34 +447,21 @@ async def websocket_online(
     WebSocket endpoint for user online status.
     
     Usage: ws://localhost:8000/ws/online?token={access_token}
+
+    On connect the client receives {"type": "presence", "online": [...], "offline": []}
+    listing its online connections, then periodic diffs of the same shape.
     """
     user_id = None
+    registered = False
     try:
         user_id = await authenticate_websocket(websocket, token)
         if user_id is None:
             return
 
-        # Get user info for online broadcast
-        db = SessionLocal()
-        try:
-            current_user = get_current_user_websocket(token, db)
-            full_name = current_user.fullName if current_user else "Unknown"
-        finally:
-            db.close()
-
-        await manager.connect(websocket, "online", user_id)
+        await presence.connect(websocket, user_id)
+        registered = True
         logger.info(f"User {user_id} came online")
 
-        # Notify others that user came online
-        await manager.broadcast_to_channel(
-            "online",
-            {
-                "type": "user_online",
-                "user_id": user_id,
-                "full_name": full_name,
-            },
-        )
-
         try:
             while True:
                 data = await websocket_receive_with_timeout(websocket)
@@ -347,7 +473,7 @@ async def websocket_online(
                 try:
                     msg = json.loads(data)
                     if msg.get("type") == "ping":
-                        await websocket.send_text(json.dumps({"type": "pong"}))
+                        await manager.send(websocket, {"type": "pong"})
                 except json.JSONDecodeError:
                     continue
 
@@ -359,10 +485,134 @@ async def websocket_online(
         except Exception as e:
             logger.error(f"Error in online WebSocket for user {user_id}: {type(e).__name__}: {e}", exc_info=True)
     finally:
-        if user_id is not None:
-            manager.disconnect("online", user_id)
-            # Notify others that user went offline
-            await manager.broadcast_to_channel(
-                "online", {"type": "user_offline", "user_id": user_id}
-            )
+        if registered:
+            presence.disconnect(websocket, user_id)
+
+
+
+
+
+# Topics a /ws/stream socket can subscribe to besides "messages_{chat_id}"
+STREAM_TOPICS = {"connections", "notifications", "feed", "online"}
+
+
+@router.websocket("/stream")
+async def websocket_stream(
+    websocket: WebSocket,
+    token: str = Query(...),
+):
+    """
+    Multiplexed WebSocket: one authenticated socket carries every real-time topic.
+    
+    Usage: ws://localhost:8000/ws/stream?token={access_token}
+
+    Client frames:
+      {"type": "subscribe", "topic": "connections" | "notifications" | "feed" | "online" | "messages_{chat_id}", "since_seq": n}
+      {"type": "unsubscribe", "topic": ...}
+      {"type": "message", "chat_id": n, "content": ..., "attachment": ...}
+      {"type": "typing", "chat_id": n, "is_typing": true}
+      {"type": "ping"}
+
+    Events are the same as on the dedicated endpoints, tagged with their
+    "topic". since_seq is only used by chat topics (see /ws/messages/{chat_id}).
+    """
+    user_id = await authenticate_websocket(websocket, token)
+    if user_id is None:
+        return
+
+    subscriptions: Dict[str, TopicSocket] = {}
+    # chat_id -> (other participant, typing coalescer), resolved once per socket
+    chats: Dict[int, Tuple[int, TypingCoalescer]] = {}
+
+    async def chat_peer(chat_id) -> Optional[Tuple[int, TypingCoalescer]]:
+        if not isinstance(chat_id, int):
+            return None
+        if chat_id not in chats:
+            other_user_id = await asyncio.to_thread(resolve_chat_peer, chat_id, user_id)
+            if other_user_id is None:
+                return None
+            chats[chat_id] = (other_user_id, TypingCoalescer.acquire(chat_id, user_id, other_user_id))
+        return chats[chat_id]
+
+    async def subscribe(topic: str, since_seq: Optional[int]):
+        if topic in subscriptions:
+            return
+        sink = TopicSocket(websocket, topic)
+        if topic.startswith("messages_"):
+            chat_id = int(topic[len("messages_"):]) if topic[len("messages_"):].isdigit() else None
+            if await chat_peer(chat_id) is None:
+                await manager.send(websocket, {"type": "error", "topic": topic, "detail": "Not a participant of this chat"})
+                return
+            subscriptions[topic] = sink
+            await join_chat(sink, chat_id, user_id, since_seq)
+        elif topic == "online":
+            subscriptions[topic] = sink
+            await presence.connect(sink, user_id)
+        elif topic in STREAM_TOPICS:
+            subscriptions[topic] = sink
+            await manager.connect(sink, topic, user_id)
+        else:
+            await manager.send(websocket, {"type": "error", "topic": topic, "detail": "Unknown topic"})
+            return
+        await manager.send(websocket, {"type": "subscribed", "topic": topic})
+
+    def unsubscribe(topic: str):
+        sink = subscriptions.pop(topic, None)
+        if sink is None:
+            return
+        if topic == "online":
+            presence.disconnect(sink, user_id)
+        else:
+            manager.disconnect(sink, topic, user_id)
 
+    logger.info(f"User {user_id} connected to stream")
+    try:
+        while True:
+            data = await websocket_receive_with_timeout(websocket)
+            if data is None:
+                # Timeout - connection is still alive, just no message received
+                continue
+
+            try:
+                msg = json.loads(data)
+            except json.JSONDecodeError:
+                continue
+
+            message_type = msg.get("type")
+
+            if message_type == "subscribe":
+                since_seq = msg.get("since_seq")
+                await subscribe(str(msg.get("topic")), since_seq if isinstance(since_seq, int) else None)
+
+            elif message_type == "unsubscribe":
+                unsubscribe(str(msg.get("topic")))
+
+            elif message_type in ("message", "typing"):
+                chat_id = msg.get("chat_id")
+                peer = await chat_peer(chat_id)
+                if peer is None:
+                    await manager.send(websocket, {"type": "error", "detail": "Not a participant of this chat"})
+                    continue
+                other_user_id, typing = peer
+                if message_type == "message":
+                    await submit_chat_message(
+                        TopicSocket(websocket, f"messages_{chat_id}"), chat_id, user_id, other_user_id, msg
+                    )
+                else:
+                    await typing.update(bool(msg.get("is_typing", True)))
+
+            elif message_type == "ping":
+                await manager.send(websocket, {"type": "pong"})
+
+    except WebSocketDisconnect:
+        logger.info(f"User {user_id} disconnected from stream")
+    except asyncio.CancelledError:
+        logger.info(f"User {user_id} stream connection cancelled")
+        raise
+    except Exception as e:
+        logger.error(f"Error in stream WebSocket for user {user_id}: {type(e).__name__}: {e}", exc_info=True)
+    finally:
+        for _, typing in chats.values():
+            typing.release()
+        for topic in list(subscriptions):
+            unsubscribe(topic)
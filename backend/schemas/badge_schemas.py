@@ -0,0 +1,6 @@
+from pydantic import BaseModel
+
+
+class BadgesResponse(BaseModel):
+    unreadMessages: int
+    pendingConnections: int
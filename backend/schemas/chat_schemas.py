@@ -22,6 +22,7 @@ class MessageResponse(BaseModel):
     attachment: Optional[str] = None
     is_read: int = 0
     timestamp: datetime
+    seq: Optional[int] = None
     senderId: int
     chatId: int
 
@@ -39,6 +40,17 @@ class ChatResponse(BaseModel):
     class Config:
         from_attributes = True
 
+class InboxEntry(BaseModel):
+    """A chat as listed in the inbox: participants, last message and unread count"""
+    id: int
+    user1Id: int
+    user2Id: int
+    user1: Optional[UserSimple] = None
+    user2: Optional[UserSimple] = None
+    lastMessage: Optional[MessageResponse] = None
+    lastActivity: Optional[datetime] = None
+    unreadCount: int = 0
+
 class ChatDetailResponse(BaseModel):
     id: int
     user1Id: int
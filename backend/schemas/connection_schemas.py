@@ -1,5 +1,5 @@
-from pydantic import BaseModel
-from typing import Optional
+from pydantic import BaseModel, Field
+from typing import Dict, List, Optional
 from datetime import datetime
 from models.connection import ConnectionStatus
 
@@ -26,3 +26,45 @@ class ConnectionResponse(BaseModel):
     receiverId: int
     sender: Optional[UserBasicInfo] = None
     receiver: Optional[UserBasicInfo] = None
+
+
+class MutualCountsRequest(BaseModel):
+    userIds: List[int] = Field(..., max_length=100, description="Users to count mutual connections with (max 100)")
+
+
+class MutualCountsResponse(BaseModel):
+    counts: Dict[int, int]
+
+
+class ConnectionStatusRequest(BaseModel):
+    userIds: List[int] = Field(..., max_length=100, description="Users to look up (max 100)")
+
+
+class ConnectionStatusEntry(BaseModel):
+    status: str  # connected, pending_in, pending_out, blocked or none
+    connectionId: Optional[int] = None
+
+
+class ConnectionStatusResponse(BaseModel):
+    statuses: Dict[int, ConnectionStatusEntry]
+
+
+class OnlineStatusRequest(BaseModel):
+    userIds: List[int] = Field(..., max_length=100, description="Users to look up (max 100)")
+
+
+class OnlineStatusResponse(BaseModel):
+    online: List[int]  # The requested users that are connected to the caller and online
+
+
+class DegreeOfSeparationResponse(BaseModel):
+    userId: int
+    degree: Optional[int] = None  # None when further than 6 hops or unreachable
+
+
+class ConnectionSuggestion(BaseModel):
+    userId: int
+    user: UserBasicInfo
+    score: float
+    mutualCount: int
+    reasons: List[str]  # e.g. "mutual_connections", "same_laboratoire", "shared_thematiques"
@@ -93,6 +93,12 @@ class CommentResponse(BaseModel):
         from_attributes = True
 
 
+class CommentListResponse(BaseModel):
+    """Response schema for a page of comments"""
+    comments: List[CommentResponse]
+    next_cursor: Optional[str] = None
+
+
 class PostResponse(BaseModel):
     """Response schema for a post"""
     id: int
@@ -115,8 +121,9 @@ class PostResponse(BaseModel):
 
 class PostListResponse(BaseModel):
     """Response schema for paginated posts"""
-    total: int
+    total: Optional[int] = None
     posts: List[PostResponse]
+    next_cursor: Optional[str] = None
 
 
 class ReactionSummary(BaseModel):
@@ -130,6 +137,19 @@ class ReactionSummary(BaseModel):
     total: int = 0
 
 
+class CommentPreview(BaseModel):
+    """Comment shown inline in a post summary, without its reactions"""
+    id: int
+    content: str
+    timestamp: datetime
+    postId: int
+    userId: int
+    user: UserBasicInfo
+    
+    class Config:
+        from_attributes = True
+
+
 class PostWithStats(BaseModel):
     """Post with engagement statistics"""
     id: int
@@ -138,10 +158,22 @@ class PostWithStats(BaseModel):
     attachement: Optional[str] = None
     isPublic: bool
     userId: int
+    publicationId: Optional[int] = None
+    scopusPublicationId: Optional[int] = None
     user: UserBasicInfo
+    publication: Optional[PublicationInfo] = None
+    scopusPublication: Optional[ScopusPublicationInfo] = None
     commentCount: int
     reactionSummary: ReactionSummary
     userReaction: Optional[ReactionType] = None  # Current user's reaction if any
+    recentComments: List[CommentPreview] = []  # First comments, oldest first
     
     class Config:
         from_attributes = True
+
+
+class PostSummaryListResponse(BaseModel):
+    """Response schema for paginated post summaries"""
+    total: Optional[int] = None
+    posts: List[PostWithStats]
+    next_cursor: Optional[str] = None
@@ -0,0 +1,10 @@
+from pydantic import BaseModel
+
+
+class WebSocketStats(BaseModel):
+    sockets: int
+    queue_capacity: int
+    queued_frames: int
+    max_queue_depth: int
+    dropped_frames: int
+    evicted_sockets: int
@@ -0,0 +1,106 @@
+"""
+Micro-benchmark: CPU spent broadcasting one event to a large channel.
+
+Compares encoding the event once per recipient, as WebSocket.send_json
+does, with encoding it once and sending the same text frame to everyone,
+as ConnectionManager does. The last row runs the real manager delivery path
+(queueing plus writer tasks) against in-process sockets that discard frames.
+No database or network is used.
+
+Usage:
+  python scripts/bench_broadcast.py [--sockets 10000] [--rounds 20]
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+from pathlib import Path
+
+# Ensure project root is importable when running as: python scripts/bench_broadcast.py
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from services.websocket_manager import ConnectionManager, encode_frame
+
+PAYLOAD = {
+    "type": "new_post",
+    "post": {
+        "id": 123456,
+        "content": "Our paper on graph neural networks for molecular property prediction was accepted! " * 3,
+        "attachement": "/uploads/posts/figure-1.png",
+        "timestamp": "2026-10-17T09:30:00+00:00",
+        "user": {"id": 42, "fullName": "Example Researcher", "photo_de_profile": "/uploads/profiles/42.png"},
+        "reactions_count": 17,
+        "comments_count": 4,
+    },
+}
+
+
+class NullSocket:
+    """Accepts frames without sending them anywhere"""
+
+    async def send_text(self, data: str):
+        pass
+
+    async def send_json(self, data: dict):
+        # Same encoding as starlette's WebSocket.send_json
+        await self.send_text(json.dumps(data, separators=(",", ":"), ensure_ascii=False))
+
+
+def cpu_ms(run, rounds: int) -> float:
+    start = time.process_time()
+    for _ in range(rounds):
+        run()
+    return (time.process_time() - start) * 1000 / rounds
+
+
+def encode_per_recipient(sockets: int):
+    return [json.dumps(PAYLOAD, separators=(",", ":"), ensure_ascii=False) for _ in range(sockets)]
+
+
+def encode_once(sockets: int):
+    frame = encode_frame(PAYLOAD)
+    return [frame for _ in range(sockets)]
+
+
+async def manager_delivery_ms(sockets: int, rounds: int) -> float:
+    manager = ConnectionManager()
+    manager.send_queue_size = rounds + 1
+    await manager.start_backplane(manager.backplane)
+    sockets_by_user = [NullSocket() for _ in range(sockets)]
+    for user_id, websocket in enumerate(sockets_by_user):
+        await manager.connect(websocket, "feed", user_id)
+
+    start = time.process_time()
+    for _ in range(rounds):
+        await manager.broadcast_to_channel("feed", PAYLOAD)
+        while any(sender.depth for sender in manager._senders.values()):
+            await asyncio.sleep(0)
+    elapsed = (time.process_time() - start) * 1000 / rounds
+
+    for user_id, websocket in enumerate(sockets_by_user):
+        manager.disconnect(websocket, "feed", user_id)
+    return elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sockets", type=int, default=10000)
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+
+    per_recipient = cpu_ms(lambda: encode_per_recipient(args.sockets), args.rounds)
+    once = cpu_ms(lambda: encode_once(args.sockets), args.rounds)
+    delivery = asyncio.run(manager_delivery_ms(args.sockets, args.rounds))
+
+    print(f"Broadcast of one {len(encode_frame(PAYLOAD))}-byte event to {args.sockets} sockets (CPU ms per broadcast)")
+    print(f"  encode per recipient (send_json): {per_recipient:9.2f}")
+    print(f"  encode once (orjson):             {once:9.2f}")
+    print(f"  saved on encoding:                {per_recipient - once:9.2f}  ({per_recipient / max(once, 1e-9):.0f}x)")
+    print(f"  full manager delivery:            {delivery:9.2f}")
+
+
+if __name__ == "__main__":
+    main()
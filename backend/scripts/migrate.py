@@ -0,0 +1,246 @@
+"""
+Apply schema changes that create_all() cannot make on an existing database.
+
+models.Base.metadata.create_all() only creates missing tables, so new indexes
+and columns on tables that already exist (e.g. loaded from database.sql) are
+applied here. Every step is idempotent and safe to re-run.
+
+Usage:
+  python scripts/migrate.py
+"""
+import sys
+from pathlib import Path
+
+# Ensure project root is importable when running as: python scripts/migrate.py
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+import models
+from database import engine
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from services.counter_service import CounterService
+from services.badge_service import BadgeService
+
+
+def add_posts_feed_index(conn) -> None:
+    """Index backing keyset pagination of the feed"""
+    conn.execute(text(
+        'CREATE INDEX IF NOT EXISTS ix_posts_timestamp_id ON posts ("timestamp", id)'
+    ))
+
+
+def add_comments_post_index(conn) -> None:
+    """Index backing keyset pagination of a post's comments"""
+    conn.execute(text(
+        'CREATE INDEX IF NOT EXISTS ix_comments_post_timestamp_id ON comments ("postId", "timestamp", id)'
+    ))
+
+
+def backfill_timelines(conn) -> None:
+    """Materialize home timelines the first time fan-out-on-write is deployed"""
+    conn.execute(text(
+        'CREATE INDEX IF NOT EXISTS ix_posts_public_timestamp_id '
+        'ON posts ("timestamp", id) WHERE "isPublic" = true'
+    ))
+    if conn.execute(text("SELECT 1 FROM timeline_entries LIMIT 1")).first() is not None:
+        return
+    conn.execute(text("""
+        INSERT INTO timeline_entries ("userId", "postId", "timestamp")
+        SELECT p."userId", p.id, p."timestamp"
+        FROM posts p
+        WHERE p."timestamp" IS NOT NULL
+        UNION
+        SELECT CASE WHEN c."senderId" = p."userId" THEN c."receiverId" ELSE c."senderId" END,
+               p.id, p."timestamp"
+        FROM posts p
+        JOIN connections c
+          ON c.status = 'ACCEPTED'
+         AND (c."senderId" = p."userId" OR c."receiverId" = p."userId")
+        WHERE p."timestamp" IS NOT NULL
+        ON CONFLICT DO NOTHING
+    """))
+
+
+def backfill_counters(conn) -> None:
+    """Populate engagement counters the first time they are deployed"""
+    if conn.execute(text("SELECT 1 FROM post_counters LIMIT 1")).first() is not None:
+        return
+    with Session(bind=conn) as db:
+        CounterService.rebuild(db)
+
+
+def add_connection_pair_key(conn) -> None:
+    """Backfill (lowUserId, highUserId) on connections, deduplicate pairs and enforce uniqueness"""
+    conn.execute(text('ALTER TABLE connections ADD COLUMN IF NOT EXISTS "lowUserId" INTEGER REFERENCES users(id)'))
+    conn.execute(text('ALTER TABLE connections ADD COLUMN IF NOT EXISTS "highUserId" INTEGER REFERENCES users(id)'))
+    conn.execute(text("""
+        UPDATE connections
+        SET "lowUserId" = LEAST("senderId", "receiverId"),
+            "highUserId" = GREATEST("senderId", "receiverId")
+        WHERE "lowUserId" IS NULL OR "highUserId" IS NULL
+    """))
+    # Keep one row per pair: accepted first, then blocked, pending, rejected; newest wins ties
+    conn.execute(text("""
+        DELETE FROM connections c
+        USING (
+            SELECT id, ROW_NUMBER() OVER (
+                PARTITION BY "lowUserId", "highUserId"
+                ORDER BY CASE status
+                    WHEN 'ACCEPTED' THEN 0
+                    WHEN 'BLOCKED' THEN 1
+                    WHEN 'PENDING' THEN 2
+                    ELSE 3
+                END, id DESC
+            ) AS rank
+            FROM connections
+        ) ranked
+        WHERE c.id = ranked.id AND ranked.rank > 1
+    """))
+    conn.execute(text('ALTER TABLE connections ALTER COLUMN "lowUserId" SET NOT NULL'))
+    conn.execute(text('ALTER TABLE connections ALTER COLUMN "highUserId" SET NOT NULL'))
+    conn.execute(text(
+        'CREATE UNIQUE INDEX IF NOT EXISTS uq_connections_pair ON connections ("lowUserId", "highUserId")'
+    ))
+    conn.execute(text(
+        'CREATE INDEX IF NOT EXISTS ix_connections_high_user ON connections ("highUserId")'
+    ))
+
+
+def add_chat_pair_key(conn) -> None:
+    """Normalize chats to user1Id < user2Id, merge duplicate chats and enforce uniqueness"""
+    conn.execute(text("""
+        UPDATE chats
+        SET "user1Id" = "user2Id", "user2Id" = "user1Id"
+        WHERE "user1Id" > "user2Id"
+    """))
+    # Move messages of duplicate chats into the oldest chat of the pair, then drop the duplicates
+    conn.execute(text("""
+        UPDATE messages m
+        SET "chatId" = ranked.keep_id
+        FROM (
+            SELECT id, MIN(id) OVER (PARTITION BY "user1Id", "user2Id") AS keep_id
+            FROM chats
+        ) ranked
+        WHERE m."chatId" = ranked.id AND ranked.id <> ranked.keep_id
+    """))
+    conn.execute(text("""
+        DELETE FROM chats c
+        USING (
+            SELECT id, MIN(id) OVER (PARTITION BY "user1Id", "user2Id") AS keep_id
+            FROM chats
+        ) ranked
+        WHERE c.id = ranked.id AND ranked.id <> ranked.keep_id
+    """))
+    conn.execute(text(
+        'CREATE UNIQUE INDEX IF NOT EXISTS uq_chats_pair ON chats ("user1Id", "user2Id")'
+    ))
+
+
+def add_messages_chat_index(conn) -> None:
+    """Index backing chat history and inbox last-activity lookups"""
+    conn.execute(text(
+        'CREATE INDEX IF NOT EXISTS ix_messages_chat_timestamp ON messages ("chatId", "timestamp")'
+    ))
+
+
+def add_messages_history_index(conn) -> None:
+    """Index backing id-cursor pagination of chat history"""
+    conn.execute(text(
+        'CREATE INDEX IF NOT EXISTS ix_messages_chat_id ON messages ("chatId", id)'
+    ))
+
+
+def add_chat_read_watermarks(conn) -> None:
+    """Replace messages.is_read with per-participant read watermarks on chats"""
+    conn.execute(text(
+        'ALTER TABLE chats ADD COLUMN IF NOT EXISTS "user1LastReadMessageId" INTEGER NOT NULL DEFAULT 0'
+    ))
+    conn.execute(text(
+        'ALTER TABLE chats ADD COLUMN IF NOT EXISTS "user2LastReadMessageId" INTEGER NOT NULL DEFAULT 0'
+    ))
+    has_is_read = conn.execute(text("""
+        SELECT 1 FROM information_schema.columns
+        WHERE table_name = 'messages' AND column_name = 'is_read'
+    """)).first() is not None
+    if not has_is_read:
+        return
+    # Each participant has read up to the newest message the other one sent that is marked read
+    conn.execute(text("""
+        UPDATE chats c
+        SET "user1LastReadMessageId" = GREATEST(c."user1LastReadMessageId", COALESCE(r.user1_read, 0)),
+            "user2LastReadMessageId" = GREATEST(c."user2LastReadMessageId", COALESCE(r.user2_read, 0))
+        FROM (
+            SELECT ch.id,
+                   MAX(m.id) FILTER (WHERE m."senderId" = ch."user2Id" AND m.is_read = 1) AS user1_read,
+                   MAX(m.id) FILTER (WHERE m."senderId" = ch."user1Id" AND m.is_read = 1) AS user2_read
+            FROM chats ch
+            JOIN messages m ON m."chatId" = ch.id
+            GROUP BY ch.id
+        ) r
+        WHERE c.id = r.id
+    """))
+    conn.execute(text('ALTER TABLE messages DROP COLUMN is_read'))
+
+
+def backfill_badges(conn) -> None:
+    """Populate badge counters the first time they are deployed"""
+    if conn.execute(text("SELECT 1 FROM user_badges LIMIT 1")).first() is not None:
+        return
+    with Session(bind=conn) as db:
+        BadgeService.rebuild(db)
+
+
+def add_message_seq(conn) -> None:
+    """Number existing messages 1, 2, 3... per chat and track each chat's last sequence number"""
+    conn.execute(text('ALTER TABLE chats ADD COLUMN IF NOT EXISTS "lastSeq" INTEGER NOT NULL DEFAULT 0'))
+    conn.execute(text('ALTER TABLE messages ADD COLUMN IF NOT EXISTS seq INTEGER'))
+    conn.execute(text("""
+        UPDATE messages m
+        SET seq = numbered.seq
+        FROM (
+            SELECT id, ROW_NUMBER() OVER (PARTITION BY "chatId" ORDER BY id) AS seq
+            FROM messages
+        ) numbered
+        WHERE m.id = numbered.id AND m.seq IS NULL
+    """))
+    conn.execute(text("""
+        UPDATE chats c
+        SET "lastSeq" = last.seq
+        FROM (SELECT "chatId", MAX(seq) AS seq FROM messages GROUP BY "chatId") last
+        WHERE c.id = last."chatId" AND c."lastSeq" < last.seq
+    """))
+    conn.execute(text('ALTER TABLE messages ALTER COLUMN seq SET NOT NULL'))
+    conn.execute(text(
+        'CREATE UNIQUE INDEX IF NOT EXISTS uq_messages_chat_seq ON messages ("chatId", seq)'
+    ))
+
+
+MIGRATIONS = [
+    add_posts_feed_index,
+    add_comments_post_index,
+    backfill_timelines,
+    backfill_counters,
+    add_connection_pair_key,
+    add_chat_pair_key,
+    add_messages_chat_index,
+    add_messages_history_index,
+    add_chat_read_watermarks,
+    backfill_badges,
+    add_message_seq,
+]
+
+
+def main() -> None:
+    # New tables first, so later steps can backfill them.
+    models.Base.metadata.create_all(bind=engine)
+
+    for migration in MIGRATIONS:
+        with engine.begin() as conn:
+            migration(conn)
+        print(f"✅ {migration.__name__}")
+
+
+if __name__ == "__main__":
+    main()
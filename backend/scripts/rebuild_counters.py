@@ -0,0 +1,49 @@
+"""
+Rebuild the denormalized counters from the base tables.
+
+Recomputes post_counters and comment_counters from the reactions and
+comments tables, and user_badges from the chats, messages and connections
+tables. Run it after bulk edits made outside the API or whenever the
+counters are suspected to have drifted.
+
+Usage:
+  python scripts/rebuild_counters.py
+"""
+import sys
+from pathlib import Path
+
+# Ensure project root is importable when running as: python scripts/rebuild_counters.py
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+import models
+from database import SessionLocal, engine
+from models.post import PostCounters, CommentCounters
+from models.user import UserBadges
+from services.counter_service import CounterService
+from services.badge_service import BadgeService
+
+
+def main() -> None:
+    # Ensure the counter tables exist before rebuilding them.
+    models.Base.metadata.create_all(bind=engine)
+
+    db = SessionLocal()
+    try:
+        CounterService.rebuild(db)
+        BadgeService.rebuild(db)
+        db.commit()
+        print("✅ Counters rebuilt.")
+        print(f"Posts: {db.query(PostCounters).count()}")
+        print(f"Comments: {db.query(CommentCounters).count()}")
+        print(f"User badges: {db.query(UserBadges).count()}")
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
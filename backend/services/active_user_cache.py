@@ -0,0 +1,43 @@
+"""
+In-process cache of user IDs known to exist.
+
+WebSocket authentication only needs to know that the user behind a valid
+token still exists. Each ID is checked once with a single-column query on
+a plain connection (no ORM session or eager loads) and then served from
+memory, so reconnect storms after a restart cost one query per user instead
+of one per socket. Deleting a user invalidates the ID; the TTL bounds how
+long another worker process keeps accepting it.
+"""
+from sqlalchemy import select
+from database import engine
+from models.user import User
+from services.cache import TTLCache
+
+
+_active_ids = TTLCache(maxsize=50000, ttl=300)
+
+
+class ActiveUserCache:
+
+    @staticmethod
+    def is_cached(user_id: int) -> bool:
+        """Check the cache only; never queries the database"""
+        return _active_ids.get(user_id, False)
+
+    @staticmethod
+    def exists(user_id: int) -> bool:
+        """Check whether a user exists, querying the database on a cache miss"""
+        if _active_ids.get(user_id, False):
+            return True
+        with engine.connect() as connection:
+            found = connection.execute(
+                select(User.__table__.c.id).where(User.__table__.c.id == user_id)
+            ).first() is not None
+        if found:
+            _active_ids.set(user_id, True)
+        return found
+
+    @staticmethod
+    def invalidate(*user_ids: int) -> None:
+        """Forget deleted users"""
+        _active_ids.invalidate(*user_ids)
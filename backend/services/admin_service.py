@@ -8,6 +8,13 @@ from models.organisation import (
 )
 from models.user import User, UserType
 from models.post import Post, Comment, Reaction
+from models.chat import Chat
+from services.counter_service import CounterService
+from services.badge_service import BadgeService
+from services.chat_membership_cache import ChatMembershipCache
+from services.active_user_cache import ActiveUserCache
+from services.connection_graph_cache import ConnectionGraphCache
+from services.social_graph import social_graph
 from models.user import Projet
 from typing import Optional
 
@@ -467,8 +474,32 @@ class AdminService:
             # Optional: Add additional check if needed
             pass
         
+        # The user's comments and reactions on other people's content go with them
+        affected_post_ids = {post_id for (post_id,) in db.query(Comment.postId).filter(
+            Comment.userId == user_id
+        )} | {post_id for (post_id,) in db.query(Reaction.postId).filter(
+            Reaction.userId == user_id, Reaction.postId.isnot(None)
+        )}
+        affected_comment_ids = {comment_id for (comment_id,) in db.query(Reaction.commentId).filter(
+            Reaction.userId == user_id, Reaction.commentId.isnot(None)
+        )}
+        
+        # Everyone with a connection row to the user, whatever its status
+        counterpart_ids = set(ConnectionGraphCache.get_statuses(db, user_id))
+        chats = db.query(Chat.id, Chat.user1Id, Chat.user2Id).filter(
+            (Chat.user1Id == user_id) | (Chat.user2Id == user_id)
+        ).all()
+        chat_partner_ids = {user1_id if user2_id == user_id else user2_id for _, user1_id, user2_id in chats}
+        
         db.delete(user)
+        db.flush()
+        CounterService.rebuild(db, post_ids=affected_post_ids, comment_ids=affected_comment_ids)
+        BadgeService.rebuild(db, user_ids=counterpart_ids | chat_partner_ids)
         db.commit()
+        ConnectionGraphCache.invalidate(user_id, *counterpart_ids)
+        social_graph.invalidate()
+        ChatMembershipCache.invalidate(*[chat_id for chat_id, _, _ in chats])
+        ActiveUserCache.invalidate(user_id)
         
         return {"message": f"User with ID {user_id} and all related data deleted successfully"}
 
@@ -493,12 +524,32 @@ class AdminService:
         total = db.query(Post).count()
         
         posts = db.query(Post).options(
-            joinedload(Post.user),
-            joinedload(Post.comments),
-            joinedload(Post.reactions)
+            joinedload(Post.user)
         ).order_by(desc(Post.timestamp)).offset(skip).limit(limit).all()
         
-        return {"total": total, "posts": posts}
+        # Engagement comes from the denormalized counters, not the reaction/comment rows
+        counters = CounterService.get_post_counters(db, [post.id for post in posts])
+        
+        return {
+            "total": total,
+            "posts": [
+                {
+                    "id": post.id,
+                    "content": post.content,
+                    "timestamp": post.timestamp,
+                    "attachement": post.attachement,
+                    "isPublic": post.isPublic,
+                    "userId": post.userId,
+                    "user": {
+                        "id": post.user.id,
+                        "fullName": post.user.fullName,
+                        "photoDeProfil": post.user.photoDeProfil
+                    },
+                    **counters[post.id]
+                }
+                for post in posts
+            ]
+        }
 
     @staticmethod
     def get_post_by_id(db: Session, post_id: int) -> Post:
@@ -585,6 +636,7 @@ class AdminService:
                 detail=f"Comment with ID {comment_id} not found"
             )
         
+        CounterService.comment_removed(db, comment.postId)
         db.delete(comment)
         db.commit()
         
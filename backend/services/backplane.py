@@ -0,0 +1,231 @@
+"""
+Pub/sub backplane behind ConnectionManager broadcasts.
+
+Every broadcast is published once as an envelope; every worker process
+receives it and delivers it to the sockets it holds locally. The in-memory
+backplane hands envelopes straight back to the local manager (single
+worker). The Postgres backplane relays them through LISTEN/NOTIFY on the
+application database, so several uvicorn workers or nodes can share
+broadcasts without a new service.
+
+Select one with the WEBSOCKET_BACKPLANE setting ("memory" or "postgres").
+"""
+import asyncio
+import json
+import logging
+import select
+import threading
+import time
+import uuid
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+Deliver = Callable[[dict], Awaitable[None]]
+
+
+class InMemoryBackplane:
+    """Delivers published envelopes to the local process only"""
+
+    def __init__(self):
+        self._deliver: Optional[Deliver] = None
+
+    async def start(self, deliver: Deliver):
+        self._deliver = deliver
+
+    async def publish(self, envelope: dict):
+        if self._deliver is not None:
+            await self._deliver(envelope)
+
+    async def stop(self):
+        self._deliver = None
+
+
+class PostgresBackplane:
+    """
+    Relays envelopes through Postgres LISTEN/NOTIFY.
+
+    NOTIFY payloads are limited to 8000 bytes, so larger envelopes are split
+    into chunks sent in one transaction; Postgres delivers a transaction's
+    notifications together and in order, and listeners reassemble them.
+
+    If a connection is lost it is reopened (and LISTEN issued again) with a
+    growing delay; notifications sent while the listener was away are lost,
+    as with any socket that drops and reconnects.
+    """
+
+    CHANNEL = "ws_broadcast"
+    # Payload characters per notification; JSON-escaping a chunk can double it
+    # and the result must stay under the 8000-byte NOTIFY limit
+    CHUNK_SIZE = 3500
+    # Delay before reopening a lost listener connection, doubled on each failure
+    RECONNECT_DELAY_SECONDS = 1.0
+    MAX_RECONNECT_DELAY_SECONDS = 30.0
+    # A transaction's chunks arrive together, so an envelope still incomplete after
+    # this long lost a chunk; at most MAX_PARTIAL_ENVELOPES are buffered at once
+    PARTIAL_TIMEOUT_SECONDS = 10.0
+    MAX_PARTIAL_ENVELOPES = 100
+
+    def __init__(self, engine):
+        self._engine = engine
+        self._deliver: Optional[Deliver] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._listen_connection = None
+        self._publish_connection = None
+        self._publish_lock = threading.Lock()
+        self._listener: Optional[threading.Thread] = None
+        self._stopping = threading.Event()
+        # chunk ID -> (monotonic time of its first chunk, chunks received), oldest first
+        self._partial: Dict[str, Tuple[float, List[str]]] = {}
+        self._inbox: Optional[asyncio.Queue] = None
+        self._dispatcher: Optional[asyncio.Task] = None
+
+    async def start(self, deliver: Deliver):
+        self._deliver = deliver
+        self._loop = asyncio.get_running_loop()
+        self._listen_connection = self._open_listen_connection()
+        self._publish_connection = self._autocommit_connection()
+        self._inbox = asyncio.Queue()
+        self._dispatcher = asyncio.create_task(self._dispatch())
+        self._stopping.clear()
+        self._listener = threading.Thread(target=self._listen, name="ws-backplane", daemon=True)
+        self._listener.start()
+
+    async def publish(self, envelope: dict):
+        payload = json.dumps(envelope, separators=(",", ":"), default=str)
+        await asyncio.to_thread(self._notify, payload)
+
+    async def stop(self):
+        self._stopping.set()
+        if self._listener is not None:
+            await asyncio.to_thread(self._listener.join, 5)
+        if self._dispatcher is not None:
+            self._dispatcher.cancel()
+        for connection in (self._listen_connection, self._publish_connection):
+            self._close_quietly(connection)
+        self._listen_connection = self._publish_connection = self._listener = self._dispatcher = None
+
+    # ==================== INTERNALS ====================
+
+    def _autocommit_connection(self):
+        """A dedicated DBAPI connection, detached from the SQLAlchemy pool"""
+        pooled = self._engine.raw_connection()
+        pooled.detach()
+        connection = pooled.dbapi_connection
+        connection.autocommit = True
+        return connection
+
+    def _open_listen_connection(self):
+        connection = self._autocommit_connection()
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(f"LISTEN {self.CHANNEL}")
+        except Exception:
+            self._close_quietly(connection)
+            raise
+        return connection
+
+    @staticmethod
+    def _close_quietly(connection):
+        if connection is None:
+            return
+        try:
+            connection.close()
+        except Exception:
+            pass  # Connection may already be broken
+
+    def _notify(self, payload: str):
+        if len(payload) <= self.CHUNK_SIZE:
+            notifications = [payload]
+        else:
+            message_id = uuid.uuid4().hex
+            chunks = [payload[i:i + self.CHUNK_SIZE] for i in range(0, len(payload), self.CHUNK_SIZE)]
+            notifications = [
+                json.dumps({"chunk": message_id, "index": index, "count": len(chunks), "data": chunk})
+                for index, chunk in enumerate(chunks)
+            ]
+        with self._publish_lock:
+            if self._publish_connection.closed:
+                # Lost on an earlier publish; that one failed, this one gets a new connection
+                self._publish_connection = self._autocommit_connection()
+            with self._publish_connection.cursor() as cursor:
+                if len(notifications) > 1:
+                    cursor.execute("BEGIN")
+                for notification in notifications:
+                    cursor.execute("SELECT pg_notify(%s, %s)", (self.CHANNEL, notification))
+                if len(notifications) > 1:
+                    cursor.execute("COMMIT")
+
+    def _listen(self):
+        """Wait for notifications on a background thread and hand them to the event loop"""
+        delay = self.RECONNECT_DELAY_SECONDS
+        while not self._stopping.is_set():
+            try:
+                if self._listen_connection is None:
+                    self._listen_connection = self._open_listen_connection()
+                    logger.info("Backplane listener reconnected")
+                connection = self._listen_connection
+                if select.select([connection], [], [], 1.0) == ([], [], []):
+                    continue
+                connection.poll()
+            except Exception as e:
+                logger.error(f"Backplane listener error, reconnecting in {delay:.0f}s: {e}", exc_info=True)
+                self._close_quietly(self._listen_connection)
+                self._listen_connection = None
+                # Chunks of an envelope split across the outage can never complete
+                self._partial.clear()
+                self._stopping.wait(delay)
+                delay = min(delay * 2, self.MAX_RECONNECT_DELAY_SECONDS)
+                continue
+            delay = self.RECONNECT_DELAY_SECONDS
+            while connection.notifies:
+                notification = connection.notifies.pop(0)
+                envelope = self._assemble(notification.payload)
+                if envelope is not None:
+                    self._loop.call_soon_threadsafe(self._inbox.put_nowait, envelope)
+
+    async def _dispatch(self):
+        """Deliver received envelopes one at a time, in the order they were published"""
+        while True:
+            envelope = await self._inbox.get()
+            try:
+                await self._deliver(envelope)
+            except Exception as e:
+                logger.error(f"Backplane delivery error: {e}", exc_info=True)
+
+    def _assemble(self, payload: str) -> Optional[dict]:
+        try:
+            message = json.loads(payload)
+        except json.JSONDecodeError:
+            logger.error("Backplane received a malformed notification")
+            return None
+        if "chunk" not in message:
+            return message
+        now = time.monotonic()
+        self._evict_partial(now)
+        _, chunks = self._partial.setdefault(message["chunk"], (now, []))
+        chunks.append(message["data"])
+        if len(chunks) < message["count"]:
+            return None
+        del self._partial[message["chunk"]]
+        return json.loads("".join(chunks))
+
+    def _evict_partial(self, now: float):
+        """Drop chunked envelopes that can no longer complete, oldest first"""
+        while self._partial:
+            chunk_id, (started, _) = next(iter(self._partial.items()))
+            expired = now - started > self.PARTIAL_TIMEOUT_SECONDS
+            if not expired and len(self._partial) < self.MAX_PARTIAL_ENVELOPES:
+                return
+            del self._partial[chunk_id]
+            logger.warning(f"Backplane dropped incomplete chunked envelope {chunk_id}")
+
+
+def create_backplane(kind: str):
+    """Build the backplane named by the WEBSOCKET_BACKPLANE setting"""
+    if kind == "memory":
+        return InMemoryBackplane()
+    if kind == "postgres":
+        from database import engine
+        return PostgresBackplane(engine)
+    raise ValueError(f"Unknown WEBSOCKET_BACKPLANE: {kind!r} (expected 'memory' or 'postgres')")
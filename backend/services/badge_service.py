@@ -0,0 +1,111 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import case, delete, func, or_, select
+from sqlalchemy.dialects.postgresql import insert
+from models.chat import Chat, Message
+from models.connection import Connection, ConnectionStatus
+from models.user import User, UserBadges
+from services.websocket_manager import manager
+from typing import Dict, Iterable, Optional
+
+
+class BadgeService:
+    """Per-user unread-message and pending-connection counters.
+
+    Callers bump the counters in the same transaction as the write they
+    describe; rebuild() recomputes them from the chats, messages and
+    connections tables if they ever drift.
+    """
+
+    @staticmethod
+    def bump(db: Session, user_id: int, unread_messages: int = 0, pending_connections: int = 0):
+        """Atomically add deltas to a user's badges, never going below zero"""
+        deltas = {"unreadMessages": unread_messages, "pendingConnections": pending_connections}
+        deltas = {column: delta for column, delta in deltas.items() if delta}
+        if not deltas:
+            return
+        table = UserBadges.__table__
+        db.execute(
+            insert(UserBadges).values(
+                {"userId": user_id, **{column: max(delta, 0) for column, delta in deltas.items()}}
+            ).on_conflict_do_update(
+                index_elements=["userId"],
+                set_={column: func.greatest(table.c[column] + delta, 0) for column, delta in deltas.items()}
+            )
+        )
+
+    @staticmethod
+    def count_unread(
+        db: Session, chat: Chat, user_id: int, up_to_id: Optional[int] = None, after_id: Optional[int] = None
+    ) -> int:
+        """Count messages in a chat that user_id has not read, optionally only in (after_id, up_to_id]
+
+        after_id defaults to the user's read watermark as loaded on chat.
+        """
+        if after_id is None:
+            after_id = chat.last_read_message_id(user_id)
+        query = db.query(func.count(Message.id)).filter(
+            Message.chatId == chat.id,
+            Message.senderId != user_id,
+            Message.id > after_id
+        )
+        if up_to_id is not None:
+            query = query.filter(Message.id <= up_to_id)
+        return query.scalar() or 0
+
+    @staticmethod
+    def get_badges(db: Session, user_id: int) -> Dict[str, int]:
+        """Return {"unreadMessages": n, "pendingConnections": n} for a user"""
+        badges = db.query(UserBadges).filter(UserBadges.userId == user_id).first()
+        return {
+            "unreadMessages": badges.unreadMessages if badges else 0,
+            "pendingConnections": badges.pendingConnections if badges else 0
+        }
+
+    @staticmethod
+    def rebuild(db: Session, user_ids: Optional[Iterable[int]] = None):
+        """Recompute badges from the base tables, for every user or only the given ones. Does not commit."""
+        user_ids = None if user_ids is None else list(user_ids)
+        if user_ids is not None and not user_ids:
+            return
+
+        # Unread messages per recipient: messages from the other participant above the recipient's watermark
+        recipient = case((Message.senderId == Chat.user1Id, Chat.user2Id), else_=Chat.user1Id)
+        watermark = case(
+            (Message.senderId == Chat.user1Id, Chat.user2LastReadMessageId),
+            else_=Chat.user1LastReadMessageId
+        )
+        unread = select(
+            recipient.label("userId"),
+            func.count(Message.id).label("unreadMessages")
+        ).join(Chat, Chat.id == Message.chatId).where(Message.id > watermark).group_by(recipient).subquery()
+
+        pending = select(
+            Connection.receiverId.label("userId"),
+            func.count(Connection.id).label("pendingConnections")
+        ).where(Connection.status == ConnectionStatus.PENDING).group_by(Connection.receiverId).subquery()
+
+        rows = select(
+            User.id,
+            func.coalesce(unread.c.unreadMessages, 0),
+            func.coalesce(pending.c.pendingConnections, 0)
+        ).outerjoin(unread, unread.c.userId == User.id).outerjoin(
+            pending, pending.c.userId == User.id
+        ).where(or_(unread.c.userId.isnot(None), pending.c.userId.isnot(None)))
+
+        stale = delete(UserBadges)
+        if user_ids is not None:
+            rows = rows.where(User.id.in_(user_ids))
+            stale = stale.where(UserBadges.userId.in_(user_ids))
+
+        db.execute(stale)
+        db.execute(insert(UserBadges).from_select(["userId", "unreadMessages", "pendingConnections"], rows))
+
+
+async def push_badges(db: Session, *user_ids: int):
+    """Send the current badges of the given users on the notifications channel"""
+    for user_id in set(user_ids):
+        await manager.broadcast_to_user(
+            "notifications",
+            user_id,
+            {"type": "badges", **BadgeService.get_badges(db, user_id)}
+        )
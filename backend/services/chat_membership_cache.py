@@ -0,0 +1,44 @@
+"""
+In-process cache of chat participants.
+
+WebSocket chat handlers need to know who the two participants of a chat are
+to check access and address events. Participants never change for the life
+of a chat, so they are cached by chat ID and only dropped when the chat is
+deleted; the TTL bounds how long another worker process can keep a deleted
+chat.
+"""
+from sqlalchemy.orm import Session
+from typing import Optional, Tuple
+from models.chat import Chat
+from services.cache import TTLCache
+
+
+_participants = TTLCache(maxsize=10000, ttl=3600)
+
+
+class ChatMembershipCache:
+
+    @staticmethod
+    def get_participants(db: Session, chat_id: int) -> Optional[Tuple[int, int]]:
+        """Return (user1Id, user2Id) of a chat, or None if it does not exist"""
+        participants = _participants.get(chat_id)
+        if participants is None:
+            row = db.query(Chat.user1Id, Chat.user2Id).filter(Chat.id == chat_id).first()
+            if row is None:
+                return None
+            participants = (row.user1Id, row.user2Id)
+            _participants.set(chat_id, participants)
+        return participants
+
+    @staticmethod
+    def get_other_participant(db: Session, chat_id: int, user_id: int) -> Optional[int]:
+        """Return the other participant of a chat, or None if user_id is not part of it"""
+        participants = ChatMembershipCache.get_participants(db, chat_id)
+        if participants is None or user_id not in participants:
+            return None
+        return participants[1] if participants[0] == user_id else participants[0]
+
+    @staticmethod
+    def invalidate(*chat_ids: int) -> None:
+        """Forget the participants of deleted chats"""
+        _participants.invalidate(*chat_ids)
@@ -1,11 +1,19 @@
 from sqlalchemy.orm import Session, joinedload
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy import case, func, select, update
 from fastapi import HTTPException, status
 from models.chat import Chat, Message
 from models.user import User
 from datetime import datetime, timezone
+from typing import Optional
 from services.file_utils import delete_file_from_url
+from services.badge_service import BadgeService
+from services.chat_membership_cache import ChatMembershipCache
 
 class ChatService:
+    # Messages per history page when no limit is given
+    DEFAULT_PAGE_SIZE = 50
+
     @staticmethod
     def get_or_create_chat(db: Session, user1: User, user2_id: int):
         """Get existing chat or create a new one between two users"""
@@ -17,28 +25,33 @@ class ChatService:
         if not receiver:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Receiver not found")
         
-        # Look for existing chat between these two users
-        chat = db.query(Chat).options(
+        # Look for existing chat between these two users.
+        # Ensure consistent ordering: smaller id as user1, larger as user2
+        user1_id = min(user1.id, user2_id)
+        user2_id_normalized = max(user1.id, user2_id)
+        chat_query = db.query(Chat).options(
             joinedload(Chat.user1),
             joinedload(Chat.user2)
         ).filter(
-            ((Chat.user1Id == user1.id) & (Chat.user2Id == user2_id)) |
-            ((Chat.user1Id == user2_id) & (Chat.user2Id == user1.id))
-        ).first()
+            Chat.user1Id == user1_id,
+            Chat.user2Id == user2_id_normalized
+        )
+        chat = chat_query.first()
         
         # If no chat exists, create one
         if not chat:
-            # Ensure consistent ordering: smaller id as user1, larger as user2
-            user1_id = min(user1.id, user2_id)
-            user2_id_normalized = max(user1.id, user2_id)
-            
             chat = Chat(
                 user1Id=user1_id,
                 user2Id=user2_id_normalized
             )
             db.add(chat)
-            db.commit()
-            db.refresh(chat, ["user1", "user2"])
+            try:
+                db.commit()
+                db.refresh(chat, ["user1", "user2"])
+            except IntegrityError:
+                # A concurrent request created the chat first
+                db.rollback()
+                chat = chat_query.first()
         
         return chat
 
@@ -67,14 +80,50 @@ class ChatService:
             content=(content or "").strip(),
             attachment=attachment.strip() if attachment else None,
             timestamp=datetime.now(timezone.utc),
+            seq=ChatService.reserve_seqs(db, chat.id),
             chatId=chat.id,
             senderId=sender.id
         )
         db.add(message)
+        BadgeService.bump(db, receiver_id, unread_messages=1)
         db.commit()
         db.refresh(message)
         return message
 
+    @staticmethod
+    def reserve_seqs(db: Session, chat_id: int, count: int = 1) -> int:
+        """Reserve `count` consecutive sequence numbers in a chat and return the first one.
+
+        The UPDATE locks the chat row until the transaction ends, so concurrent
+        writers to the same chat get disjoint, increasing ranges.
+        """
+        last_seq = db.execute(
+            update(Chat).where(Chat.id == chat_id).values(lastSeq=Chat.lastSeq + count).returning(Chat.lastSeq)
+        ).scalar_one()
+        return last_seq - count + 1
+
+    @staticmethod
+    def get_messages_since(db: Session, chat_id: int, since_seq: int, limit: int):
+        """Messages of a chat with seq greater than since_seq, in seq order"""
+        return db.query(Message).filter(
+            Message.chatId == chat_id,
+            Message.seq > since_seq
+        ).order_by(Message.seq).limit(limit).all()
+
+    @staticmethod
+    def new_message_event(message_id: int, sender_id: int, seq: int, content: str,
+                          attachment: Optional[str], timestamp: Optional[datetime]) -> dict:
+        """WebSocket payload announcing a stored message"""
+        return {
+            "type": "new_message",
+            "message_id": message_id,
+            "seq": seq,
+            "sender_id": sender_id,
+            "content": content,
+            "attachment": attachment,
+            "timestamp": timestamp.isoformat() if timestamp else None,
+        }
+
     @staticmethod
     def get_chat(db: Session, chat_id: int, current_user: User):
         """Get chat details by ID"""
@@ -103,10 +152,98 @@ class ChatService:
         return chats
 
     @staticmethod
-    def get_chat_messages(db: Session, chat_id: int, current_user: User):
-        """Get all messages in a chat"""
+    def get_inbox(db: Session, current_user: User):
+        """List the current user's chats with last message and unread count, most recent activity first.
+
+        Message statistics come from a single grouped subquery joined back to
+        the chats, so the cost does not grow with the number of chats or messages.
+        """
+        stats = select(
+            Message.chatId.label("chatId"),
+            func.max(Message.id).label("lastMessageId"),
+            func.count(Message.id).filter(
+                Message.senderId != current_user.id,
+                Message.id > ChatService._last_read_column(current_user.id)
+            ).label("unreadCount")
+        ).join(Chat, Chat.id == Message.chatId).where(
+            (Chat.user1Id == current_user.id) | (Chat.user2Id == current_user.id)
+        ).group_by(Message.chatId).subquery()
+
+        rows = db.query(Chat, Message, stats.c.unreadCount).options(
+            joinedload(Chat.user1),
+            joinedload(Chat.user2)
+        ).outerjoin(stats, stats.c.chatId == Chat.id).outerjoin(
+            Message, Message.id == stats.c.lastMessageId
+        ).filter(
+            (Chat.user1Id == current_user.id) | (Chat.user2Id == current_user.id)
+        ).order_by(Message.timestamp.desc().nullslast(), Chat.id.desc()).all()
+
+        return [
+            {
+                "id": chat.id,
+                "user1Id": chat.user1Id,
+                "user2Id": chat.user2Id,
+                "user1": chat.user1,
+                "user2": chat.user2,
+                "lastMessage": last_message,
+                "lastActivity": last_message.timestamp if last_message else None,
+                "unreadCount": unread_count or 0
+            }
+            for chat, last_message, unread_count in rows
+        ]
+
+    @staticmethod
+    def get_chat_messages(db: Session, chat_id: int, current_user: User,
+                          before: Optional[int] = None, after: Optional[int] = None,
+                          limit: Optional[int] = None):
+        """Get one page of messages in a chat, oldest first.
+
+        At most `limit` (default DEFAULT_PAGE_SIZE) messages are read from the
+        (chatId, id) order: the newest messages older than `before`, the
+        oldest messages newer than `after`, or the newest messages when no
+        cursor is given.
+        """
+        ChatService.get_chat(db, chat_id, current_user)
+        query = db.query(Message).filter(Message.chatId == chat_id)
+        return ChatService._message_page(query, before, after, limit or ChatService.DEFAULT_PAGE_SIZE)
+
+    @staticmethod
+    def get_chat_detail(db: Session, chat_id: int, current_user: User, limit: Optional[int] = None):
+        """Get a chat with its latest `limit` (default DEFAULT_PAGE_SIZE) messages"""
         chat = ChatService.get_chat(db, chat_id, current_user)
-        return chat.messages
+        messages = ChatService._message_page(
+            db.query(Message).filter(Message.chatId == chat_id), None, None, limit or ChatService.DEFAULT_PAGE_SIZE
+        )
+        return {
+            "id": chat.id,
+            "user1Id": chat.user1Id,
+            "user2Id": chat.user2Id,
+            "user1": chat.user1,
+            "user2": chat.user2,
+            "messages": messages
+        }
+
+    @staticmethod
+    def _last_read_column(user_id: int):
+        """SQL expression for user_id's read watermark on a chat row"""
+        return case(
+            (Chat.user1Id == user_id, Chat.user1LastReadMessageId),
+            else_=Chat.user2LastReadMessageId
+        )
+
+    @staticmethod
+    def _message_page(query, before: Optional[int], after: Optional[int], limit: int):
+        """Read one page of messages by id cursor, returned oldest first"""
+        if after is not None:
+            query = query.filter(Message.id > after)
+            if before is not None:
+                query = query.filter(Message.id < before)
+            return query.order_by(Message.id).limit(limit).all()
+        if before is not None:
+            query = query.filter(Message.id < before)
+        page = query.order_by(Message.id.desc()).limit(limit).all()
+        page.reverse()
+        return page
 
     @staticmethod
     def get_or_create_chat_with_user(db: Session, current_user: User, other_user_id: int):
@@ -115,18 +252,31 @@ class ChatService:
 
     @staticmethod
     def mark_chat_as_read(db: Session, chat_id: int, current_user: User):
-        """Mark all messages in a chat as read by the current user (all messages not sent by them)"""
+        """Mark all messages in a chat as read by the current user (all messages not sent by them).
+
+        Moves the user's read watermark up to the newest message; it never
+        moves backwards. The watermark is read under a row lock and only
+        advanced if it still holds the value read, so concurrent calls (tabs,
+        devices) each subtract only the messages they moved past from the badge.
+        """
         chat = ChatService.get_chat(db, chat_id, current_user)
-        
-        # Mark all messages from the other user as read
-        messages = db.query(Message).filter(
-            Message.chatId == chat_id,
-            Message.senderId != current_user.id
-        ).all()
-        
-        for message in messages:
-            message.is_read = 1
-        
+        column = getattr(Chat, "user1LastReadMessageId" if chat.user1Id == current_user.id else "user2LastReadMessageId")
+        newest_id = db.query(func.max(Message.id)).filter(Message.chatId == chat_id).scalar() or 0
+        while True:
+            old_id = db.query(column).filter(Chat.id == chat_id).with_for_update().scalar()
+            if newest_id <= old_id:
+                db.rollback()
+                return {"message": "Chat marked as read"}
+            advanced = db.execute(
+                update(Chat).where(Chat.id == chat_id, column == old_id).values({column: newest_id})
+            ).rowcount
+            if advanced:
+                break
+            # Another request moved the watermark in between; start over from its value
+            db.rollback()
+
+        newly_read = BadgeService.count_unread(db, chat, current_user.id, up_to_id=newest_id, after_id=old_id)
+        BadgeService.bump(db, current_user.id, unread_messages=-newly_read)
         db.commit()
         return {"message": "Chat marked as read"}
 
@@ -144,6 +294,11 @@ class ChatService:
         if message.attachment:
             delete_file_from_url(message.attachment)
 
+        chat = message.chat
+        recipient_id = chat.user2Id if message.senderId == chat.user1Id else chat.user1Id
+        if message.id > chat.last_read_message_id(recipient_id):
+            BadgeService.bump(db, recipient_id, unread_messages=-1)
+
         db.delete(message)
         db.commit()
         return {"message": "Message deleted successfully"}
@@ -156,8 +311,11 @@ class ChatService:
         for message in messages:
             if message.attachment:
                 delete_file_from_url(message.attachment)
+        for user_id in (chat.user1Id, chat.user2Id):
+            BadgeService.bump(db, user_id, unread_messages=-BadgeService.count_unread(db, chat, user_id))
         db.delete(chat)
         db.commit()
+        ChatMembershipCache.invalidate(chat_id)
         return {"message": "Chat deleted successfully"}
 
 
@@ -0,0 +1,83 @@
+"""
+In-process cache of the accepted-connection graph.
+
+Visibility checks on posts, comments, reactions, feeds and CVs all ask
+"who is this user connected to?". The answer is cached per user as a
+frozenset so those checks become set lookups. Each user's connection rows of
+any status are cached alongside it for connection-status lookups.
+ConnectionService invalidates both users on every connection write; the TTL
+bounds how stale another worker process can be.
+"""
+from sqlalchemy.orm import Session
+from typing import Dict, FrozenSet, Tuple
+from config import settings
+from models.connection import Connection, ConnectionStatus
+from services.cache import TTLCache
+
+
+_adjacency = TTLCache(
+    maxsize=settings.CONNECTION_CACHE_MAX_USERS,
+    ttl=settings.CONNECTION_CACHE_TTL_SECONDS
+)
+
+# user_id -> {other_user_id: (status, connection_id)} for every connection row of the user
+_statuses = TTLCache(
+    maxsize=settings.CONNECTION_CACHE_MAX_USERS,
+    ttl=settings.CONNECTION_CACHE_TTL_SECONDS
+)
+
+
+class ConnectionGraphCache:
+
+    @staticmethod
+    def get_connected_ids(db: Session, user_id: int) -> FrozenSet[int]:
+        """Return the IDs of the users the given user is connected to"""
+        connected_ids = _adjacency.get(user_id)
+        if connected_ids is None:
+            rows = db.query(Connection.lowUserId, Connection.highUserId).filter(
+                Connection.status == ConnectionStatus.ACCEPTED,
+                (Connection.lowUserId == user_id) | (Connection.highUserId == user_id)
+            ).all()
+            connected_ids = frozenset(
+                high_user_id if low_user_id == user_id else low_user_id
+                for low_user_id, high_user_id in rows
+            )
+            _adjacency.set(user_id, connected_ids)
+        return connected_ids
+
+    @staticmethod
+    def are_connected(db: Session, user1_id: int, user2_id: int) -> bool:
+        """Check if two users are connected"""
+        return user2_id in ConnectionGraphCache.get_connected_ids(db, user1_id)
+
+    @staticmethod
+    def get_statuses(db: Session, user_id: int) -> Dict[int, Tuple[str, int]]:
+        """Return {other_user_id: (status, connection_id)} for every connection row of the user.
+
+        Pending requests are reported from the user's side as "pending_in" or
+        "pending_out"; other statuses keep their ConnectionStatus value.
+        """
+        statuses = _statuses.get(user_id)
+        if statuses is None:
+            rows = db.query(
+                Connection.id, Connection.status, Connection.senderId,
+                Connection.lowUserId, Connection.highUserId
+            ).filter(
+                (Connection.lowUserId == user_id) | (Connection.highUserId == user_id)
+            ).all()
+            statuses = {}
+            for connection_id, connection_status, sender_id, low_user_id, high_user_id in rows:
+                if connection_status == ConnectionStatus.PENDING:
+                    value = "pending_out" if sender_id == user_id else "pending_in"
+                else:
+                    value = connection_status.value
+                other_user_id = high_user_id if low_user_id == user_id else low_user_id
+                statuses[other_user_id] = (value, connection_id)
+            _statuses.set(user_id, statuses)
+        return statuses
+
+    @staticmethod
+    def invalidate(*user_ids: int) -> None:
+        """Forget the cached connections and connection statuses of the given users"""
+        _adjacency.invalidate(*user_ids)
+        _statuses.invalidate(*user_ids)
@@ -1,8 +1,16 @@
 from sqlalchemy.orm import Session, joinedload
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy import case, func, select, union_all, update
 from fastapi import HTTPException, status
 from models.connection import Connection, ConnectionStatus
 from models.user import User
 from datetime import datetime, timezone
+from typing import Dict, List
+from services.timeline_service import TimelineService
+from services.connection_graph_cache import ConnectionGraphCache
+from services.social_graph import social_graph
+from services.recommendation_service import people_recommender
+from services.badge_service import BadgeService
 
 class ConnectionService:
     @staticmethod
@@ -11,9 +19,10 @@ class ConnectionService:
         if sender.id == receiver_id:
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Cannot send connection request to yourself")
         # Check existing request or existing accepted connection
+        low_user_id, high_user_id = Connection.pair_key(sender.id, receiver_id)
         existing = db.query(Connection).filter(
-            ((Connection.senderId == sender.id) & (Connection.receiverId == receiver_id)) |
-            ((Connection.senderId == receiver_id) & (Connection.receiverId == sender.id))
+            Connection.lowUserId == low_user_id,
+            Connection.highUserId == high_user_id
         ).first()
         if existing:
             # If there is already an accepted connection
@@ -22,15 +31,35 @@ class ConnectionService:
             # If pending, inform
             if existing.status == ConnectionStatus.PENDING:
                 raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Connection request already pending")
-        # Create new pending connection
-        conn = Connection(
-            status=ConnectionStatus.PENDING,
-            timestamp=datetime.now(timezone.utc),
-            senderId=sender.id,
-            receiverId=receiver_id
-        )
-        db.add(conn)
-        db.commit()
+            if existing.status == ConnectionStatus.BLOCKED:
+                raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Cannot send connection request to this user")
+            # A rejected request is reopened in place, since each pair has a single row
+            conn = existing
+            conn.status = ConnectionStatus.PENDING
+            conn.timestamp = datetime.now(timezone.utc)
+            conn.acceptedAt = None
+            conn.senderId = sender.id
+            conn.receiverId = receiver_id
+        else:
+            # Create new pending connection
+            conn = Connection(
+                status=ConnectionStatus.PENDING,
+                timestamp=datetime.now(timezone.utc),
+                senderId=sender.id,
+                receiverId=receiver_id,
+                lowUserId=low_user_id,
+                highUserId=high_user_id
+            )
+            db.add(conn)
+        BadgeService.bump(db, receiver_id, pending_connections=1)
+        try:
+            db.commit()
+        except IntegrityError:
+            # A concurrent request for the same pair won the unique index
+            db.rollback()
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Connection request already pending")
+        ConnectionGraphCache.invalidate(sender.id, receiver_id)
+        people_recommender.invalidate(sender.id, receiver_id)
         db.refresh(conn)
         # Load relationships
         db.refresh(conn, ["sender", "receiver"])
@@ -45,9 +74,13 @@ class ConnectionService:
             raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Only the receiver can accept the request")
         if conn.status != ConnectionStatus.PENDING:
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Connection is not pending")
-        conn.status = ConnectionStatus.ACCEPTED
-        conn.acceptedAt = datetime.now(timezone.utc)
+        ConnectionService._leave_pending(db, conn, ConnectionStatus.ACCEPTED, acceptedAt=datetime.now(timezone.utc))
+        TimelineService.backfill_connection(db, conn.senderId, conn.receiverId)
+        BadgeService.bump(db, conn.receiverId, pending_connections=-1)
         db.commit()
+        ConnectionGraphCache.invalidate(conn.senderId, conn.receiverId)
+        social_graph.add_edge(conn.senderId, conn.receiverId)
+        people_recommender.invalidate(conn.senderId, conn.receiverId)
         db.refresh(conn)
         return conn
 
@@ -61,11 +94,27 @@ class ConnectionService:
             raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not allowed to reject this request")
         if conn.status != ConnectionStatus.PENDING:
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Connection is not pending")
-        conn.status = ConnectionStatus.REJECTED
+        ConnectionService._leave_pending(db, conn, ConnectionStatus.REJECTED)
+        BadgeService.bump(db, conn.receiverId, pending_connections=-1)
         db.commit()
+        ConnectionGraphCache.invalidate(conn.senderId, conn.receiverId)
+        people_recommender.invalidate(conn.senderId, conn.receiverId)
         db.refresh(conn)
         return conn
 
+    @staticmethod
+    def _leave_pending(db: Session, conn: Connection, new_status: ConnectionStatus, **values):
+        """Move a request out of PENDING only if it is still pending, so concurrent
+        accept/reject calls settle it (and decrement the badge) exactly once"""
+        settled = db.execute(
+            update(Connection).where(
+                Connection.id == conn.id, Connection.status == ConnectionStatus.PENDING
+            ).values(status=new_status, **values)
+        ).rowcount
+        if not settled:
+            db.rollback()
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Connection is not pending")
+
     @staticmethod
     def list_accepted(db: Session, user: User):
         return db.query(Connection).options(
@@ -104,64 +153,94 @@ class ConnectionService:
         # Check if current user is one of the parties
         if conn.senderId != current_user.id and conn.receiverId != current_user.id:
             raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized to delete this connection")
+        TimelineService.prune_connection(db, conn.senderId, conn.receiverId)
         db.delete(conn)
         db.commit()
+        ConnectionGraphCache.invalidate(conn.senderId, conn.receiverId)
+        social_graph.remove_edge(conn.senderId, conn.receiverId)
+        people_recommender.invalidate(conn.senderId, conn.receiverId)
         return {"message": "Connection deleted successfully"}
 
     @staticmethod
     def get_mutual_connections(db: Session, user: User, other_user_id: int):
-        # Get all accepted connections for current user
-        user_connections = db.query(Connection).options(
-            joinedload(Connection.sender),
-            joinedload(Connection.receiver)
-        ).filter(
-            ((Connection.senderId == user.id) | (Connection.receiverId == user.id)) &
-            (Connection.status == ConnectionStatus.ACCEPTED)
-        ).all()
-        
-        # Get all accepted connections for other user
-        other_user_connections = db.query(Connection).options(
+        """Return the current user's connections to people who are also connected to other_user_id.
+
+        Runs as a single query: the other user's neighbours are a subquery
+        matched against the far end of the current user's connections.
+        """
+        mutual_connections = db.query(Connection).options(
             joinedload(Connection.sender),
             joinedload(Connection.receiver)
         ).filter(
-            ((Connection.senderId == other_user_id) | (Connection.receiverId == other_user_id)) &
-            (Connection.status == ConnectionStatus.ACCEPTED)
+            Connection.status == ConnectionStatus.ACCEPTED,
+            (Connection.lowUserId == user.id) | (Connection.highUserId == user.id),
+            ConnectionService._other_end(user.id).in_(ConnectionService._neighbors_query(other_user_id))
         ).all()
         
-        # Extract user IDs from connections
-        # For current user's connections: get all connected users except the profile owner
-        user_connection_ids = set()
-        for conn in user_connections:
-            other_id = conn.receiverId if conn.senderId == user.id else conn.senderId
-            # Don't include the profile owner (we want to find mutual connections excluding them)
-            if other_id != other_user_id:
-                user_connection_ids.add(other_id)
-        
-        # For profile owner's connections: get all connected users except the current user
-        other_user_connection_ids = set()
-        for conn in other_user_connections:
-            other_id = conn.receiverId if conn.senderId == other_user_id else conn.senderId
-            # Don't include the current user (we want to find mutual connections excluding them)
-            if other_id != user.id:
-                other_user_connection_ids.add(other_id)
+        return mutual_connections
+
+    @staticmethod
+    def get_mutual_counts(db: Session, user: User, user_ids: List[int]) -> Dict[int, int]:
+        """Return {user_id: number of mutual connections with the current user} in one query"""
+        if not user_ids:
+            return {}
         
-        # Find mutual connection IDs (people connected to both)
-        mutual_ids = user_connection_ids & other_user_connection_ids
+        # Every accepted edge touching a target, as (target, neighbour)
+        edges = union_all(
+            select(Connection.lowUserId.label("target"), Connection.highUserId.label("neighbor")).where(
+                Connection.status == ConnectionStatus.ACCEPTED,
+                Connection.lowUserId.in_(user_ids)
+            ),
+            select(Connection.highUserId.label("target"), Connection.lowUserId.label("neighbor")).where(
+                Connection.status == ConnectionStatus.ACCEPTED,
+                Connection.highUserId.in_(user_ids)
+            )
+        ).subquery()
         
-        if not mutual_ids:
-            return []
+        rows = db.query(edges.c.target, func.count()).filter(
+            edges.c.neighbor.in_(ConnectionService._neighbors_query(user.id))
+        ).group_by(edges.c.target).all()
         
-        # Return connections from current user's perspective to these mutual users
-        # This ensures we return Connection objects with proper sender/receiver populated
-        mutual_connections = db.query(Connection).options(
-            joinedload(Connection.sender),
-            joinedload(Connection.receiver)
-        ).filter(
-            (
-                ((Connection.senderId == user.id) & (Connection.receiverId.in_(mutual_ids))) |
-                ((Connection.receiverId == user.id) & (Connection.senderId.in_(mutual_ids)))
-            ) &
-            (Connection.status == ConnectionStatus.ACCEPTED)
-        ).all()
-        
-        return mutual_connections
+        counts = {user_id: 0 for user_id in user_ids}
+        counts.update(dict(rows))
+        return counts
+
+    @staticmethod
+    def get_degree_of_separation(db: Session, user: User, other_user_id: int):
+        """Return how many hops separate the current user from another user (None if unreachable)"""
+        return social_graph.degree_of_separation(db, user.id, other_user_id)
+
+    @staticmethod
+    def get_statuses(db: Session, user: User, user_ids: List[int]) -> Dict[int, Dict]:
+        """Return {user_id: {"status": ..., "connectionId": ...}} as seen by the current user.
+
+        status is one of "connected", "pending_in", "pending_out", "blocked" or "none".
+        """
+        rows = ConnectionGraphCache.get_statuses(db, user.id)
+        result = {}
+        for user_id in user_ids:
+            value, connection_id = rows.get(user_id, ("none", None))
+            if value == ConnectionStatus.ACCEPTED.value:
+                value = "connected"
+            elif value == ConnectionStatus.REJECTED.value:
+                value, connection_id = "none", None
+            result[user_id] = {"status": value, "connectionId": connection_id}
+        return result
+
+    @staticmethod
+    def get_suggestions(db: Session, user: User, limit: int = 20):
+        """Return ranked "people you may know" suggestions for the current user"""
+        return people_recommender.suggest(db, user.id, limit)
+
+    @staticmethod
+    def _other_end(user_id: int):
+        """SQL expression for the user at the other end of a connection from user_id"""
+        return case((Connection.lowUserId == user_id, Connection.highUserId), else_=Connection.lowUserId)
+
+    @staticmethod
+    def _neighbors_query(user_id: int):
+        """Subquery selecting the IDs of user_id's accepted connections"""
+        return select(ConnectionService._other_end(user_id)).where(
+            Connection.status == ConnectionStatus.ACCEPTED,
+            (Connection.lowUserId == user_id) | (Connection.highUserId == user_id)
+        )
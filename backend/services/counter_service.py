@@ -0,0 +1,164 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import delete, func, select
+from sqlalchemy.dialects.postgresql import insert
+from models.post import Post, Comment, Reaction, ReactionType, PostCounters, CommentCounters
+from typing import Dict, Iterable, List, Optional
+
+
+# Counter column holding each reaction type, e.g. ReactionType.LIKE -> "likeCount"
+REACTION_COLUMNS = {reaction_type: f"{reaction_type.value}Count" for reaction_type in ReactionType}
+
+
+class CounterService:
+    """Denormalized engagement counters.
+
+    Callers bump the counters in the same transaction as the reaction or
+    comment write they describe; rebuild() recomputes them from the base
+    tables if they ever drift.
+    """
+
+    @staticmethod
+    def reaction_added(db: Session, reaction_type: ReactionType,
+                       post_id: Optional[int] = None, comment_id: Optional[int] = None):
+        """Count a new reaction on a post or comment"""
+        CounterService._bump_reactions(db, {REACTION_COLUMNS[reaction_type]: 1}, post_id, comment_id)
+
+    @staticmethod
+    def reaction_removed(db: Session, reaction_type: ReactionType,
+                         post_id: Optional[int] = None, comment_id: Optional[int] = None):
+        """Uncount a removed reaction on a post or comment"""
+        CounterService._bump_reactions(db, {REACTION_COLUMNS[reaction_type]: -1}, post_id, comment_id)
+
+    @staticmethod
+    def reaction_changed(db: Session, old_type: ReactionType, new_type: ReactionType,
+                         post_id: Optional[int] = None, comment_id: Optional[int] = None):
+        """Move a reaction from one type counter to another"""
+        if old_type == new_type:
+            return
+        CounterService._bump_reactions(
+            db,
+            {REACTION_COLUMNS[old_type]: -1, REACTION_COLUMNS[new_type]: 1},
+            post_id,
+            comment_id
+        )
+
+    @staticmethod
+    def comment_added(db: Session, post_id: int):
+        """Count a new comment on a post"""
+        CounterService._bump(db, PostCounters, "postId", post_id, {"commentCount": 1})
+
+    @staticmethod
+    def comment_removed(db: Session, post_id: int):
+        """Uncount a deleted comment on a post"""
+        CounterService._bump(db, PostCounters, "postId", post_id, {"commentCount": -1})
+
+    @staticmethod
+    def get_post_counters(db: Session, post_ids: List[int]) -> Dict[int, Dict]:
+        """Return {post_id: {"commentCount": n, "reactionSummary": {...}}} for the given posts"""
+        rows = {
+            counters.postId: counters
+            for counters in db.query(PostCounters).filter(PostCounters.postId.in_(post_ids)).all()
+        } if post_ids else {}
+
+        result = {}
+        for post_id in post_ids:
+            counters = rows.get(post_id)
+            summary = {
+                reaction_type.value: getattr(counters, column) if counters else 0
+                for reaction_type, column in REACTION_COLUMNS.items()
+            }
+            summary["total"] = sum(summary.values())
+            result[post_id] = {
+                "commentCount": counters.commentCount if counters else 0,
+                "reactionSummary": summary
+            }
+        return result
+
+    @staticmethod
+    def rebuild(db: Session, post_ids: Optional[Iterable[int]] = None,
+                comment_ids: Optional[Iterable[int]] = None):
+        """Recompute counters from the reactions and comments tables.
+
+        Rebuilds every counter when no IDs are given; otherwise only the given
+        posts and comments. Does not commit.
+        """
+        rebuild_all = post_ids is None and comment_ids is None
+        post_ids = None if rebuild_all else list(post_ids or [])
+        comment_ids = None if rebuild_all else list(comment_ids or [])
+
+        if rebuild_all or post_ids:
+            reactions = select(
+                Reaction.postId.label("postId"),
+                *CounterService._reaction_count_columns()
+            ).where(Reaction.postId.isnot(None)).group_by(Reaction.postId).subquery()
+            comments = select(
+                Comment.postId.label("postId"),
+                func.count(Comment.id).label("commentCount")
+            ).group_by(Comment.postId).subquery()
+
+            rows = select(
+                Post.id,
+                *[func.coalesce(reactions.c[column], 0) for column in REACTION_COLUMNS.values()],
+                func.coalesce(comments.c.commentCount, 0)
+            ).outerjoin(reactions, reactions.c.postId == Post.id).outerjoin(
+                comments, comments.c.postId == Post.id
+            )
+
+            stale = delete(PostCounters)
+            if post_ids is not None:
+                rows = rows.where(Post.id.in_(post_ids))
+                stale = stale.where(PostCounters.postId.in_(post_ids))
+
+            db.execute(stale)
+            db.execute(insert(PostCounters).from_select(
+                ["postId", *REACTION_COLUMNS.values(), "commentCount"], rows
+            ))
+
+        if rebuild_all or comment_ids:
+            reactions = select(
+                Reaction.commentId.label("commentId"),
+                *CounterService._reaction_count_columns()
+            ).where(Reaction.commentId.isnot(None)).group_by(Reaction.commentId).subquery()
+
+            rows = select(
+                reactions.c.commentId,
+                *[reactions.c[column] for column in REACTION_COLUMNS.values()]
+            ).join(Comment, Comment.id == reactions.c.commentId)
+
+            stale = delete(CommentCounters)
+            if comment_ids is not None:
+                rows = rows.where(reactions.c.commentId.in_(comment_ids))
+                stale = stale.where(CommentCounters.commentId.in_(comment_ids))
+
+            db.execute(stale)
+            db.execute(insert(CommentCounters).from_select(
+                ["commentId", *REACTION_COLUMNS.values()], rows
+            ))
+
+    @staticmethod
+    def _reaction_count_columns():
+        """One filtered COUNT per reaction type, labelled with its counter column"""
+        return [
+            func.count(Reaction.id).filter(Reaction.type == reaction_type).label(column)
+            for reaction_type, column in REACTION_COLUMNS.items()
+        ]
+
+    @staticmethod
+    def _bump_reactions(db: Session, deltas: Dict[str, int],
+                        post_id: Optional[int], comment_id: Optional[int]):
+        if post_id:
+            CounterService._bump(db, PostCounters, "postId", post_id, deltas)
+        elif comment_id:
+            CounterService._bump(db, CommentCounters, "commentId", comment_id, deltas)
+
+    @staticmethod
+    def _bump(db: Session, model, key_column: str, key: int, deltas: Dict[str, int]):
+        """Atomically add deltas to a counters row, creating it if missing and never going below zero"""
+        table = model.__table__
+        statement = insert(model).values(
+            {key_column: key, **{column: max(delta, 0) for column, delta in deltas.items()}}
+        ).on_conflict_do_update(
+            index_elements=[key_column],
+            set_={column: func.greatest(table.c[column] + delta, 0) for column, delta in deltas.items()}
+        )
+        db.execute(statement)
@@ -2,6 +2,8 @@ from sqlalchemy.orm import Session
 from models.google_scholar import GoogleScholarIntegration, Publication
 from models.user import User
 from models.post import Post
+from services.post_service import PostService
+from services.timeline_service import TimelineService
 from fastapi import HTTPException, status
 import requests
 from bs4 import BeautifulSoup
@@ -399,6 +401,8 @@ class GoogleScholarService:
                     timestamp=datetime.datetime.now(datetime.timezone.utc)
                 )
                 db.add(post)
+                db.flush()
+                TimelineService.fan_out_post(db, post, PostService._get_connected_user_ids(db, user.id))
         else:
             # Delete the post associated with this publication
             post = db.query(Post).filter(
@@ -0,0 +1,226 @@
+"""
+Group-commit ingest pipeline for chat messages received over WebSockets.
+
+Sockets hand messages to a shared asyncio queue instead of committing one by
+one on the event loop. A single writer task drains the queue every few
+milliseconds, inserts the whole batch in one transaction on a worker thread,
+resolves each sender's future with the stored message and then broadcasts
+the batch. Throughput therefore grows with the number of concurrent senders
+instead of being bounded by one commit per message.
+
+A failed broadcast is logged without stopping the writer. If the writer dies
+anyway, or is stopped, every sender still waiting gets an error instead of
+hanging, and the next submit starts a new writer on the same queue.
+"""
+import asyncio
+import logging
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+from database import SessionLocal
+from models.chat import Message
+from services.badge_service import BadgeService
+from services.chat_service import ChatService
+from services.websocket_manager import manager
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class _PendingMessage:
+    chat_id: int
+    sender_id: int
+    recipient_id: int
+    content: str
+    attachment: Optional[str]
+    timestamp: datetime
+    future: asyncio.Future = field(repr=False)
+
+
+class MessageIngest:
+    """Batches WebSocket chat messages into group commits"""
+
+    # How long the writer waits for more messages after the first one of a batch
+    FLUSH_INTERVAL_SECONDS = 0.005
+    MAX_BATCH_SIZE = 500
+
+    def __init__(self):
+        self._queue: Optional[asyncio.Queue] = None
+        self._writer: Optional[asyncio.Task] = None
+
+    async def submit(self, chat_id: int, sender_id: int, recipient_id: int,
+                     content: Optional[str], attachment: Optional[str] = None) -> dict:
+        """Queue a message and wait until it is stored; returns the stored message as a dict.
+
+        Raises ValueError when the message has neither content nor an attachment.
+        """
+        content = (content or "").strip()
+        attachment = attachment.strip() if attachment else None
+        if not content and not attachment:
+            raise ValueError("Message must include content or an attachment")
+
+        self._ensure_started()
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put(_PendingMessage(
+            chat_id=chat_id,
+            sender_id=sender_id,
+            recipient_id=recipient_id,
+            content=content,
+            attachment=attachment,
+            timestamp=datetime.now(timezone.utc),
+            future=future
+        ))
+        return await future
+
+    async def stop(self):
+        """Flush queued messages and stop the writer task; anything queued after the flush fails"""
+        if self._writer is None:
+            return
+        await self._queue.join()
+        self._writer.cancel()
+        try:
+            await self._writer
+        except asyncio.CancelledError:
+            pass
+        self._writer = None
+        self._queue = None
+
+    # ==================== INTERNALS ====================
+
+    def _ensure_started(self):
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+        if self._writer is None or self._writer.done():
+            self._writer = asyncio.create_task(self._run(self._queue))
+
+    async def _run(self, queue: asyncio.Queue):
+        loop = asyncio.get_running_loop()
+        batch: List[_PendingMessage] = []
+        try:
+            while True:
+                batch = [await queue.get()]
+                deadline = loop.time() + self.FLUSH_INTERVAL_SECONDS
+                while len(batch) < self.MAX_BATCH_SIZE:
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        batch.append(await asyncio.wait_for(queue.get(), timeout))
+                    except asyncio.TimeoutError:
+                        break
+
+                try:
+                    await self._store(batch)
+                finally:
+                    for _ in batch:
+                        queue.task_done()
+        except Exception as e:
+            logger.error(f"Message ingest writer crashed: {e}", exc_info=True)
+        finally:
+            self._fail_outstanding(queue, batch)
+
+    @staticmethod
+    def _fail_outstanding(queue: asyncio.Queue, batch: List[_PendingMessage]):
+        """Release every sender still waiting on a writer that is gone"""
+        error = RuntimeError("Message ingest stopped before the message was stored")
+        for pending in batch:
+            if not pending.future.done():
+                pending.future.set_exception(error)
+        while not queue.empty():
+            pending = queue.get_nowait()
+            if not pending.future.done():
+                pending.future.set_exception(error)
+            queue.task_done()
+
+    async def _store(self, batch: List[_PendingMessage]):
+        """Write a batch, falling back to one transaction per message if the group commit fails"""
+        try:
+            stored, badges = await asyncio.to_thread(self._write_batch, batch)
+        except Exception as e:
+            if len(batch) > 1:
+                # Isolate the failing message(s) so the rest of the batch still goes through
+                for pending in batch:
+                    await self._store([pending])
+                return
+            logger.error(f"Failed to store message from user {batch[0].sender_id}: {e}", exc_info=True)
+            if not batch[0].future.done():
+                batch[0].future.set_exception(e)
+            return
+
+        for pending, message in zip(batch, stored):
+            if not pending.future.done():
+                pending.future.set_result(message)
+        try:
+            await self._fan_out(batch, stored, badges)
+        except Exception as e:
+            # The messages are stored; recipients catch up on reconnect (since_seq)
+            logger.error(f"Failed to broadcast {len(batch)} stored message(s): {e}", exc_info=True)
+
+    @staticmethod
+    def _write_batch(batch: List[_PendingMessage]) -> Tuple[List[dict], Dict[int, Dict[str, int]]]:
+        """Insert a batch in one transaction; returns the stored messages and the recipients' badges"""
+        db = SessionLocal()
+        try:
+            # One sequence range per chat, handed out in queue order; chats are locked in ID order
+            next_seq = {
+                chat_id: ChatService.reserve_seqs(db, chat_id, count)
+                for chat_id, count in sorted(Counter(pending.chat_id for pending in batch).items())
+            }
+            messages = []
+            for pending in batch:
+                messages.append(Message(
+                    content=pending.content,
+                    attachment=pending.attachment,
+                    timestamp=pending.timestamp,
+                    seq=next_seq[pending.chat_id],
+                    chatId=pending.chat_id,
+                    senderId=pending.sender_id
+                ))
+                next_seq[pending.chat_id] += 1
+            db.add_all(messages)
+            unread = Counter(pending.recipient_id for pending in batch)
+            # Badge rows are locked in user ID order too, so concurrent batches cannot deadlock
+            for recipient_id, count in sorted(unread.items()):
+                BadgeService.bump(db, recipient_id, unread_messages=count)
+            db.flush()
+
+            stored = [
+                {
+                    "id": message.id,
+                    "seq": message.seq,
+                    "chatId": message.chatId,
+                    "senderId": message.senderId,
+                    "content": message.content,
+                    "attachment": message.attachment,
+                    "timestamp": message.timestamp,
+                }
+                for message in messages
+            ]
+            badges = {recipient_id: BadgeService.get_badges(db, recipient_id) for recipient_id in unread}
+            db.commit()
+            return stored, badges
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    @staticmethod
+    async def _fan_out(batch: List[_PendingMessage], stored: List[dict], badges: Dict[int, Dict[str, int]]):
+        for pending, message in zip(batch, stored):
+            await manager.broadcast_to_users(
+                f"messages_{pending.chat_id}",
+                [pending.sender_id, pending.recipient_id],
+                ChatService.new_message_event(
+                    message["id"], message["senderId"], message["seq"],
+                    message["content"], message["attachment"], message["timestamp"]
+                ),
+            )
+        for recipient_id, counts in badges.items():
+            await manager.broadcast_to_user("notifications", recipient_id, {"type": "badges", **counts})
+
+
+# Global ingest pipeline instance
+message_ingest = MessageIngest()
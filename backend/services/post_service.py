@@ -1,13 +1,17 @@
-from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import desc, func
+from sqlalchemy.orm import Session, joinedload, selectinload
+from sqlalchemy import desc, func, tuple_
 from models.post import Post, Comment, Reaction, ReactionType
 from models.user import User
-from models.connection import Connection, ConnectionStatus
 from models.google_scholar import Publication
+from models.connection import Connection, ConnectionStatus
 from fastapi import HTTPException, status
 from typing import List, Dict, Optional
 from datetime import datetime, timezone
 from services.file_utils import delete_file_from_url
+from services.pagination import encode_cursor, decode_cursor
+from services.timeline_service import TimelineService
+from services.counter_service import CounterService
+from services.connection_graph_cache import ConnectionGraphCache
 
 
 class PostService:
@@ -25,6 +29,11 @@ class PostService:
             )
             
             db.add(post)
+            db.flush()
+            
+            # Deliver to the author's and connections' timelines in the same transaction
+            TimelineService.fan_out_post(db, post, PostService._get_connected_user_ids(db, user.id))
+            
             db.commit()
             db.refresh(post)
             
@@ -47,24 +56,35 @@ class PostService:
             joinedload(Post.reactions).joinedload(Reaction.user)
         ).filter(Post.id == post_id).first()
         
-        if not post:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Post not found"
-            )
-        
-        # Check access permissions
-        if not post.isPublic and post.userId != current_user.id:
-            # Check if users are connected
-            are_connected = PostService._are_users_connected(db, current_user.id, post.userId)
-            if not are_connected:
-                raise HTTPException(
-                    status_code=status.HTTP_403_FORBIDDEN,
-                    detail="You don't have permission to view this post"
-                )
+        PostService._check_post_access(db, post, current_user)
         
         return post
     
+    @staticmethod
+    def get_post_comments(db: Session, post_id: int, current_user: User, limit: int = 20,
+                          cursor: Optional[str] = None):
+        """Get one page of a post's comments, oldest first, keyed on (timestamp, id)"""
+        post = db.query(Post).filter(Post.id == post_id).first()
+        PostService._check_post_access(db, post, current_user)
+        
+        query = db.query(Comment).filter(Comment.postId == post_id)
+        if cursor:
+            cursor_timestamp, cursor_id = decode_cursor(cursor)
+            query = query.filter(tuple_(Comment.timestamp, Comment.id) > tuple_(cursor_timestamp, cursor_id))
+        
+        # Fetch one extra row to know whether another page exists
+        comments = query.options(
+            selectinload(Comment.user),
+            selectinload(Comment.reactions).selectinload(Reaction.user)
+        ).order_by(Comment.timestamp, Comment.id).limit(limit + 1).all()
+        
+        next_cursor = None
+        if len(comments) > limit:
+            comments = comments[:limit]
+            next_cursor = encode_cursor(comments[-1].timestamp, comments[-1].id)
+        
+        return {"comments": comments, "next_cursor": next_cursor}
+    
     @staticmethod
     def update_post(db: Session, post_id: int, user: User, data) -> Post:
         """Update a post (only by the owner)"""
@@ -145,20 +165,7 @@ class PostService:
     @staticmethod
     def get_user_posts(db: Session, user_id: int, current_user: User, skip: int = 0, limit: int = 50):
         """Get posts by a specific user"""
-        # Check if current user can view the posts
-        if user_id != current_user.id:
-            # Check if they're connected or posts are public
-            are_connected = PostService._are_users_connected(db, current_user.id, user_id)
-            
-            if are_connected:
-                # Show all posts if connected
-                query = db.query(Post).filter(Post.userId == user_id)
-            else:
-                # Only show public posts
-                query = db.query(Post).filter(Post.userId == user_id, Post.isPublic == True)
-        else:
-            # User viewing their own posts
-            query = db.query(Post).filter(Post.userId == user_id)
+        query = PostService._user_posts_query(db, user_id, current_user)
         
         total = query.count()
         posts = query.options(
@@ -171,33 +178,66 @@ class PostService:
         return {"total": total, "posts": posts}
     
     @staticmethod
-    def get_feed(db: Session, user: User, skip: int = 0, limit: int = 50):
-        """Get personalized feed for user (own posts + connected users' posts + public posts)"""
-        # Get IDs of connected users
-        connected_user_ids = PostService._get_connected_user_ids(db, user.id)
-        
-        # Include user's own posts and connected users' posts (all visibility)
-        # Plus all public posts from anyone
-        query = db.query(Post).filter(
-            (Post.userId.in_(connected_user_ids + [user.id])) | 
-            (Post.isPublic == True)
-        )
+    def get_user_posts_summary(db: Session, user_id: int, current_user: User, skip: int = 0,
+                               limit: int = 50, comments_limit: int = 3):
+        """Get posts by a specific user with aggregated engagement instead of full comment/reaction lists"""
+        query = PostService._user_posts_query(db, user_id, current_user)
         
         total = query.count()
         posts = query.options(
+            joinedload(Post.user),
+            joinedload(Post.publication),
+            joinedload(Post.scopusPublication)
+        ).order_by(desc(Post.timestamp)).offset(skip).limit(limit).all()
+        
+        return {"total": total, "posts": PostService._build_post_summaries(db, posts, current_user, comments_limit)}
+    
+    @staticmethod
+    def get_feed(db: Session, user: User, skip: int = 0, limit: int = 50,
+                 cursor: Optional[str] = None, include_total: bool = True):
+        """Get personalized feed for user (own posts + connected users' posts + public posts)
+
+        When a cursor is given, paging is keyed on (timestamp, id) and skip is ignored,
+        so every page costs the same regardless of depth.
+        """
+        total = TimelineService.count_feed(db, user.id) if include_total else None
+        post_ids, next_cursor = PostService._get_feed_page_ids(db, user, skip, limit, cursor)
+        
+        posts = PostService._load_posts_in_order(db, post_ids, [
             joinedload(Post.user),
             joinedload(Post.publication),
             joinedload(Post.comments).joinedload(Comment.user),
             joinedload(Post.reactions).joinedload(Reaction.user)
-        ).order_by(desc(Post.timestamp)).offset(skip).limit(limit).all()
+        ])
         
-        return {"total": total, "posts": posts}
+        return {"total": total, "posts": posts, "next_cursor": next_cursor}
+    
+    @staticmethod
+    def get_feed_summary(db: Session, user: User, skip: int = 0, limit: int = 50,
+                         cursor: Optional[str] = None, include_total: bool = True,
+                         comments_limit: int = 3):
+        """Get the feed with aggregated engagement instead of full comment/reaction lists"""
+        total = TimelineService.count_feed(db, user.id) if include_total else None
+        post_ids, next_cursor = PostService._get_feed_page_ids(db, user, skip, limit, cursor)
+        
+        posts = PostService._load_posts_in_order(db, post_ids, [
+            joinedload(Post.user),
+            joinedload(Post.publication),
+            joinedload(Post.scopusPublication)
+        ])
+        
+        return {
+            "total": total,
+            "posts": PostService._build_post_summaries(db, posts, user, comments_limit),
+            "next_cursor": next_cursor
+        }
     
     @staticmethod
     def add_comment(db: Session, post_id: int, user: User, data) -> Comment:
         """Add a comment to a post"""
         # Check if post exists and user has access
-        post = PostService.get_post_by_id(db, post_id, user)
+        post = db.query(Post).filter(Post.id == post_id).first()
+        PostService._check_post_access(db, post, user)
         
         comment = Comment(
             content=data.content,
@@ -207,6 +247,7 @@ class PostService:
         )
         
         db.add(comment)
+        CounterService.comment_added(db, post_id)
         db.commit()
         db.refresh(comment)
         
@@ -253,6 +294,7 @@ class PostService:
                 detail="You can only delete your own comments or comments on your posts"
             )
         
+        CounterService.comment_removed(db, comment.postId)
         db.delete(comment)
         db.commit()
         
@@ -279,7 +321,8 @@ class PostService:
         
         if post_id:
             # Verify post exists and user has access
-            PostService.get_post_by_id(db, post_id, user)
+            post = db.query(Post).filter(Post.id == post_id).first()
+            PostService._check_post_access(db, post, user)
             query = query.filter(Reaction.postId == post_id)
         else:
             # Verify comment exists
@@ -295,6 +338,9 @@ class PostService:
         
         if existing_reaction:
             # Update existing reaction
+            CounterService.reaction_changed(
+                db, existing_reaction.type, reaction_type, post_id=post_id, comment_id=comment_id
+            )
             existing_reaction.type = reaction_type
             existing_reaction.timestamp = datetime.now(timezone.utc)
             db.commit()
@@ -310,6 +356,7 @@ class PostService:
                 timestamp=datetime.now(timezone.utc)
             )
             db.add(reaction)
+            CounterService.reaction_added(db, reaction_type, post_id=post_id, comment_id=comment_id)
             db.commit()
             db.refresh(reaction)
             return reaction
@@ -339,6 +386,9 @@ class PostService:
                 detail="Reaction not found"
             )
         
+        CounterService.reaction_removed(
+            db, reaction.type, post_id=reaction.postId, comment_id=reaction.commentId
+        )
         db.delete(reaction)
         db.commit()
         
@@ -348,7 +398,8 @@ class PostService:
     def get_post_reactions(db: Session, post_id: int, user: User):
         """Get all reactions for a post"""
         # Verify post exists and user has access
-        PostService.get_post_by_id(db, post_id, user)
+        post = db.query(Post).filter(Post.id == post_id).first()
+        PostService._check_post_access(db, post, user)
         
         reactions = db.query(Reaction).options(
             joinedload(Reaction.user)
@@ -359,29 +410,135 @@ class PostService:
     @staticmethod
     def _are_users_connected(db: Session, user1_id: int, user2_id: int) -> bool:
         """Check if two users are connected"""
-        connection = db.query(Connection).filter(
-            Connection.status == ConnectionStatus.ACCEPTED,
-            (
-                (Connection.senderId == user1_id) & (Connection.receiverId == user2_id) |
-                (Connection.senderId == user2_id) & (Connection.receiverId == user1_id)
-            )
-        ).first()
-        
-        return connection is not None
+        return ConnectionGraphCache.are_connected(db, user1_id, user2_id)
     
     @staticmethod
     def _get_connected_user_ids(db: Session, user_id: int) -> List[int]:
-        """Get list of user IDs that are connected to the given user"""
-        connections = db.query(Connection).filter(
+        """Get list of user IDs that are connected to the given user.
+
+        Read from the database, not ConnectionGraphCache: fan-out writes the
+        result permanently into timelines, so it must not be stale.
+        """
+        rows = db.query(Connection.lowUserId, Connection.highUserId).filter(
             Connection.status == ConnectionStatus.ACCEPTED,
-            (Connection.senderId == user_id) | (Connection.receiverId == user_id)
+            (Connection.lowUserId == user_id) | (Connection.highUserId == user_id)
         ).all()
+        return [high_user_id if low_user_id == user_id else low_user_id for low_user_id, high_user_id in rows]
+    
+    @staticmethod
+    def _check_post_access(db: Session, post: Optional[Post], current_user: User):
+        """Raise unless the post exists and is visible to the current user"""
+        if not post:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Post not found"
+            )
         
-        connected_ids = []
-        for conn in connections:
-            if conn.senderId == user_id:
-                connected_ids.append(conn.receiverId)
-            else:
-                connected_ids.append(conn.senderId)
-        
-        return connected_ids
+        # Check access permissions
+        if not post.isPublic and post.userId != current_user.id:
+            # Check if users are connected
+            are_connected = PostService._are_users_connected(db, current_user.id, post.userId)
+            if not are_connected:
+                raise HTTPException(
+                    status_code=status.HTTP_403_FORBIDDEN,
+                    detail="You don't have permission to view this post"
+                )
+    
+    @staticmethod
+    def _user_posts_query(db: Session, user_id: int, current_user: User):
+        """Build the query of a user's posts visible to the current user"""
+        # Check if current user can view the posts
+        if user_id != current_user.id:
+            # Check if they're connected or posts are public
+            are_connected = PostService._are_users_connected(db, current_user.id, user_id)
+            
+            if are_connected:
+                # Show all posts if connected
+                return db.query(Post).filter(Post.userId == user_id)
+            # Only show public posts
+            return db.query(Post).filter(Post.userId == user_id, Post.isPublic == True)
+        # User viewing their own posts
+        return db.query(Post).filter(Post.userId == user_id)
+    
+    @staticmethod
+    def _get_feed_page_ids(db: Session, user: User, skip: int, limit: int, cursor: Optional[str]):
+        """Return the post IDs of one feed page and the cursor of the next page"""
+        before = None
+        if cursor:
+            before = decode_cursor(cursor)
+            skip = 0
+        
+        # Fetch one extra key to know whether another page exists
+        keys = TimelineService.get_feed_page(db, user.id, skip + limit + 1, before)[skip:]
+        
+        next_cursor = None
+        if len(keys) > limit:
+            keys = keys[:limit]
+            next_cursor = encode_cursor(*keys[-1])
+        
+        return [post_id for _, post_id in keys], next_cursor
+    
+    @staticmethod
+    def _load_posts_in_order(db: Session, post_ids: List[int], options) -> List[Post]:
+        """Load posts by ID, preserving the order of post_ids"""
+        if not post_ids:
+            return []
+        posts_by_id = {
+            post.id: post
+            for post in db.query(Post).options(*options).filter(Post.id.in_(post_ids)).all()
+        }
+        return [posts_by_id[post_id] for post_id in post_ids if post_id in posts_by_id]
+    
+    @staticmethod
+    def _build_post_summaries(db: Session, posts: List[Post], user: User, comments_limit: int) -> List[Dict]:
+        """Attach reaction counts, the user's reaction, comment count and first comments to posts.
+
+        Counts come from the denormalized counters; the rest is one query per
+        statistic for the whole page.
+        """
+        post_ids = [post.id for post in posts]
+        if not post_ids:
+            return []
+        
+        counters = CounterService.get_post_counters(db, post_ids)
+        
+        user_reactions = dict(db.query(Reaction.postId, Reaction.type).filter(
+            Reaction.postId.in_(post_ids),
+            Reaction.userId == user.id
+        ).all())
+        
+        recent_comments: Dict[int, List[Comment]] = {post_id: [] for post_id in post_ids}
+        if comments_limit > 0:
+            ranked = db.query(
+                Comment.id.label("id"),
+                func.row_number().over(
+                    partition_by=Comment.postId,
+                    order_by=(Comment.timestamp, Comment.id)
+                ).label("rank")
+            ).filter(Comment.postId.in_(post_ids)).subquery()
+            
+            for comment in db.query(Comment).options(joinedload(Comment.user)).join(
+                ranked, ranked.c.id == Comment.id
+            ).filter(ranked.c.rank <= comments_limit).order_by(Comment.timestamp, Comment.id):
+                recent_comments[comment.postId].append(comment)
+        
+        summaries = []
+        for post in posts:
+            summaries.append({
+                "id": post.id,
+                "content": post.content,
+                "timestamp": post.timestamp,
+                "attachement": post.attachement,
+                "isPublic": post.isPublic,
+                "userId": post.userId,
+                "publicationId": post.publicationId,
+                "scopusPublicationId": post.scopusPublicationId,
+                "user": post.user,
+                "publication": post.publication,
+                "scopusPublication": post.scopusPublication,
+                **counters[post.id],
+                "userReaction": user_reactions.get(post.id),
+                "recentComments": recent_comments[post.id]
+            })
+        
+        return summaries
@@ -0,0 +1,212 @@
+"""
+Presence of users on the "online" WebSocket channel.
+
+Each worker counts its own open "online" sockets per user, so tabs and
+devices of one user count once. Workers share who is online through the
+WebSocket backplane: every FLUSH_INTERVAL_SECONDS a worker publishes the
+users that came online or went offline on it, and every worker merges these
+into one map of user ID -> workers the user is online on. A user is online
+while that set is not empty.
+
+Changes to the merged map are collected and, once per interval, each worker
+sends one {"type": "presence", "online": [...], "offline": [...]} diff to
+each of its own sockets, carrying only the changes of that recipient's
+accepted connections. A user who reconnects within an interval therefore
+produces no event at all.
+
+Workers also republish their full state every HEARTBEAT_INTERVAL_SECONDS
+(and when a new worker asks for it); the users of a worker that has been
+silent for WORKER_TIMEOUT_SECONDS, e.g. because it crashed, go offline.
+With the in-memory backplane this is all local to the single worker.
+"""
+import asyncio
+import logging
+import uuid
+from typing import Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy.orm import Session
+
+from database import SessionLocal
+from services.connection_graph_cache import ConnectionGraphCache
+from services.websocket_manager import manager, Connection
+
+logger = logging.getLogger(__name__)
+
+
+class PresenceService:
+    """Tracks who is online across workers and pushes batched presence diffs to their connections"""
+
+    FLUSH_INTERVAL_SECONDS = 1.0
+    HEARTBEAT_INTERVAL_SECONDS = 15.0
+    WORKER_TIMEOUT_SECONDS = 45.0
+    # Backplane channel carrying presence between workers; never sent to sockets
+    SYNC_CHANNEL = "presence_sync"
+
+    def __init__(self):
+        self.worker_id = uuid.uuid4().hex
+        # user_id -> open "online" sockets on this worker
+        self._sockets: Dict[int, int] = {}
+        # user_id -> state on this worker last published, for users changed since the last flush
+        self._local_changed: Dict[int, bool] = {}
+        # Merged state of all workers: user_id -> workers the user is online on
+        self._online: Dict[int, Set[str]] = {}
+        # worker ID -> users online on it, and when it was last heard from (loop time)
+        self._worker_users: Dict[str, Set[int]] = {}
+        self._worker_seen: Dict[str, float] = {}
+        # user_id -> merged state last announced, for users changed since the last flush
+        self._changed: Dict[int, bool] = {}
+        self._next_heartbeat = 0.0
+        self._flusher: Optional[asyncio.Task] = None
+
+    async def start(self):
+        """Join the presence of the other workers; call once the backplane is started"""
+        self._ensure_started()
+        await manager.publish(self.SYNC_CHANNEL, {"worker": self.worker_id, "request": True})
+
+    async def connect(self, websocket: Connection, user_id: int):
+        """Register a socket on the online channel and send it which connections are online"""
+        self._ensure_started()
+        await manager.connect(websocket, "online", user_id)
+        self._local_changed.setdefault(user_id, user_id in self._sockets)
+        self._sockets[user_id] = self._sockets.get(user_id, 0) + 1
+
+        connected_ids = await asyncio.to_thread(self._load_connected_ids, [user_id])
+        online = [other_id for other_id in connected_ids[user_id] if other_id in self._online]
+        await manager.send(websocket, {"type": "presence", "online": online, "offline": []})
+
+    def disconnect(self, websocket: Connection, user_id: int):
+        """Unregister a socket from the online channel"""
+        manager.disconnect(websocket, "online", user_id)
+        if user_id not in self._sockets:
+            return
+        self._local_changed.setdefault(user_id, True)
+        self._sockets[user_id] -= 1
+        if not self._sockets[user_id]:
+            del self._sockets[user_id]
+
+    def is_online(self, user_id: int) -> bool:
+        return user_id in self._online
+
+    def online_among(self, db: Session, user_id: int, user_ids: Iterable[int]) -> List[int]:
+        """Return the given users that are connected to user_id and online"""
+        connected_ids = ConnectionGraphCache.get_connected_ids(db, user_id)
+        return [other_id for other_id in user_ids if other_id in connected_ids and other_id in self._online]
+
+    async def stop(self):
+        if self._flusher is not None:
+            self._flusher.cancel()
+            self._flusher = None
+            # Let the other workers drop this worker's users now rather than after the timeout
+            await manager.publish(self.SYNC_CHANNEL, {"worker": self.worker_id, "full": []})
+
+    # ==================== INTERNALS ====================
+
+    def _ensure_started(self):
+        manager.subscribe(self.SYNC_CHANNEL, self._apply_sync)
+        if self._flusher is None or self._flusher.done():
+            self._flusher = asyncio.create_task(self._run())
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.FLUSH_INTERVAL_SECONDS)
+            try:
+                await self._flush()
+            except Exception as e:
+                logger.error(f"Presence flush failed: {e}", exc_info=True)
+
+    async def _flush(self):
+        now = asyncio.get_running_loop().time()
+        await self._publish_local_changes(now)
+        self._expire_silent_workers(now)
+
+        changed, self._changed = self._changed, {}
+        came_online = [user_id for user_id, was_online in changed.items() if not was_online and user_id in self._online]
+        went_offline = [user_id for user_id, was_online in changed.items() if was_online and user_id not in self._online]
+        if not came_online and not went_offline:
+            return
+
+        connected_ids = await asyncio.to_thread(self._load_connected_ids, came_online + went_offline)
+        # recipient -> (came online, went offline), limited to recipients with a socket on this worker
+        diffs: Dict[int, Tuple[List[int], List[int]]] = {}
+        for index, users in enumerate((came_online, went_offline)):
+            for user_id in users:
+                for recipient_id in connected_ids[user_id]:
+                    if recipient_id in self._sockets:
+                        diffs.setdefault(recipient_id, ([], []))[index].append(user_id)
+
+        for recipient_id, (online, offline) in diffs.items():
+            await manager.deliver_to_local_users(
+                "online", [recipient_id], {"type": "presence", "online": online, "offline": offline}
+            )
+
+    async def _publish_local_changes(self, now: float):
+        if now >= self._next_heartbeat:
+            self._local_changed = {}
+            self._next_heartbeat = now + self.HEARTBEAT_INTERVAL_SECONDS
+            await manager.publish(self.SYNC_CHANNEL, {"worker": self.worker_id, "full": list(self._sockets)})
+            return
+        changed, self._local_changed = self._local_changed, {}
+        online = [user_id for user_id, was_online in changed.items() if not was_online and user_id in self._sockets]
+        offline = [user_id for user_id, was_online in changed.items() if was_online and user_id not in self._sockets]
+        if online or offline:
+            await manager.publish(
+                self.SYNC_CHANNEL, {"worker": self.worker_id, "online": online, "offline": offline}
+            )
+
+    async def _apply_sync(self, data: dict):
+        """Merge the presence published by a worker (this one included) into the shared map"""
+        worker_id = data["worker"]
+        if data.get("request"):
+            # A worker joined: publish the full state on the next flush
+            self._next_heartbeat = 0.0
+            return
+        self._worker_seen[worker_id] = asyncio.get_running_loop().time()
+        users = self._worker_users.get(worker_id, set())
+        if "full" in data:
+            full = set(data["full"])
+            online, offline = full - users, users - full
+        else:
+            online, offline = data["online"], data["offline"]
+        for user_id in online:
+            self._set_worker_online(worker_id, user_id, True)
+        for user_id in offline:
+            self._set_worker_online(worker_id, user_id, False)
+        if not self._worker_users.get(worker_id):
+            # Nothing to time out
+            self._worker_users.pop(worker_id, None)
+            self._worker_seen.pop(worker_id, None)
+
+    def _set_worker_online(self, worker_id: str, user_id: int, online: bool):
+        workers = self._online.get(user_id, set())
+        # Keep the state from before the first change of the interval
+        self._changed.setdefault(user_id, bool(workers))
+        if online:
+            workers.add(worker_id)
+            self._online[user_id] = workers
+            self._worker_users.setdefault(worker_id, set()).add(user_id)
+        else:
+            workers.discard(worker_id)
+            if not workers:
+                self._online.pop(user_id, None)
+            self._worker_users.get(worker_id, set()).discard(user_id)
+
+    def _expire_silent_workers(self, now: float):
+        for worker_id, seen in list(self._worker_seen.items()):
+            if worker_id != self.worker_id and now - seen > self.WORKER_TIMEOUT_SECONDS:
+                logger.warning(f"Presence of worker {worker_id} timed out")
+                for user_id in list(self._worker_users.get(worker_id, ())):
+                    self._set_worker_online(worker_id, user_id, False)
+                self._worker_users.pop(worker_id, None)
+                del self._worker_seen[worker_id]
+
+    @staticmethod
+    def _load_connected_ids(user_ids: List[int]) -> Dict[int, FrozenSet[int]]:
+        db = SessionLocal()
+        try:
+            return {user_id: ConnectionGraphCache.get_connected_ids(db, user_id) for user_id in user_ids}
+        finally:
+            db.close()
+
+
+# Global presence service instance
+presence = PresenceService()
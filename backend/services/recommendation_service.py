@@ -0,0 +1,233 @@
+"""
+"People you may know" suggestions.
+
+Candidates are scored on mutual connections (from the in-memory social graph)
+and on shared university, laboratoire, equipe, specialites and thematiques.
+Profile features are held in NumPy arrays indexed like the sorted user IDs,
+so a user's scores against every other user are computed in a handful of
+vectorized operations. Ranked results are cached per user; connection events
+invalidate the two users involved and profile updates refresh one row of the
+feature arrays.
+"""
+import threading
+from time import monotonic
+from typing import Dict, List, Optional
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from models.associations import user_specialite_association, user_thematique_association
+from models.connection import Connection
+from models.user import User, UserType
+from services.cache import TTLCache
+from services.social_graph import social_graph
+
+
+class PeopleRecommender:
+    """Vectorized candidate scoring over precomputed profile feature arrays"""
+
+    MUTUAL_WEIGHT = 2.0  # Scaled by log2(1 + mutual connections)
+    EQUIPE_WEIGHT = 3.0
+    LABORATOIRE_WEIGHT = 2.0
+    UNIVERSITY_WEIGHT = 1.0
+    SPECIALITE_WEIGHT = 1.0  # Per shared specialite
+    THEMATIQUE_WEIGHT = 1.5  # Per shared thematique
+
+    # Ranked suggestions kept per user
+    MAX_SUGGESTIONS = 50
+    FEATURES_RELOAD_SECONDS = 600
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._loaded_at: Optional[float] = None
+        self._suggestions = TTLCache(maxsize=10000, ttl=self.FEATURES_RELOAD_SECONDS)
+
+    def suggest(self, db: Session, user_id: int, limit: int = 20) -> List[Dict]:
+        """Return up to `limit` ranked suggestions for a user"""
+        suggestions = self._suggestions.get(user_id)
+        if suggestions is None:
+            suggestions = self._rank(db, user_id)
+            self._suggestions.set(user_id, suggestions)
+        return suggestions[:limit]
+
+    def invalidate(self, *user_ids: int):
+        """Forget the cached suggestions of the given users"""
+        self._suggestions.invalidate(*user_ids)
+
+    def refresh_user(self, db: Session, user_id: int):
+        """Reload one user's profile features after they change"""
+        with self._lock:
+            self._suggestions.invalidate(user_id)
+            if self._loaded_at is None:
+                return
+
+            user = self._candidates_query(db).filter(User.id == user_id).first()
+            position = int(np.searchsorted(self._user_ids, user_id))
+            known = position < len(self._user_ids) and self._user_ids[position] == user_id
+            if user is not None and not known and position == len(self._user_ids):
+                # Newest user: appending keeps the arrays sorted
+                self._user_ids = np.append(self._user_ids, user_id)
+                self._university = np.append(self._university, _MISSING)
+                self._laboratoire = np.append(self._laboratoire, _MISSING)
+                self._equipe = np.append(self._equipe, _MISSING)
+            elif user is None or not known:
+                # Inserting or removing a user shifts every index; reload instead
+                self._loaded_at = None
+                return
+
+            self._university[position] = _or_missing(user.universityId)
+            self._laboratoire[position] = _or_missing(user.laboratoireId)
+            self._equipe[position] = _or_missing(user.equipeId)
+            self._specialite_users, self._specialite_items = self._replace_memberships(
+                db, user_specialite_association.c.specialiteId, user_specialite_association,
+                self._specialite_users, self._specialite_items, user_id, position
+            )
+            self._thematique_users, self._thematique_items = self._replace_memberships(
+                db, user_thematique_association.c.thematiqueId, user_thematique_association,
+                self._thematique_users, self._thematique_items, user_id, position
+            )
+
+    # ==================== INTERNALS ====================
+
+    def _rank(self, db: Session, user_id: int) -> List[Dict]:
+        with self._lock:
+            self._ensure_loaded(db)
+            count = len(self._user_ids)
+            position = int(np.searchsorted(self._user_ids, user_id))
+            if position >= count or self._user_ids[position] != user_id:
+                return []
+
+            mutual = np.zeros(count, dtype=np.int64)
+            second_degree = social_graph.friends_of_friends(db, user_id)
+            if second_degree:
+                ids = np.fromiter(second_degree.keys(), dtype=np.int64, count=len(second_degree))
+                counts = np.fromiter(second_degree.values(), dtype=np.int64, count=len(second_degree))
+                positions = np.searchsorted(self._user_ids, ids).clip(max=count - 1)
+                found = self._user_ids[positions] == ids
+                mutual[positions[found]] = counts[found]
+
+            same_university = self._same(self._university, position)
+            same_laboratoire = self._same(self._laboratoire, position)
+            same_equipe = self._same(self._equipe, position)
+            shared_specialites = self._shared(self._specialite_users, self._specialite_items, position)
+            shared_thematiques = self._shared(self._thematique_users, self._thematique_items, position)
+
+            scores = (
+                self.MUTUAL_WEIGHT * np.log2(1 + mutual)
+                + self.EQUIPE_WEIGHT * same_equipe
+                + self.LABORATOIRE_WEIGHT * same_laboratoire
+                + self.UNIVERSITY_WEIGHT * same_university
+                + self.SPECIALITE_WEIGHT * shared_specialites
+                + self.THEMATIQUE_WEIGHT * shared_thematiques
+            )
+
+            # Never suggest yourself or anyone you already have a connection row with
+            scores[position] = 0
+            excluded = np.fromiter(self._existing_pairs(db, user_id), dtype=np.int64)
+            if len(excluded):
+                positions = np.searchsorted(self._user_ids, excluded).clip(max=count - 1)
+                scores[positions[self._user_ids[positions] == excluded]] = 0
+
+            candidates = np.flatnonzero(scores > 0)
+            if len(candidates) > self.MAX_SUGGESTIONS:
+                top = np.argpartition(-scores[candidates], self.MAX_SUGGESTIONS - 1)[:self.MAX_SUGGESTIONS]
+                candidates = candidates[top]
+            candidates = candidates[np.argsort(-scores[candidates], kind="stable")]
+
+            ranked = []
+            for candidate in candidates.tolist():
+                reasons = [
+                    reason for reason, matched in (
+                        ("mutual_connections", mutual[candidate] > 0),
+                        ("same_equipe", same_equipe[candidate]),
+                        ("same_laboratoire", same_laboratoire[candidate]),
+                        ("same_university", same_university[candidate]),
+                        ("shared_specialites", shared_specialites[candidate] > 0),
+                        ("shared_thematiques", shared_thematiques[candidate] > 0),
+                    ) if matched
+                ]
+                ranked.append({
+                    "userId": int(self._user_ids[candidate]),
+                    "score": round(float(scores[candidate]), 3),
+                    "mutualCount": int(mutual[candidate]),
+                    "reasons": reasons
+                })
+
+        users = {
+            user.id: user
+            for user in db.query(User).filter(User.id.in_([item["userId"] for item in ranked])).all()
+        } if ranked else {}
+        return [{**item, "user": users[item["userId"]]} for item in ranked if item["userId"] in users]
+
+    def _ensure_loaded(self, db: Session):
+        if self._loaded_at is not None and monotonic() - self._loaded_at <= self.FEATURES_RELOAD_SECONDS:
+            return
+
+        rows = self._candidates_query(db).order_by(User.id).all()
+
+        self._user_ids = np.array([row.id for row in rows], dtype=np.int64)
+        self._university = np.array([_or_missing(row.universityId) for row in rows], dtype=np.int64)
+        self._laboratoire = np.array([_or_missing(row.laboratoireId) for row in rows], dtype=np.int64)
+        self._equipe = np.array([_or_missing(row.equipeId) for row in rows], dtype=np.int64)
+        self._specialite_users, self._specialite_items = self._load_memberships(
+            db, user_specialite_association, user_specialite_association.c.specialiteId
+        )
+        self._thematique_users, self._thematique_items = self._load_memberships(
+            db, user_thematique_association, user_thematique_association.c.thematiqueId
+        )
+        self._loaded_at = monotonic()
+        self._suggestions.clear()
+
+    @staticmethod
+    def _candidates_query(db: Session):
+        """Users who can be suggested: completed profiles, no admins"""
+        return db.query(User.id, User.universityId, User.laboratoireId, User.equipeId).filter(
+            User.profile_completed == True,
+            (User.user_type != UserType.ADMIN) | (User.user_type.is_(None))
+        )
+
+    def _load_memberships(self, db: Session, table, item_column):
+        """Load an association table as parallel (user position, item id) arrays"""
+        pairs = np.array(
+            db.query(table.c.userId, item_column).all(), dtype=np.int64
+        ).reshape(-1, 2)
+        positions = np.searchsorted(self._user_ids, pairs[:, 0]).clip(max=max(len(self._user_ids) - 1, 0))
+        known = self._user_ids[positions] == pairs[:, 0] if len(self._user_ids) else np.zeros(0, dtype=bool)
+        return positions[known], pairs[known, 1]
+
+    def _replace_memberships(self, db: Session, item_column, table, users, items, user_id, position):
+        item_ids = [item_id for (item_id,) in db.query(item_column).filter(table.c.userId == user_id).all()]
+        keep = users != position
+        return (
+            np.concatenate([users[keep], np.full(len(item_ids), position, dtype=np.int64)]),
+            np.concatenate([items[keep], np.array(item_ids, dtype=np.int64)])
+        )
+
+    @staticmethod
+    def _same(values: np.ndarray, position: int) -> np.ndarray:
+        if values[position] == _MISSING:
+            return np.zeros(len(values), dtype=bool)
+        return values == values[position]
+
+    def _shared(self, users: np.ndarray, items: np.ndarray, position: int) -> np.ndarray:
+        """Count, for every user, the items they share with the user at position"""
+        own_items = items[users == position]
+        return np.bincount(users[np.isin(items, own_items)], minlength=len(self._user_ids))
+
+    @staticmethod
+    def _existing_pairs(db: Session, user_id: int):
+        rows = db.query(Connection.lowUserId, Connection.highUserId).filter(
+            (Connection.lowUserId == user_id) | (Connection.highUserId == user_id)
+        ).all()
+        return (high if low == user_id else low for low, high in rows)
+
+
+_MISSING = -1
+
+
+def _or_missing(value: Optional[int]) -> int:
+    return _MISSING if value is None else value
+
+
+# Global recommender instance
+people_recommender = PeopleRecommender()
@@ -3,6 +3,8 @@ from fastapi import HTTPException, status
 from models.scopus import ScopusIntegration, ScopusPublication
 from models.user import User
 from models.post import Post
+from services.post_service import PostService
+from services.timeline_service import TimelineService
 import requests
 import datetime
 from typing import List, Dict
@@ -428,6 +430,8 @@ class ScopusService:
                     timestamp=datetime.datetime.now(datetime.timezone.utc)
                 )
                 db.add(post)
+                db.flush()
+                TimelineService.fan_out_post(db, post, PostService._get_connected_user_ids(db, user.id))
             else:
                 existing_post.content = post_content
         else:
@@ -0,0 +1,307 @@
+"""
+In-memory social graph of accepted connections.
+
+Adjacency is stored in compressed sparse row (CSR) form: the neighbours of
+node i are indices[indptr[i]:indptr[i + 1]]. Connection events are applied to
+a small overlay of added and removed edges, which is folded into fresh CSR
+arrays once it grows past COMPACT_THRESHOLD. Queries gather whole
+neighbourhoods with NumPy instead of issuing one SQL query per hop.
+
+The graph is per worker process: it reloads from the database every
+SOCIAL_GRAPH_RELOAD_SECONDS to pick up events applied by other workers, so
+it only serves queries that tolerate that lag (suggestions, degree of
+separation); exact mutual counts stay in SQL. Only the first load blocks;
+later reloads read and build the new CSR arrays on a background thread and
+swap them in under the lock. Connection events are queued without taking
+the lock (they come from async routes) and applied by the next query.
+"""
+import threading
+from collections import deque
+from time import monotonic
+from typing import Deque, Dict, Iterable, List, Optional, Set, Tuple
+
+import logging
+import numpy as np
+from sqlalchemy.orm import Session
+
+from config import settings
+from database import SessionLocal
+from models.connection import Connection, ConnectionStatus
+
+logger = logging.getLogger(__name__)
+
+# Directed node pairs are encoded as a single int64: (a << 32) | b
+_PAIR_SHIFT = np.int64(1 << 32)
+
+
+class SocialGraph:
+    """CSR adjacency of accepted connections with an incremental overlay"""
+
+    # Overlay edges tolerated before rebuilding the CSR arrays
+    COMPACT_THRESHOLD = 1024
+
+    def __init__(self, reload_seconds: float):
+        self._lock = threading.RLock()
+        # Held for the whole of a load, so only one runs at a time
+        self._load_lock = threading.Lock()
+        self._reload_seconds = reload_seconds
+        self._loaded_at: Optional[float] = None
+        self._reload_requested = False
+        # (added, user1_id, user2_id) connection events not applied yet
+        self._events: Deque[Tuple[bool, int, int]] = deque()
+        # Events applied while a reload is reading the database, replayed onto its result
+        self._replay: Optional[List[Tuple[bool, int, int]]] = None
+        self._build(np.zeros(0, dtype=np.int64), np.zeros((0, 2), dtype=np.int64))
+
+    # ==================== QUERIES ====================
+
+    def neighbors(self, db: Session, user_id: int) -> Set[int]:
+        """Return the IDs of the users connected to user_id"""
+        self._ensure_loaded(db)
+        with self._lock:
+            self._apply_events()
+            node = self._node_of.get(user_id)
+            if node is None:
+                return set()
+            _, neighbors = self._gather(np.array([node], dtype=np.int64))
+            return set(self._user_ids(neighbors))
+
+    def friends_of_friends(self, db: Session, user_id: int) -> Dict[int, int]:
+        """Return {user_id: mutual count} for every 2nd-degree connection of user_id"""
+        self._ensure_loaded(db)
+        with self._lock:
+            self._apply_events()
+            node = self._node_of.get(user_id)
+            if node is None:
+                return {}
+
+            _, direct = self._gather(np.array([node], dtype=np.int64))
+            if not len(direct):
+                return {}
+            _, second = self._gather(direct)
+            counts = np.bincount(second, minlength=len(self._user_of))
+            counts[node] = 0
+            counts[direct] = 0
+
+            nodes = np.flatnonzero(counts)
+            return dict(zip(self._user_ids(nodes), counts[nodes].tolist()))
+
+    def degree_of_separation(self, db: Session, user_id: int, other_user_id: int,
+                             max_depth: int = 6) -> Optional[int]:
+        """Return the number of hops between two users, or None beyond max_depth"""
+        if user_id == other_user_id:
+            return 0
+        self._ensure_loaded(db)
+        with self._lock:
+            self._apply_events()
+            source = self._node_of.get(user_id)
+            target = self._node_of.get(other_user_id)
+            if source is None or target is None:
+                return None
+
+            # Breadth-first search, one vectorized frontier expansion per hop
+            visited = np.zeros(len(self._user_of), dtype=bool)
+            visited[source] = True
+            frontier = np.array([source], dtype=np.int64)
+            for depth in range(1, max_depth + 1):
+                _, reached = self._gather(frontier)
+                reached = np.unique(reached[~visited[reached]])
+                if not len(reached):
+                    return None
+                if np.any(reached == target):
+                    return depth
+                visited[reached] = True
+                frontier = reached
+            return None
+
+    # ==================== EVENTS ====================
+
+    def add_edge(self, user1_id: int, user2_id: int):
+        """Apply an accepted connection (queued; never blocks)"""
+        self._events.append((True, user1_id, user2_id))
+
+    def remove_edge(self, user1_id: int, user2_id: int):
+        """Apply a deleted connection (queued; never blocks)"""
+        self._events.append((False, user1_id, user2_id))
+
+    def invalidate(self):
+        """Reload the graph from the database in the background on the next query"""
+        self._reload_requested = True
+
+    # ==================== INTERNALS ====================
+
+    def _ensure_loaded(self, db: Session):
+        """Load the graph on first use; afterwards refresh it in the background when stale"""
+        if self._loaded_at is None:
+            with self._load_lock:
+                if self._loaded_at is None:
+                    self._reload(db)
+            return
+        stale = self._reload_requested or monotonic() - self._loaded_at > self._reload_seconds
+        if stale and self._load_lock.acquire(blocking=False):
+            threading.Thread(target=self._reload_in_background, name="social-graph-reload", daemon=True).start()
+
+    def _reload_in_background(self):
+        try:
+            db = SessionLocal()
+            try:
+                self._reload(db)
+            finally:
+                db.close()
+        except Exception as e:
+            logger.error(f"Social graph reload failed: {e}", exc_info=True)
+        finally:
+            self._load_lock.release()
+
+    def _reload(self, db: Session):
+        """Read the connections and build fresh CSR arrays off-lock, then swap them in"""
+        with self._lock:
+            self._reload_requested = False
+            self._replay = []
+        try:
+            rows = db.query(Connection.lowUserId, Connection.highUserId).filter(
+                Connection.status == ConnectionStatus.ACCEPTED
+            ).all()
+            edges = np.array(rows, dtype=np.int64).reshape(-1, 2)
+            state = self._csr(np.unique(edges), edges)
+        except Exception:
+            with self._lock:
+                self._replay = None
+            raise
+
+        with self._lock:
+            if self._loaded_at is not None:
+                self._apply_events()
+            replay, self._replay = self._replay, None
+            self.__dict__.update(state)
+            self._loaded_at = monotonic()
+            # Events applied since the read may or may not be in it; applying them again is a no-op
+            for added, user1_id, user2_id in replay:
+                self._apply(added, user1_id, user2_id)
+
+    def _apply_events(self):
+        """Apply queued connection events. Call with the lock held."""
+        while self._events:
+            added, user1_id, user2_id = self._events.popleft()
+            self._apply(added, user1_id, user2_id)
+            if self._replay is not None:
+                self._replay.append((added, user1_id, user2_id))
+
+    def _apply(self, added: bool, user1_id: int, user2_id: int):
+        if added:
+            a, b = self._node(user1_id), self._node(user2_id)
+            for x, y in ((a, b), (b, a)):
+                key = int(x * _PAIR_SHIFT + y)
+                if key in self._removed:
+                    self._removed.discard(key)
+                elif not self._base_has(x, y):
+                    self._added.setdefault(x, set()).add(y)
+        else:
+            a, b = self._node_of.get(user1_id), self._node_of.get(user2_id)
+            if a is None or b is None:
+                return
+            for x, y in ((a, b), (b, a)):
+                if y in self._added.get(x, ()):
+                    self._added[x].discard(y)
+                    if not self._added[x]:
+                        del self._added[x]
+                elif self._base_has(x, y):
+                    self._removed.add(int(x * _PAIR_SHIFT + y))
+        self._overlay_changed()
+
+    def _build(self, user_ids: np.ndarray, edges: np.ndarray):
+        """Replace the graph with CSR arrays built from user IDs and edges. Call with the lock held."""
+        self.__dict__.update(self._csr(user_ids, edges))
+
+    @staticmethod
+    def _csr(user_ids: np.ndarray, edges: np.ndarray) -> dict:
+        """Build graph state from sorted unique user IDs and (user, user) edge pairs"""
+        node_count = len(user_ids)
+        low = np.searchsorted(user_ids, edges[:, 0])
+        high = np.searchsorted(user_ids, edges[:, 1])
+        sources = np.concatenate([low, high])
+        targets = np.concatenate([high, low])
+
+        order = np.argsort(sources, kind="stable")
+        indptr = np.zeros(node_count + 1, dtype=np.int64)
+        np.cumsum(np.bincount(sources, minlength=node_count), out=indptr[1:])
+
+        user_of: List[int] = user_ids.tolist()
+        return {
+            "_indices": targets[order].astype(np.int32),
+            "_indptr": indptr,
+            "_user_of": user_of,
+            "_node_of": {user_id: node for node, user_id in enumerate(user_of)},
+            "_base_nodes": node_count,
+            "_added": {},
+            "_removed": set(),
+            "_removed_keys": None,
+            "_overlay_size": 0,
+        }
+
+    def _compact(self):
+        """Fold the overlay into fresh CSR arrays"""
+        positions, neighbors = self._gather(np.arange(len(self._user_of), dtype=np.int64))
+        keep = positions < neighbors
+        user_of = np.array(self._user_of, dtype=np.int64)
+        edges = np.stack([user_of[positions[keep]], user_of[neighbors[keep]]], axis=1)
+        self._build(np.unique(edges), edges)
+
+    def _gather(self, nodes: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Return (position in nodes, neighbour node) for every edge of the given nodes"""
+        positions = np.arange(len(nodes), dtype=np.int64)
+        in_base = nodes < self._base_nodes
+        base_nodes, base_positions = nodes[in_base], positions[in_base]
+
+        starts = self._indptr[base_nodes]
+        lengths = self._indptr[base_nodes + 1] - starts
+        row_starts = np.cumsum(lengths) - lengths
+        offsets = np.arange(int(lengths.sum()), dtype=np.int64) - np.repeat(row_starts, lengths)
+        owners = np.repeat(base_positions, lengths)
+        neighbors = self._indices[np.repeat(starts, lengths) + offsets].astype(np.int64)
+
+        if self._removed:
+            if self._removed_keys is None:
+                self._removed_keys = np.fromiter(self._removed, dtype=np.int64, count=len(self._removed))
+            keys = np.repeat(base_nodes, lengths) * _PAIR_SHIFT + neighbors
+            keep = ~np.isin(keys, self._removed_keys)
+            owners, neighbors = owners[keep], neighbors[keep]
+
+        if self._added:
+            added_nodes = np.fromiter(self._added.keys(), dtype=np.int64, count=len(self._added))
+            extra_owners, extra_neighbors = [], []
+            for position in np.flatnonzero(np.isin(nodes, added_nodes)).tolist():
+                added = self._added[int(nodes[position])]
+                extra_owners.extend([position] * len(added))
+                extra_neighbors.extend(added)
+            owners = np.concatenate([owners, np.array(extra_owners, dtype=np.int64)])
+            neighbors = np.concatenate([neighbors, np.array(extra_neighbors, dtype=np.int64)])
+
+        return owners, neighbors
+
+    def _base_has(self, x: int, y: int) -> bool:
+        if x >= self._base_nodes:
+            return False
+        return bool(np.any(self._indices[self._indptr[x]:self._indptr[x + 1]] == y))
+
+    def _node(self, user_id: int) -> int:
+        """Return the node of a user, appending one outside the CSR arrays if new"""
+        node = self._node_of.get(user_id)
+        if node is None:
+            node = len(self._user_of)
+            self._user_of.append(user_id)
+            self._node_of[user_id] = node
+        return node
+
+    def _user_ids(self, nodes: Iterable[int]) -> List[int]:
+        return [self._user_of[node] for node in np.asarray(nodes).tolist()]
+
+    def _overlay_changed(self):
+        self._removed_keys = None
+        self._overlay_size += 1
+        if self._overlay_size > self.COMPACT_THRESHOLD:
+            self._compact()
+
+
+# Global social graph instance
+social_graph = SocialGraph(reload_seconds=settings.SOCIAL_GRAPH_RELOAD_SECONDS)
@@ -0,0 +1,97 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import desc, literal, select, tuple_
+from sqlalchemy.dialects.postgresql import insert
+from models.post import Post, TimelineEntry
+from typing import List, Optional, Tuple
+from datetime import datetime
+
+
+class TimelineService:
+    """Fan-out-on-write home timelines.
+
+    Every post is written into the timeline of its author and of the author's
+    accepted connections when it is created, so reading a feed is a range scan
+    on timeline_entries instead of recomputing the visibility filter.
+    Public posts from non-connections are not fanned out; the feed reads them
+    from the partial index on public posts.
+    """
+
+    @staticmethod
+    def fan_out_post(db: Session, post: Post, recipient_ids: List[int]):
+        """Write a new post into the author's timeline and the given recipients' timelines"""
+        user_ids = set(recipient_ids)
+        user_ids.add(post.userId)
+        db.execute(
+            insert(TimelineEntry).values([
+                {"userId": user_id, "postId": post.id, "timestamp": post.timestamp}
+                for user_id in user_ids
+            ]).on_conflict_do_nothing()
+        )
+
+    @staticmethod
+    def backfill_connection(db: Session, user1_id: int, user2_id: int):
+        """Copy all of each user's posts into the other's timeline after they connect"""
+        for owner_id, author_id in ((user1_id, user2_id), (user2_id, user1_id)):
+            posts = select(
+                literal(owner_id), Post.id, Post.timestamp
+            ).where(
+                Post.userId == author_id,
+                Post.timestamp.isnot(None)
+            )
+
+            db.execute(
+                insert(TimelineEntry).from_select(
+                    ["userId", "postId", "timestamp"], posts
+                ).on_conflict_do_nothing()
+            )
+
+    @staticmethod
+    def prune_connection(db: Session, user1_id: int, user2_id: int):
+        """Remove each user's posts from the other's timeline after they disconnect"""
+        for owner_id, author_id in ((user1_id, user2_id), (user2_id, user1_id)):
+            db.query(TimelineEntry).filter(
+                TimelineEntry.userId == owner_id,
+                TimelineEntry.postId.in_(select(Post.id).where(Post.userId == author_id))
+            ).delete(synchronize_session=False)
+
+    @staticmethod
+    def get_feed_page(db: Session, user_id: int, limit: int,
+                      before: Optional[Tuple[datetime, int]] = None) -> List[Tuple[datetime, int]]:
+        """Return up to `limit` (timestamp, post_id) keys of the user's feed, newest first.
+
+        Merges two indexed range scans: the user's materialized timeline and
+        the public posts index.
+        """
+        timeline_query = db.query(TimelineEntry.timestamp, TimelineEntry.postId).filter(
+            TimelineEntry.userId == user_id
+        )
+        public_query = db.query(Post.timestamp, Post.id).filter(
+            Post.isPublic == True,
+            Post.timestamp.isnot(None)
+        )
+
+        if before:
+            timeline_query = timeline_query.filter(
+                tuple_(TimelineEntry.timestamp, TimelineEntry.postId) < tuple_(*before)
+            )
+            public_query = public_query.filter(tuple_(Post.timestamp, Post.id) < tuple_(*before))
+
+        timeline_keys = timeline_query.order_by(
+            desc(TimelineEntry.timestamp), desc(TimelineEntry.postId)
+        ).limit(limit).all()
+        public_keys = public_query.order_by(desc(Post.timestamp), desc(Post.id)).limit(limit).all()
+
+        # Connected users' public posts appear in both scans
+        merged = {post_id: timestamp for timestamp, post_id in timeline_keys}
+        merged.update({post_id: timestamp for timestamp, post_id in public_keys})
+
+        keys = sorted(((timestamp, post_id) for post_id, timestamp in merged.items()), reverse=True)
+        return keys[:limit]
+
+    @staticmethod
+    def count_feed(db: Session, user_id: int) -> int:
+        """Count every post visible in the user's feed"""
+        timeline_post_ids = select(TimelineEntry.postId).where(TimelineEntry.userId == user_id)
+        return db.query(Post).filter(
+            (Post.isPublic == True) | (Post.id.in_(timeline_post_ids))
+        ).count()
@@ -1,98 +1,365 @@
 """
 WebSocket connection manager for handling real-time updates.
 Manages active connections and broadcasts messages to relevant clients.
+
+A user may hold several sockets per channel (tabs, devices); broadcasts reach
+all of them and each socket is unregistered on its own.
+
+Every socket gets a bounded outbound queue drained by its own writer task, so
+broadcasts only enqueue and one slow client cannot hold up delivery to the
+others. A socket whose queue overflows is evicted (closed with 1013 "try
+again later"); clients reconnect and catch up (chats replay from since_seq).
+
+Frames a handler sends to its own socket (replays, acks, pongs, errors) go
+through the same queue with manager.send, so they stay in order with live
+frames; the handler waits for room instead of the socket being evicted.
+While a chat replay closes the gap after registering, live frames for the
+socket are held back (connect(..., hold=True) / release) and queued after it.
+
+A broadcast is serialized once per worker with orjson and the same text frame
+is queued for every recipient, instead of each send_json re-encoding it.
 """
-from typing import Dict, List, Set
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Union
 from fastapi import WebSocket
-import json
+import asyncio
 import logging
+import orjson
+from config import settings
+from services.backplane import InMemoryBackplane
 
 logger = logging.getLogger(__name__)
 
 
+def encode_frame(data: dict) -> str:
+    """Serialize a WebSocket event once, to be sent as-is to every recipient"""
+    return orjson.dumps(data, default=str).decode()
+
+
+def tag_frame(frame: str, topic: str) -> str:
+    """Prefix an encoded event with the "topic" of a /ws/stream subscription, without re-encoding it"""
+    tag = '{"topic":' + orjson.dumps(topic).decode()
+    return tag + "}" if frame == "{}" else tag + "," + frame[1:]
+
+
+class TopicSocket:
+    """
+    One topic of a multiplexed /ws/stream socket, registered with ConnectionManager
+    in place of a dedicated WebSocket. Events sent through it are tagged with the topic.
+    """
+
+    __slots__ = ("websocket", "topic")
+
+    def __init__(self, websocket: WebSocket, topic: str):
+        self.websocket = websocket
+        self.topic = topic
+
+    async def send_json(self, data: dict):
+        await self.websocket.send_json({"topic": self.topic, **data})
+
+
+# Anything registered with ConnectionManager: a WebSocket or one topic of a /ws/stream socket
+Connection = Union[WebSocket, TopicSocket]
+
+
+class SocketSender:
+    """
+    Connection record of one WebSocket: its owner, the channels it is registered
+    on and a bounded outbound queue drained by a dedicated writer task.
+    """
+
+    __slots__ = (
+        "websocket", "user_id", "registrations", "evicted", "_queue", "_held", "_on_failure", "_writer", "_closer"
+    )
+
+    def __init__(self, websocket: WebSocket, user_id: int, maxsize: int, on_failure):
+        self.websocket = websocket
+        self.user_id = user_id
+        # channel -> object registered for it (the WebSocket itself or a TopicSocket)
+        self.registrations: Dict[str, Connection] = {}
+        self.evicted = False
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+        # Live frames held back while the handler sends a replay (None when not holding)
+        self._held: Optional[List[str]] = None
+        self._on_failure = on_failure
+        self._writer = asyncio.create_task(self._run())
+        self._closer: Optional[asyncio.Task] = None
+
+    @property
+    def depth(self) -> int:
+        return self._queue.qsize()
+
+    def offer(self, frame: str) -> bool:
+        """Queue a frame without waiting; returns False if the socket is evicted or its queue is full"""
+        if self.evicted:
+            return False
+        if self._held is not None:
+            if len(self._held) >= self._queue.maxsize:
+                return False
+            self._held.append(frame)
+            return True
+        try:
+            self._queue.put_nowait(frame)
+        except asyncio.QueueFull:
+            return False
+        return True
+
+    async def put(self, frame: str) -> bool:
+        """Queue a frame of the socket's own handler, waiting for room; returns False if the socket is gone"""
+        if self.evicted or self._writer.done():
+            return False
+        try:
+            self._queue.put_nowait(frame)
+            return True
+        except asyncio.QueueFull:
+            pass
+        put = asyncio.ensure_future(self._queue.put(frame))
+        done, _ = await asyncio.wait({put, self._writer}, return_when=asyncio.FIRST_COMPLETED)
+        if put not in done:
+            put.cancel()
+            return False
+        return True
+
+    def hold(self):
+        """Hold back live frames until release()"""
+        if self._held is None:
+            self._held = []
+
+    async def release(self):
+        """Queue the held live frames, in order, behind what the handler sent meanwhile"""
+        while self._held:
+            if not await self.put(self._held.pop(0)):
+                break
+        self._held = None
+
+    def evict(self):
+        """Stop sending and close the socket; the endpoint's receive loop then ends normally"""
+        self.evicted = True
+        self.stop()
+        self._closer = asyncio.create_task(self._close())
+
+    def stop(self):
+        self._writer.cancel()
+
+    async def _close(self):
+        try:
+            await self.websocket.close(code=1013, reason="Client too slow")
+        except Exception:
+            pass  # Connection may already be closed
+
+    async def _run(self):
+        while True:
+            frame = await self._queue.get()
+            try:
+                await self.websocket.send_text(frame)
+            except Exception as e:
+                logger.error(f"Error sending to WebSocket: {e}")
+                self._on_failure(self)
+                return
+
+
 class ConnectionManager:
     """Manages WebSocket connections for different channels"""
 
+    # Channels kept even while empty; per-chat channels are dropped with their last socket
+    CHANNELS = (
+        "messages",      # Chat messages
+        "connections",   # Connection requests
+        "notifications", # General notifications
+        "feed",          # Posts/comments updates
+        "online",        # User online status
+    )
+
     def __init__(self):
-        # Store connections by channel
-        # Format: {channel_name: {user_id: websocket}}
-        self.active_connections: Dict[str, Dict[int, WebSocket]] = {
-            "messages": {},      # Chat messages
-            "connections": {},   # Connection requests
-            "notifications": {}, # General notifications
-            "feed": {},          # Posts/comments updates
-            "online": {},        # User online status
+        # Store connections by channel; a user has one entry per open socket (tab, device)
+        # Format: {channel_name: {user_id: {websocket, ...}}}
+        self.active_connections: Dict[str, Dict[int, Set[Connection]]] = {
+            channel: {} for channel in self.CHANNELS
         }
+        # One record per underlying WebSocket, shared by the topics of a /ws/stream socket
+        self._senders: Dict[WebSocket, SocketSender] = {}
+        self.send_queue_size = settings.WEBSOCKET_SEND_QUEUE_SIZE
+        self.dropped_frames = 0
+        self.evicted_sockets = 0
+        self.backplane = InMemoryBackplane()
+        # channel -> handler for state that workers share over the backplane instead of sending to sockets
+        self._handlers: Dict[str, Callable[[dict], Awaitable[None]]] = {}
+
+    async def connect(self, websocket: Connection, channel: str, user_id: int, hold: bool = False) -> bool:
+        """Register a new WebSocket connection; returns True if it is the user's first in the channel.
 
-    async def connect(self, websocket: WebSocket, channel: str, user_id: int):
-        """Register a new WebSocket connection"""
+        With hold, live frames for the socket are held back until release().
+        """
         # Note: websocket should already be accepted by authenticate_websocket
-        if channel not in self.active_connections:
-            self.active_connections[channel] = {}
-        self.active_connections[channel][user_id] = websocket
+        users = self.active_connections.setdefault(channel, {})
+        first = user_id not in users
+        users.setdefault(user_id, set()).add(websocket)
+        raw = self._raw_socket(websocket)
+        sender = self._senders.get(raw)
+        if sender is None:
+            sender = self._senders[raw] = SocketSender(raw, user_id, self.send_queue_size, self._drop_sender)
+        sender.registrations[channel] = websocket
+        if hold:
+            sender.hold()
         logger.info(f"User {user_id} connected to {channel} channel")
+        return first
 
-    def disconnect(self, channel: str, user_id: int):
-        """Remove a WebSocket connection"""
-        if channel in self.active_connections:
-            self.active_connections[channel].pop(user_id, None)
-            logger.info(f"User {user_id} disconnected from {channel} channel")
+    async def release(self, websocket: Connection):
+        """Send the live frames held back since connect(..., hold=True)"""
+        sender = self._senders.get(self._raw_socket(websocket))
+        if sender is not None:
+            await sender.release()
 
-    async def broadcast_to_channel(self, channel: str, data: dict):
-        """Broadcast message to all users in a channel"""
-        if channel not in self.active_connections:
+    async def send(self, websocket: Connection, data: dict):
+        """Send a frame to one socket from its own handler, in order with its queued live frames"""
+        sender = self._senders.get(self._raw_socket(websocket))
+        if sender is None:
+            # Not registered on any channel: nothing else writes to the socket
+            await websocket.send_json(data)
             return
+        frame = encode_frame(data)
+        if isinstance(websocket, TopicSocket):
+            frame = tag_frame(frame, websocket.topic)
+        await sender.put(frame)
 
-        disconnected = []
-        for user_id, connection in self.active_connections[channel].items():
-            try:
-                await connection.send_json(data)
-            except Exception as e:
-                logger.error(f"Error sending to user {user_id}: {e}")
-                disconnected.append(user_id)
+    def disconnect(self, websocket: Connection, channel: str, user_id: int) -> bool:
+        """Remove a WebSocket connection; returns True if the user has no socket left in the channel"""
+        self._unregister(websocket, channel, user_id)
+        sender = self._senders.get(self._raw_socket(websocket))
+        if sender is not None and sender.registrations.get(channel) is websocket:
+            del sender.registrations[channel]
+            if not sender.registrations:
+                sender.stop()
+                del self._senders[sender.websocket]
+        logger.info(f"User {user_id} disconnected from {channel} channel")
+        return user_id not in self.active_connections.get(channel, {})
+
+    # ==================== BROADCASTS ====================
+    # Broadcasts are published once on the backplane; every worker, this one
+    # included, delivers them to the sockets it holds (see _deliver). A failed
+    # publish is logged and dropped: broadcasts follow writes that are already
+    # committed, and clients catch up on reconnect.
+
+    async def start_backplane(self, backplane):
+        """Route broadcasts through the given backplane (in-memory by default)"""
+        await self.backplane.stop()
+        self.backplane = backplane
+        await self.backplane.start(self._deliver)
 
-        # Clean up disconnected clients
-        for user_id in disconnected:
-            self.disconnect(channel, user_id)
+    async def stop_backplane(self):
+        await self.backplane.stop()
+
+    async def broadcast_to_channel(self, channel: str, data: dict):
+        """Broadcast message to all users in a channel"""
+        await self._publish({"channel": channel, "data": data})
 
     async def broadcast_to_user(self, channel: str, user_id: int, data: dict):
         """Send message to specific user in a channel"""
-        if channel not in self.active_connections:
-            return
-
-        connection = self.active_connections[channel].get(user_id)
-        if connection:
-            try:
-                await connection.send_json(data)
-            except Exception as e:
-                logger.error(f"Error sending to user {user_id}: {e}")
-                self.disconnect(channel, user_id)
+        await self._publish({"channel": channel, "user_ids": [user_id], "data": data})
 
     async def broadcast_to_users(self, channel: str, user_ids: List[int], data: dict):
         """Send message to specific users in a channel"""
+        await self._publish({"channel": channel, "user_ids": list(user_ids), "data": data})
+
+    def subscribe(self, channel: str, handler: Callable[[dict], Awaitable[None]]):
+        """Hand the data published on a worker-to-worker channel to handler, on every worker"""
+        self._handlers[channel] = handler
+
+    async def publish(self, channel: str, data: dict):
+        """Publish data on a worker-to-worker channel (see subscribe)"""
+        await self._publish({"channel": channel, "data": data})
+
+    async def deliver_to_local_users(self, channel: str, user_ids: List[int], data: dict):
+        """Send a message to the sockets of the given users held by this worker only"""
+        await self._deliver({"channel": channel, "user_ids": list(user_ids), "data": data})
+
+    async def _publish(self, envelope: dict):
+        try:
+            await self.backplane.publish(envelope)
+        except Exception as e:
+            logger.error(f"Failed to publish broadcast on {envelope['channel']}: {e}", exc_info=True)
+
+    async def _deliver(self, envelope: dict):
+        """Queue a published broadcast on the matching sockets of this worker"""
+        channel = envelope["channel"]
+        if channel in self._handlers:
+            await self._handlers[channel](envelope["data"])
+            return
         if channel not in self.active_connections:
             return
+        users = self.active_connections[channel]
+        if envelope.get("user_ids") is None:
+            user_ids = list(users)
+        else:
+            user_ids = [user_id for user_id in envelope["user_ids"] if user_id in users]
+        # Every socket (device) of every recipient
+        targets = [(user_id, connection) for user_id in user_ids for connection in list(users[user_id])]
+        if not targets:
+            return
 
-        disconnected = []
-        for user_id in user_ids:
-            connection = self.active_connections[channel].get(user_id)
-            if connection:
-                try:
-                    await connection.send_json(data)
-                except Exception as e:
-                    logger.error(f"Error sending to user {user_id}: {e}")
-                    disconnected.append(user_id)
-
-        # Clean up disconnected clients
-        for user_id in disconnected:
-            self.disconnect(channel, user_id)
+        frame = encode_frame(envelope["data"])
+        tagged: Dict[str, str] = {}
+        for user_id, connection in targets:
+            sender = self._senders.get(self._raw_socket(connection))
+            if sender is None or sender.evicted:
+                continue
+            if isinstance(connection, TopicSocket):
+                if connection.topic not in tagged:
+                    tagged[connection.topic] = tag_frame(frame, connection.topic)
+                accepted = sender.offer(tagged[connection.topic])
+            else:
+                accepted = sender.offer(frame)
+            if not accepted:
+                # The rejected frame and everything still queued for the socket are lost
+                self.dropped_frames += 1 + sender.depth
+                logger.warning(f"Evicting slow WebSocket of user {user_id} ({channel}): send queue full")
+                self.evicted_sockets += 1
+                sender.evict()
+                self._drop_sender(sender)
 
     def get_connected_users(self, channel: str) -> Set[int]:
-        """Get all connected users in a channel"""
+        """Get the users connected to a channel on this worker"""
         if channel not in self.active_connections:
             return set()
         return set(self.active_connections[channel].keys())
 
+    def get_stats(self) -> dict:
+        """Send-queue depth and drop counters of this worker"""
+        depths = [sender.depth for sender in self._senders.values()]
+        return {
+            "sockets": len(self._senders),
+            "queue_capacity": self.send_queue_size,
+            "queued_frames": sum(depths),
+            "max_queue_depth": max(depths, default=0),
+            "dropped_frames": self.dropped_frames,
+            "evicted_sockets": self.evicted_sockets,
+        }
+
+    # ==================== INTERNALS ====================
+
+    @staticmethod
+    def _raw_socket(connection) -> WebSocket:
+        return connection.websocket if isinstance(connection, TopicSocket) else connection
+
+    def _unregister(self, connection: Connection, channel: str, user_id: int):
+        users = self.active_connections.get(channel)
+        sockets = users.get(user_id) if users is not None else None
+        if sockets is None:
+            return
+        sockets.discard(connection)
+        if not sockets:
+            del users[user_id]
+            if not users and channel not in self.CHANNELS:
+                del self.active_connections[channel]
+
+    def _drop_sender(self, sender: SocketSender):
+        """Unregister every channel of a socket that failed or was evicted"""
+        for channel, connection in sender.registrations.items():
+            self._unregister(connection, channel, sender.user_id)
+        sender.registrations.clear()
+        sender.stop()
+        if self._senders.get(sender.websocket) is sender:
+            del self._senders[sender.websocket]
+
 
 # Global connection manager instance
 manager = ConnectionManager()
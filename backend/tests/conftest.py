@@ -0,0 +1,86 @@
+"""
+Shared fixtures: a throwaway SQLite database standing in for Postgres.
+
+Settings are read from the environment when config is first imported, so
+they are set here before any application module is loaded.
+"""
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+_DB_DIR = tempfile.mkdtemp(prefix="academic-platform-tests-")
+os.environ.update({
+    "DATABASE_URL": f"sqlite:///{_DB_DIR}/test.db",
+    "SECRET_KEY": "test-secret-key-that-is-long-enough-1234",
+    "SMTP_USER": "tests@example.com",
+    "SMTP_PASSWORD": "unused",
+    "CORS_ORIGINS": "http://localhost",
+    "SCOPUS_API_KEY": "unused",
+})
+
+from sqlalchemy import event
+
+import models
+from database import Base, SessionLocal, engine
+from models.connection import Connection, ConnectionStatus
+from models.user import User
+from services import active_user_cache, chat_membership_cache, connection_graph_cache
+
+
+@event.listens_for(engine, "connect")
+def _register_postgres_functions(dbapi_connection, _):
+    # SQLite spells GREATEST/LEAST as multi-argument max()/min()
+    dbapi_connection.create_function("greatest", -1, max)
+    dbapi_connection.create_function("least", -1, min)
+
+
+@pytest.fixture(autouse=True)
+def schema():
+    Base.metadata.create_all(bind=engine)
+    yield
+    Base.metadata.drop_all(bind=engine)
+    # IDs are reused by the next test's fresh tables
+    for cache in (connection_graph_cache._adjacency, connection_graph_cache._statuses,
+                  chat_membership_cache._participants, active_user_cache._active_ids):
+        cache.clear()
+
+
+@pytest.fixture
+def db():
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+@pytest.fixture
+def make_user(db):
+    def make_user(name: str) -> User:
+        user = User(fullName=name, password="unused", email=f"{name.lower()}@example.com")
+        db.add(user)
+        db.commit()
+        return user
+    return make_user
+
+
+@pytest.fixture
+def connect(db):
+    """Create an accepted connection between two users"""
+    def connect(user1: User, user2: User) -> Connection:
+        low_user_id, high_user_id = Connection.pair_key(user1.id, user2.id)
+        connection = Connection(
+            status=ConnectionStatus.ACCEPTED, senderId=user1.id, receiverId=user2.id,
+            lowUserId=low_user_id, highUserId=high_user_id
+        )
+        db.add(connection)
+        db.commit()
+        return connection
+    return connect
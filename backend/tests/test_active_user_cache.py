@@ -0,0 +1,21 @@
+from services.active_user_cache import ActiveUserCache
+
+
+def test_existing_users_are_cached_until_invalidated(db, make_user):
+    alice = make_user("Alice")
+
+    assert not ActiveUserCache.is_cached(alice.id)
+    assert ActiveUserCache.exists(alice.id)
+    assert ActiveUserCache.is_cached(alice.id)
+
+    db.delete(alice)
+    db.commit()
+    # Served from the cache until the deletion invalidates it
+    assert ActiveUserCache.exists(alice.id)
+    ActiveUserCache.invalidate(alice.id)
+    assert not ActiveUserCache.exists(alice.id)
+
+
+def test_unknown_users_are_not_cached(db):
+    assert not ActiveUserCache.exists(404)
+    assert not ActiveUserCache.is_cached(404)
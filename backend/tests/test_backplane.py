@@ -0,0 +1,103 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+from services import backplane as backplane_module
+from services.backplane import PostgresBackplane
+from services.websocket_manager import ConnectionManager
+
+
+class FakeConnection:
+    """Stands in for a psycopg2 connection; poll() either fails or yields queued payloads"""
+
+    def __init__(self, payloads=(), broken=False):
+        self.closed = 0
+        self.notifies = []
+        self.statements = []
+        self._payloads = list(payloads)
+        self._broken = broken
+
+    def cursor(self):
+        connection = self
+
+        class Cursor:
+            def __enter__(self):
+                return self
+
+            def __exit__(self, *exc):
+                return False
+
+            def execute(self, statement, params=None):
+                connection.statements.append(statement)
+
+        return Cursor()
+
+    def poll(self):
+        if self._broken:
+            self.closed = 2
+            raise ConnectionError("server closed the connection unexpectedly")
+        self.notifies.extend(SimpleNamespace(payload=payload) for payload in self._payloads)
+        self._payloads = []
+
+    def close(self):
+        self.closed = 1
+
+
+def test_listener_reconnects_and_listens_again(monkeypatch):
+    envelope = {"channel": "feed", "data": {"type": "new_post"}}
+    broken, publisher, healthy = FakeConnection(broken=True), FakeConnection(), FakeConnection([json.dumps(envelope)])
+    connections = iter([broken, publisher, healthy])
+    monkeypatch.setattr(PostgresBackplane, "_autocommit_connection", lambda self: next(connections))
+    monkeypatch.setattr(PostgresBackplane, "RECONNECT_DELAY_SECONDS", 0.01)
+    monkeypatch.setattr(backplane_module.select, "select", lambda r, w, x, timeout: (r, w, x))
+
+    async def scenario():
+        received = asyncio.Queue()
+        backplane = PostgresBackplane(engine=None)
+        await backplane.start(received.put)
+        try:
+            return await asyncio.wait_for(received.get(), 2)
+        finally:
+            await backplane.stop()
+
+    assert asyncio.run(scenario()) == envelope
+    assert broken.closed
+    assert healthy.statements == [f"LISTEN {PostgresBackplane.CHANNEL}"]
+
+
+def _chunk(chunk_id, index, count, data):
+    return json.dumps({"chunk": chunk_id, "index": index, "count": count, "data": data})
+
+
+def test_stale_partial_envelopes_are_evicted(monkeypatch):
+    clock = [100.0]
+    monkeypatch.setattr(backplane_module.time, "monotonic", lambda: clock[0])
+    backplane = PostgresBackplane(engine=None)
+    payload = json.dumps({"channel": "feed", "data": {}})
+
+    assert backplane._assemble(_chunk("lost", 0, 2, payload[:5])) is None
+    clock[0] += PostgresBackplane.PARTIAL_TIMEOUT_SECONDS + 1
+    assert backplane._assemble(_chunk("whole", 0, 2, payload[:5])) is None
+    assert list(backplane._partial) == ["whole"]
+    assert backplane._assemble(_chunk("whole", 1, 2, payload[5:])) == {"channel": "feed", "data": {}}
+    assert not backplane._partial
+
+
+def test_partial_envelopes_are_bounded():
+    backplane = PostgresBackplane(engine=None)
+    for index in range(PostgresBackplane.MAX_PARTIAL_ENVELOPES + 5):
+        backplane._assemble(_chunk(f"envelope-{index}", 0, 2, "{"))
+
+    assert len(backplane._partial) == PostgresBackplane.MAX_PARTIAL_ENVELOPES
+    assert "envelope-0" not in backplane._partial
+
+
+def test_failed_publish_does_not_reach_the_caller():
+    class BrokenBackplane:
+        async def publish(self, envelope):
+            raise ConnectionError("backplane unavailable")
+
+    manager = ConnectionManager()
+    manager.backplane = BrokenBackplane()
+
+    asyncio.run(manager.broadcast_to_user("notifications", 1, {"type": "badges"}))
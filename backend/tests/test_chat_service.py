@@ -0,0 +1,109 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from database import SessionLocal
+from models.user import User
+from services.badge_service import BadgeService
+from services.chat_service import ChatService
+
+
+def _send(db, sender, receiver, count):
+    return [ChatService.send_message(db, sender, receiver.id, f"message {i}") for i in range(count)]
+
+
+def test_history_defaults_to_the_latest_page(db, make_user):
+    alice, bob = make_user("Alice"), make_user("Bob")
+    messages = _send(db, alice, bob, ChatService.DEFAULT_PAGE_SIZE + 10)
+    chat_id = messages[0].chatId
+
+    page = ChatService.get_chat_messages(db, chat_id, bob)
+
+    assert [m.id for m in page] == [m.id for m in messages[-ChatService.DEFAULT_PAGE_SIZE:]]
+
+
+def test_history_pages_back_with_before(db, make_user):
+    alice, bob = make_user("Alice"), make_user("Bob")
+    messages = _send(db, alice, bob, 5)
+    chat_id = messages[0].chatId
+
+    page = ChatService.get_chat_messages(db, chat_id, bob, before=messages[3].id, limit=2)
+
+    assert [m.id for m in page] == [messages[1].id, messages[2].id]
+
+
+def test_chat_detail_includes_only_the_latest_page(db, make_user):
+    alice, bob = make_user("Alice"), make_user("Bob")
+    messages = _send(db, alice, bob, ChatService.DEFAULT_PAGE_SIZE + 1)
+
+    detail = ChatService.get_chat_detail(db, messages[0].chatId, bob)
+
+    assert len(detail["messages"]) == ChatService.DEFAULT_PAGE_SIZE
+    assert detail["messages"][-1].id == messages[-1].id
+
+
+def _concurrently(count, call):
+    """Run call(session) in count threads at once, each with its own session; return results or exceptions"""
+    barrier = threading.Barrier(count)
+
+    def run(_):
+        session = SessionLocal()
+        try:
+            barrier.wait()
+            return call(session)
+        except Exception as e:
+            return e
+        finally:
+            session.close()
+
+    with ThreadPoolExecutor(max_workers=count) as pool:
+        return list(pool.map(run, range(count)))
+
+
+def test_concurrent_mark_as_read_subtracts_unread_once(db, make_user):
+    alice, bob, carol = make_user("Alice"), make_user("Bob"), make_user("Carol")
+    chat_id = _send(db, alice, bob, 10)[0].chatId
+    _send(db, carol, bob, 3)
+    assert BadgeService.get_badges(db, bob.id)["unreadMessages"] == 13
+
+    _concurrently(8, lambda session: ChatService.mark_chat_as_read(session, chat_id, session.get(User, bob.id)))
+
+    db.expire_all()
+    assert BadgeService.get_badges(db, bob.id)["unreadMessages"] == 3
+
+
+def test_inbox_lists_most_recent_activity_first_with_unread_counts(db, make_user):
+    alice, bob, carol = make_user("Alice"), make_user("Bob"), make_user("Carol")
+    with_bob = _send(db, bob, alice, 3)
+    with_carol = _send(db, carol, alice, 1)
+    ChatService.mark_chat_as_read(db, with_carol[0].chatId, alice)
+    latest = ChatService.send_message(db, alice, bob.id, "reply")
+
+    inbox = ChatService.get_inbox(db, alice)
+
+    assert [(item["id"], item["lastMessage"].id, item["unreadCount"]) for item in inbox] == [
+        (with_bob[0].chatId, latest.id, 3),
+        (with_carol[0].chatId, with_carol[0].id, 0),
+    ]
+
+
+def test_read_watermark_marks_messages_up_to_the_newest(db, make_user):
+    alice, bob = make_user("Alice"), make_user("Bob")
+    before = _send(db, alice, bob, 2)
+    ChatService.mark_chat_as_read(db, before[0].chatId, bob)
+    after = _send(db, alice, bob, 1)
+
+    page = ChatService.get_chat_messages(db, before[0].chatId, bob)
+
+    assert [m.is_read for m in page] == [1, 1, 0]
+    assert after[0].is_read == 0
+
+
+def test_messages_get_consecutive_seqs_for_replay(db, make_user):
+    alice, bob = make_user("Alice"), make_user("Bob")
+    messages = _send(db, alice, bob, 2) + _send(db, bob, alice, 2)
+    chat_id = messages[0].chatId
+
+    missed = ChatService.get_messages_since(db, chat_id, since_seq=1, limit=2)
+
+    assert [m.seq for m in messages] == [1, 2, 3, 4]
+    assert [m.id for m in missed] == [messages[1].id, messages[2].id]
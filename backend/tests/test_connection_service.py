@@ -0,0 +1,129 @@
+from concurrent.futures import ThreadPoolExecutor
+import threading
+
+import pytest
+from fastapi import HTTPException
+
+from database import SessionLocal
+from models.connection import Connection, ConnectionStatus
+from models.user import User
+from services.badge_service import BadgeService
+from services.connection_service import ConnectionService
+
+
+def _settle_concurrently(connection_id, user_id, settle, count=6):
+    barrier = threading.Barrier(count)
+
+    def run(_):
+        session = SessionLocal()
+        try:
+            barrier.wait()
+            settle(session, connection_id, session.get(User, user_id))
+            return None
+        except HTTPException as e:
+            return e.status_code
+        finally:
+            session.close()
+
+    with ThreadPoolExecutor(max_workers=count) as pool:
+        return list(pool.map(run, range(count)))
+
+
+def test_concurrent_accepts_decrement_pending_once(db, make_user):
+    alice, bob, carol = make_user("Alice"), make_user("Bob"), make_user("Carol")
+    request = ConnectionService.send_request(db, alice, bob.id)
+    ConnectionService.send_request(db, carol, bob.id)
+    assert BadgeService.get_badges(db, bob.id)["pendingConnections"] == 2
+
+    results = _settle_concurrently(request.id, bob.id, ConnectionService.accept_request)
+
+    assert results.count(None) == 1
+    assert set(results) - {None} <= {400}
+    db.expire_all()
+    assert BadgeService.get_badges(db, bob.id)["pendingConnections"] == 1
+    assert db.get(Connection, request.id).status == ConnectionStatus.ACCEPTED
+
+
+def test_reject_after_accept_is_refused(db, make_user):
+    alice, bob = make_user("Alice"), make_user("Bob")
+    request = ConnectionService.send_request(db, alice, bob.id)
+    ConnectionService.accept_request(db, request.id, bob)
+
+    try:
+        ConnectionService.reject_request(db, request.id, bob)
+    except HTTPException as e:
+        assert e.status_code == 400
+    else:
+        raise AssertionError("reject_request settled an accepted request")
+    assert BadgeService.get_badges(db, bob.id)["pendingConnections"] == 0
+    assert db.get(Connection, request.id).status == ConnectionStatus.ACCEPTED
+
+
+def test_mutual_counts_match_mutual_connections(db, make_user, connect):
+    alice, bob, carol, dave = (make_user(name) for name in ("Alice", "Bob", "Carol", "Dave"))
+    connect(alice, carol)
+    connect(bob, carol)
+    connect(alice, dave)
+    removed = connect(bob, dave)
+    # Unfriended on another worker: no graph event reaches this one
+    db.query(Connection).filter(Connection.id == removed.id).delete()
+    db.commit()
+
+    counts = ConnectionService.get_mutual_counts(db, alice, [bob.id, carol.id])
+
+    assert counts == {bob.id: len(ConnectionService.get_mutual_connections(db, alice, bob.id)), carol.id: 0}
+    assert counts[bob.id] == 1
+
+
+def test_rejected_request_is_reopened_in_place(db, make_user):
+    alice, bob = make_user("Alice"), make_user("Bob")
+    request = ConnectionService.send_request(db, alice, bob.id)
+    ConnectionService.reject_request(db, request.id, bob)
+
+    reopened = ConnectionService.send_request(db, bob, alice.id)
+
+    assert reopened.id == request.id
+    assert (reopened.senderId, reopened.receiverId) == (bob.id, alice.id)
+    assert reopened.status == ConnectionStatus.PENDING
+    assert db.query(Connection).count() == 1
+
+
+def test_request_in_either_direction_is_refused_while_pending(db, make_user):
+    alice, bob = make_user("Alice"), make_user("Bob")
+    ConnectionService.send_request(db, alice, bob.id)
+
+    with pytest.raises(HTTPException) as error:
+        ConnectionService.send_request(db, bob, alice.id)
+
+    assert error.value.status_code == 400
+
+
+def test_mutual_connections_are_the_shared_neighbours(db, make_user, connect):
+    alice, bob, carol, dave, erin = (make_user(name) for name in ("Alice", "Bob", "Carol", "Dave", "Erin"))
+    connect(alice, carol)
+    connect(dave, alice)
+    connect(alice, erin)
+    connect(bob, carol)
+    connect(dave, bob)
+
+    mutual = ConnectionService.get_mutual_connections(db, alice, bob.id)
+
+    assert sorted({c.senderId, c.receiverId} - {alice.id} for c in mutual) == [{carol.id}, {dave.id}]
+
+
+def test_statuses_are_seen_from_the_current_user(db, make_user, connect):
+    alice, bob, carol, dave, erin = (make_user(name) for name in ("Alice", "Bob", "Carol", "Dave", "Erin"))
+    connection = connect(alice, bob)
+    incoming = ConnectionService.send_request(db, carol, alice.id)
+    outgoing = ConnectionService.send_request(db, alice, dave.id)
+    rejected = ConnectionService.send_request(db, alice, erin.id)
+    ConnectionService.reject_request(db, rejected.id, erin)
+
+    statuses = ConnectionService.get_statuses(db, alice, [bob.id, carol.id, dave.id, erin.id])
+
+    assert statuses == {
+        bob.id: {"status": "connected", "connectionId": connection.id},
+        carol.id: {"status": "pending_in", "connectionId": incoming.id},
+        dave.id: {"status": "pending_out", "connectionId": outgoing.id},
+        erin.id: {"status": "none", "connectionId": None},
+    }
@@ -0,0 +1,62 @@
+import asyncio
+
+import pytest
+
+from models.chat import Message
+from services.chat_service import ChatService
+from services.message_ingest import MessageIngest
+from services.websocket_manager import manager
+
+
+def test_writer_survives_a_fan_out_error(db, make_user, monkeypatch):
+    alice, bob = make_user("Alice"), make_user("Bob")
+    chat = ChatService.get_or_create_chat(db, alice, bob.id)
+
+    async def broken_broadcast(*args, **kwargs):
+        raise ConnectionError("socket send failed")
+
+    monkeypatch.setattr(manager, "broadcast_to_users", broken_broadcast)
+
+    async def scenario():
+        ingest = MessageIngest()
+        first = await ingest.submit(chat.id, alice.id, bob.id, "first")
+        second = await ingest.submit(chat.id, bob.id, alice.id, "second")
+        writer_alive = not ingest._writer.done()
+        await ingest.stop()
+        return first, second, writer_alive
+
+    first, second, writer_alive = asyncio.run(scenario())
+
+    assert writer_alive
+    assert first["id"] < second["id"]
+    assert [m.content for m in db.query(Message).order_by(Message.id)] == ["first", "second"]
+
+
+def test_crashed_writer_fails_waiting_senders_and_restarts(db, make_user, monkeypatch):
+    alice, bob = make_user("Alice"), make_user("Bob")
+    chat = ChatService.get_or_create_chat(db, alice, bob.id)
+
+    async def scenario():
+        ingest = MessageIngest()
+        store = ingest._store
+        calls = []
+
+        async def crash_once(batch):
+            calls.append(batch)
+            if len(calls) == 1:
+                raise RuntimeError("writer bug")
+            await store(batch)
+
+        monkeypatch.setattr(ingest, "_store", crash_once)
+        with pytest.raises(RuntimeError, match="stopped before the message was stored"):
+            await asyncio.wait_for(ingest.submit(chat.id, alice.id, bob.id, "lost"), 1)
+        queue = ingest._queue
+        stored = await ingest.submit(chat.id, alice.id, bob.id, "kept")
+        assert ingest._queue is queue
+        await ingest.stop()
+        return stored
+
+    stored = asyncio.run(scenario())
+
+    assert stored["content"] == "kept"
+    assert [m.content for m in db.query(Message)] == ["kept"]
@@ -0,0 +1,132 @@
+from datetime import datetime
+from types import SimpleNamespace
+
+from sqlalchemy import text
+
+from models.connection import Connection
+from models.post import Comment, ReactionType
+from services.connection_graph_cache import ConnectionGraphCache
+from services.counter_service import CounterService
+from services.post_service import PostService
+from services.timeline_service import TimelineService
+
+
+def _create_post(db, author, is_public=False):
+    return PostService.create_post(db, author, SimpleNamespace(content="hello", attachement=None, isPublic=is_public))
+
+
+def _feed_post_ids(db, user):
+    return {post_id for _, post_id in TimelineService.get_feed_page(db, user.id, limit=100)}
+
+
+def test_private_post_reaches_connections(db, make_user, connect):
+    alice, bob = make_user("Alice"), make_user("Bob")
+    connect(alice, bob)
+
+    post = _create_post(db, alice)
+
+    assert post.id in _feed_post_ids(db, bob)
+
+
+def test_private_post_skips_connection_removed_on_another_worker(db, make_user, connect):
+    alice, bob = make_user("Alice"), make_user("Bob")
+    connection = connect(alice, bob)
+    # This worker still caches the connection; another worker deletes it
+    assert ConnectionGraphCache.are_connected(db, alice.id, bob.id)
+    db.query(Connection).filter(Connection.id == connection.id).delete()
+    db.commit()
+
+    post = _create_post(db, alice)
+
+    assert post.id not in _feed_post_ids(db, bob)
+    assert post.id in _feed_post_ids(db, alice)
+
+
+def test_private_post_reaches_connection_made_on_another_worker(db, make_user, connect):
+    alice, bob = make_user("Alice"), make_user("Bob")
+    assert not ConnectionGraphCache.are_connected(db, alice.id, bob.id)
+    connect(alice, bob)
+
+    post = _create_post(db, alice)
+
+    assert post.id in _feed_post_ids(db, bob)
+
+
+def test_comments_page_in_order_on_the_post_index(db, make_user):
+    alice, bob = make_user("Alice"), make_user("Bob")
+    post = _create_post(db, alice, is_public=True)
+    comments = [
+        Comment(content=f"comment {i}", postId=post.id, userId=bob.id, timestamp=datetime(2026, 1, 1, 12, i % 3))
+        for i in range(5)
+    ]
+    db.add_all(comments)
+    db.commit()
+
+    pages, cursor = [], None
+    while True:
+        page = PostService.get_post_comments(db, post.id, bob, limit=2, cursor=cursor)
+        pages.append([comment.id for comment in page["comments"]])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+
+    expected = [c.id for c in sorted(comments, key=lambda c: (c.timestamp, c.id))]
+    assert [comment_id for page in pages for comment_id in page] == expected
+    assert [len(page) for page in pages] == [2, 2, 1]
+    plan = db.execute(text(
+        'EXPLAIN QUERY PLAN SELECT id FROM comments WHERE "postId" = :post_id ORDER BY "timestamp", id LIMIT 3'
+    ), {"post_id": post.id}).all()
+    assert any("ix_comments_post_timestamp_id" in row[-1] for row in plan)
+
+
+def test_feed_cursor_pages_cover_every_post_once(db, make_user):
+    alice, bob = make_user("Alice"), make_user("Bob")
+    posts = [_create_post(db, alice, is_public=True) for _ in range(5)]
+
+    pages, cursor = [], None
+    while True:
+        page = PostService.get_feed(db, bob, limit=2, cursor=cursor, include_total=False)
+        assert page["total"] is None
+        pages.append([post.id for post in page["posts"]])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+
+    assert [post_id for page in pages for post_id in page] == [post.id for post in reversed(posts)]
+    assert [len(page) for page in pages] == [2, 2, 1]
+
+
+def test_feed_summary_counts_engagement_and_caps_comments(db, make_user):
+    alice, bob = make_user("Alice"), make_user("Bob")
+    post = _create_post(db, alice, is_public=True)
+    comments = [PostService.add_comment(db, post.id, bob, SimpleNamespace(content=f"comment {i}")) for i in range(4)]
+    PostService.add_or_update_reaction(db, bob, ReactionType.LIKE, post_id=post.id)
+    PostService.add_or_update_reaction(db, alice, ReactionType.LOVE, post_id=post.id)
+
+    summary, = PostService.get_feed_summary(db, bob, comments_limit=2)["posts"]
+
+    assert summary["commentCount"] == 4
+    assert summary["reactionSummary"]["like"] == 1
+    assert summary["reactionSummary"]["love"] == 1
+    assert summary["reactionSummary"]["total"] == 2
+    assert summary["userReaction"] == ReactionType.LIKE
+    assert [comment.id for comment in summary["recentComments"]] == [comments[0].id, comments[1].id]
+
+
+def test_counters_follow_reaction_and_comment_writes(db, make_user):
+    alice, bob = make_user("Alice"), make_user("Bob")
+    post = _create_post(db, alice, is_public=True)
+    comment = PostService.add_comment(db, post.id, bob, SimpleNamespace(content="first"))
+    PostService.add_comment(db, post.id, alice, SimpleNamespace(content="second"))
+    PostService.add_or_update_reaction(db, bob, ReactionType.LIKE, post_id=post.id)
+    PostService.add_or_update_reaction(db, bob, ReactionType.SAD, post_id=post.id)
+    PostService.add_or_update_reaction(db, alice, ReactionType.LIKE, post_id=post.id)
+    PostService.remove_reaction(db, alice, post_id=post.id)
+    PostService.delete_comment(db, comment.id, bob)
+
+    counters = CounterService.get_post_counters(db, [post.id])[post.id]
+
+    assert counters["commentCount"] == 1
+    assert counters["reactionSummary"]["like"] == 0
+    assert counters["reactionSummary"]["sad"] == 1
+    assert counters["reactionSummary"]["total"] == 1
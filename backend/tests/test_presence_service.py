@@ -0,0 +1,93 @@
+import asyncio
+import json
+
+from services.backplane import InMemoryBackplane
+from services.presence_service import PresenceService
+from services.websocket_manager import manager
+
+
+class FakeSocket:
+    def __init__(self):
+        self.events = []
+
+    async def send_text(self, data: str):
+        self.events.append(json.loads(data))
+
+    async def send_json(self, data: dict):
+        self.events.append(data)
+
+
+def test_presence_diffs_merge_every_worker(db, make_user, connect, monkeypatch):
+    alice, bob, carol = make_user("Alice"), make_user("Bob"), make_user("Carol")
+    connect(alice, bob)
+    connect(carol, bob)
+    monkeypatch.setattr(manager, "_handlers", {})
+
+    async def scenario():
+        await manager.start_backplane(InMemoryBackplane())
+        presence = PresenceService()
+        bob_socket, alice_socket = FakeSocket(), FakeSocket()
+
+        async def flush():
+            await presence._flush()
+            await asyncio.sleep(0)  # let the socket writers run
+
+        try:
+            await presence.connect(bob_socket, bob.id)
+            await presence.connect(alice_socket, alice.id)
+            await flush()
+            # Carol comes online on another worker
+            await manager.publish(PresenceService.SYNC_CHANNEL, {"worker": "other", "online": [carol.id], "offline": []})
+            await flush()
+            online_among = presence.online_among(db, bob.id, [alice.id, carol.id])
+            presence.disconnect(alice_socket, alice.id)
+            await flush()
+            # The other worker goes silent
+            presence._worker_seen["other"] -= PresenceService.WORKER_TIMEOUT_SECONDS + 1
+            await flush()
+            await presence.stop()
+            presence.disconnect(bob_socket, bob.id)
+            return bob_socket.events, online_among
+        finally:
+            await manager.stop_backplane()
+
+    events, online_among = asyncio.run(scenario())
+
+    assert sorted(online_among) == sorted([alice.id, carol.id])
+    assert events == [
+        {"type": "presence", "online": [], "offline": []},
+        {"type": "presence", "online": [alice.id], "offline": []},
+        {"type": "presence", "online": [carol.id], "offline": []},
+        {"type": "presence", "online": [], "offline": [alice.id]},
+        {"type": "presence", "online": [], "offline": [carol.id]},
+    ]
+
+
+def test_reconnect_within_an_interval_sends_nothing(db, make_user, connect, monkeypatch):
+    alice, bob = make_user("Alice"), make_user("Bob")
+    connect(alice, bob)
+    monkeypatch.setattr(manager, "_handlers", {})
+
+    async def scenario():
+        await manager.start_backplane(InMemoryBackplane())
+        presence = PresenceService()
+        bob_socket, alice_tab, alice_new_tab = FakeSocket(), FakeSocket(), FakeSocket()
+        try:
+            await presence.connect(bob_socket, bob.id)
+            await presence.connect(alice_tab, alice.id)
+            await presence._flush()
+            presence.disconnect(alice_tab, alice.id)
+            await presence.connect(alice_new_tab, alice.id)
+            await presence._flush()
+            await asyncio.sleep(0)
+            await presence.stop()
+            return bob_socket.events
+        finally:
+            await manager.stop_backplane()
+
+    events = asyncio.run(scenario())
+
+    assert events == [
+        {"type": "presence", "online": [], "offline": []},
+        {"type": "presence", "online": [alice.id], "offline": []},
+    ]
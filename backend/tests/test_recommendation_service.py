@@ -0,0 +1,27 @@
+from services import recommendation_service
+from services.connection_service import ConnectionService
+from services.recommendation_service import PeopleRecommender
+from services.social_graph import SocialGraph
+
+
+def test_suggestions_rank_by_mutual_connections_and_skip_existing_pairs(db, make_user, connect, monkeypatch):
+    monkeypatch.setattr(recommendation_service, "social_graph", SocialGraph(reload_seconds=300))
+    alice, bob, carol, dave, erin, frank = (
+        make_user(name) for name in ("Alice", "Bob", "Carol", "Dave", "Erin", "Frank")
+    )
+    for user in (alice, bob, carol, dave, erin, frank):
+        user.profile_completed = True
+    db.commit()
+    connect(alice, bob)
+    connect(alice, erin)
+    connect(bob, carol)
+    connect(erin, carol)
+    connect(bob, dave)
+    connect(bob, frank)
+    ConnectionService.send_request(db, alice, frank.id)
+
+    suggestions = PeopleRecommender().suggest(db, alice.id)
+
+    assert [item["userId"] for item in suggestions] == [carol.id, dave.id]
+    assert [item["mutualCount"] for item in suggestions] == [2, 1]
+    assert suggestions[0]["reasons"] == ["mutual_connections"]
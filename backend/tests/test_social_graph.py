@@ -0,0 +1,67 @@
+import threading
+
+from models.connection import Connection
+from services.social_graph import SocialGraph
+
+
+def _wait_for_reload(graph):
+    with graph._load_lock:
+        pass
+
+
+def test_events_do_not_take_the_lock(db, make_user):
+    alice, bob = make_user("Alice"), make_user("Bob")
+    graph = SocialGraph(reload_seconds=300)
+    graph.neighbors(db, alice.id)
+
+    done = threading.Event()
+    with graph._lock:
+        worker = threading.Thread(target=lambda: (graph.add_edge(alice.id, bob.id), done.set()))
+        worker.start()
+        assert done.wait(1), "add_edge blocked on the graph lock"
+    worker.join()
+
+    assert graph.neighbors(db, alice.id) == {bob.id}
+
+
+def test_stale_graph_reloads_in_the_background(db, make_user, connect):
+    alice, bob, carol = make_user("Alice"), make_user("Bob"), make_user("Carol")
+    connect(alice, bob)
+    graph = SocialGraph(reload_seconds=300)
+    assert graph.neighbors(db, alice.id) == {bob.id}
+
+    # Made on another worker: no event reaches this graph
+    connect(alice, carol)
+    graph.invalidate()
+    with graph._lock:
+        # The reload waits for the lock; the query that notices the stale graph answers from the current one
+        assert graph.neighbors(db, alice.id) == {bob.id}
+    _wait_for_reload(graph)
+
+    assert graph.neighbors(db, alice.id) == {bob.id, carol.id}
+
+
+def test_events_applied_during_a_reload_survive_the_swap(db, make_user, connect):
+    alice, bob, carol = make_user("Alice"), make_user("Bob"), make_user("Carol")
+    connection = connect(alice, bob)
+    graph = SocialGraph(reload_seconds=300)
+    graph.neighbors(db, alice.id)
+
+    original_csr = graph._csr
+
+    def csr_with_concurrent_events(user_ids, edges):
+        # The database was read before these writes; a query applies them to the old graph meanwhile
+        connect(alice, carol)
+        graph.add_edge(alice.id, carol.id)
+        db.query(Connection).filter(Connection.id == connection.id).delete()
+        db.commit()
+        graph.remove_edge(alice.id, bob.id)
+        with graph._lock:
+            graph._apply_events()
+        return original_csr(user_ids, edges)
+
+    graph._csr = csr_with_concurrent_events
+    graph._reload(db)
+
+    assert graph.neighbors(db, alice.id) == {carol.id}
+    assert graph.neighbors(db, bob.id) == set()
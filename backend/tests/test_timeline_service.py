@@ -0,0 +1,40 @@
+from datetime import datetime, timedelta, timezone
+
+from models.post import Post
+from services.timeline_service import TimelineService
+
+
+def _post(db, author, minutes_ago, is_public=False):
+    post = Post(
+        content="post", isPublic=is_public, userId=author.id,
+        timestamp=datetime.now(timezone.utc) - timedelta(minutes=minutes_ago)
+    )
+    db.add(post)
+    db.flush()
+    return post
+
+
+def test_backfill_copies_every_post_of_the_new_connection(db, make_user):
+    alice, bob = make_user("Alice"), make_user("Bob")
+    posts = [_post(db, bob, minutes_ago=i) for i in range(250)]
+    db.commit()
+
+    TimelineService.backfill_connection(db, alice.id, bob.id)
+    db.commit()
+
+    keys = TimelineService.get_feed_page(db, alice.id, limit=1000)
+    assert {post_id for _, post_id in keys} == {post.id for post in posts}
+
+
+def test_prune_removes_the_former_connection_posts(db, make_user):
+    alice, bob = make_user("Alice"), make_user("Bob")
+    _post(db, bob, minutes_ago=1)
+    own = _post(db, alice, minutes_ago=2)
+    TimelineService.fan_out_post(db, own, [])
+    TimelineService.backfill_connection(db, alice.id, bob.id)
+    db.commit()
+
+    TimelineService.prune_connection(db, alice.id, bob.id)
+    db.commit()
+
+    assert TimelineService.get_feed_page(db, alice.id, limit=10) == [(own.timestamp, own.id)]
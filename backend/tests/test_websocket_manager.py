@@ -0,0 +1,74 @@
+import asyncio
+import json
+
+import orjson
+
+from services.backplane import InMemoryBackplane
+from services.websocket_manager import ConnectionManager, TopicSocket, encode_frame, tag_frame
+
+
+class FakeSocket:
+    def __init__(self):
+        self.events = []
+
+    async def send_text(self, data: str):
+        self.events.append(json.loads(data))
+
+    async def send_json(self, data: dict):
+        self.events.append(data)
+
+
+async def _drain():
+    # Let the writer tasks send what was queued
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+def test_stream_topics_tag_their_events():
+    manager = ConnectionManager()
+    websocket = FakeSocket()
+
+    async def scenario():
+        await manager.start_backplane(InMemoryBackplane())
+        await manager.connect(TopicSocket(websocket, "feed"), "feed", 1)
+        await manager.connect(TopicSocket(websocket, "messages_7"), "messages_7", 1)
+        await manager.broadcast_to_channel("feed", {"type": "new_post", "post_id": 3})
+        await manager.broadcast_to_user("messages_7", 1, {"type": "new_message", "seq": 1})
+        await _drain()
+
+    asyncio.run(scenario())
+
+    assert websocket.events == [
+        {"topic": "feed", "type": "new_post", "post_id": 3},
+        {"topic": "messages_7", "type": "new_message", "seq": 1},
+    ]
+
+
+def test_frames_are_encoded_once_and_tagged_without_reencoding():
+    frame = encode_frame({"type": "new_post", "post_id": 3, "text": "é"})
+
+    assert orjson.loads(frame) == {"type": "new_post", "post_id": 3, "text": "é"}
+    assert orjson.loads(tag_frame(frame, "feed")) == {"topic": "feed", "type": "new_post", "post_id": 3, "text": "é"}
+    assert orjson.loads(tag_frame(encode_frame({}), "feed")) == {"topic": "feed"}
+
+
+def test_every_device_of_a_user_gets_broadcasts():
+    manager = ConnectionManager()
+    phone, laptop = FakeSocket(), FakeSocket()
+
+    async def scenario():
+        await manager.start_backplane(InMemoryBackplane())
+        assert await manager.connect(phone, "notifications", 1)
+        assert not await manager.connect(laptop, "notifications", 1)
+        await manager.broadcast_to_user("notifications", 1, {"type": "ping", "n": 1})
+        await _drain()
+        # Closing one device leaves the other registered
+        assert not manager.disconnect(phone, "notifications", 1)
+        await manager.broadcast_to_user("notifications", 1, {"type": "ping", "n": 2})
+        await _drain()
+        assert manager.disconnect(laptop, "notifications", 1)
+
+    asyncio.run(scenario())
+
+    assert phone.events == [{"type": "ping", "n": 1}]
+    assert laptop.events == [{"type": "ping", "n": 1}, {"type": "ping", "n": 2}]
@@ -0,0 +1,80 @@
+import asyncio
+import json
+
+from routes import websocket_routes
+from routes.websocket_routes import TypingCoalescer
+from services.backplane import InMemoryBackplane
+from services.chat_service import ChatService
+from services.websocket_manager import manager
+
+
+def test_typing_is_coalesced_across_sockets_of_a_user(monkeypatch):
+    sent = []
+
+    async def record(channel, user_id, data):
+        sent.append((channel, user_id, data["is_typing"]))
+
+    monkeypatch.setattr(manager, "broadcast_to_user", record)
+
+    async def scenario():
+        first_tab = TypingCoalescer.acquire(7, 1, 2)
+        second_tab = TypingCoalescer.acquire(7, 1, 2)
+        assert first_tab is second_tab
+        await first_tab.update(True)
+        await second_tab.update(True)
+        await second_tab.update(False)
+        first_tab.release()
+        assert TypingCoalescer._active[(1, 7)] is second_tab
+        second_tab.release()
+        assert (1, 7) not in TypingCoalescer._active
+
+    asyncio.run(scenario())
+
+    # One immediate frame; the trailing "stopped" is cancelled with the last socket
+    assert sent == [("messages_7", 2, True)]
+
+
+class FakeSocket:
+    def __init__(self):
+        self.events = []
+
+    async def send_text(self, data: str):
+        self.events.append(json.loads(data))
+
+    async def send_json(self, data: dict):
+        self.events.append(data)
+
+
+def test_live_messages_wait_for_the_gap_replay(db, make_user, monkeypatch):
+    alice, bob = make_user("Alice"), make_user("Bob")
+    first = ChatService.send_message(db, alice, bob.id, "missed")
+    chat_id = first.chatId
+    replay = websocket_routes.replay_missed_messages
+    calls = []
+
+    async def replay_with_live_message(websocket, chat_id, since_seq):
+        calls.append(since_seq)
+        if len(calls) == 2:
+            # Broadcast while the gap replay is still running
+            await manager.broadcast_to_user(f"messages_{chat_id}", bob.id, {"type": "new_message", "seq": 99})
+        return await replay(websocket, chat_id, since_seq)
+
+    monkeypatch.setattr(websocket_routes, "replay_missed_messages", replay_with_live_message)
+
+    async def scenario():
+        await manager.start_backplane(InMemoryBackplane())
+        socket = FakeSocket()
+        try:
+            await websocket_routes.join_chat(socket, chat_id, bob.id, since_seq=0)
+            for _ in range(5):
+                await asyncio.sleep(0)  # let the socket writer run
+            manager.disconnect(socket, f"messages_{chat_id}", bob.id)
+            return socket.events
+        finally:
+            await manager.stop_backplane()
+
+    events = asyncio.run(scenario())
+
+    assert [(event["type"], event.get("seq")) for event in events] == [
+        ("new_message", first.seq), ("replay_complete", first.seq), ("new_message", 99)
+    ]
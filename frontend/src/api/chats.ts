@@ -31,8 +31,9 @@ export const chatsApi = {
     return response.data;
   },
 
-  getMessages: async (id: number): Promise<Message[]> => {
-    const response = await apiClient.get(`/chats/${id}/messages`);
+  // One page of history, oldest first: the latest page, or the page before message `before`
+  getMessages: async (id: number, params?: { before?: number; limit?: number }): Promise<Message[]> => {
+    const response = await apiClient.get(`/chats/${id}/messages`, { params });
     return response.data;
   },
 
@@ -16,6 +16,12 @@ import { transformUrl } from "@/lib/url-utils";
 import { useWebSocketChat } from "@/hooks/use-websocket-hooks";
 import { useTranslation } from "react-i18next";
 
+// Messages per history request; matches the server's default page size
+const MESSAGES_PAGE_SIZE = 50;
+
+const byTimestamp = (a: Message, b: Message) =>
+  new Date(a.timestamp).getTime() - new Date(b.timestamp).getTime();
+
 interface ChatThreadProps {
   chat: Chat | null;
   onChatUpdated: (chat: Chat) => void;
@@ -30,6 +36,8 @@ export function ChatThread({ chat, onChatUpdated }: ChatThreadProps) {
   const [messageInput, setMessageInput] = useState("");
   const [attachmentUrl, setAttachmentUrl] = useState("");
   const [isLoading, setIsLoading] = useState(false);
+  const [hasOlder, setHasOlder] = useState(false);
+  const [isLoadingOlder, setIsLoadingOlder] = useState(false);
   const [isSending, setIsSending] = useState(false);
   const [previewImage, setPreviewImage] = useState<string | null>(null);
   const [shouldAutoScroll, setShouldAutoScroll] = useState(true);
@@ -59,10 +67,7 @@ export function ChatThread({ chat, onChatUpdated }: ChatThreadProps) {
 
         // Keep messages sorted by timestamp
         const updated = [...prev, newMsg];
-        return updated.sort(
-          (a, b) =>
-            new Date(a.timestamp).getTime() - new Date(b.timestamp).getTime(),
-        );
+        return updated.sort(byTimestamp);
       });
       setShouldAutoScroll(true);
 
@@ -144,13 +149,22 @@ export function ChatThread({ chat, onChatUpdated }: ChatThreadProps) {
       if (showLoading) {
         setIsLoading(true);
       }
-      const data = await chatsApi.getMessages(chat.id);
+      const data = await chatsApi.getMessages(chat.id, {
+        limit: MESSAGES_PAGE_SIZE,
+      });
       // Sort messages by timestamp to ensure chronological order
-      const sortedData = data.sort(
-        (a, b) =>
-          new Date(a.timestamp).getTime() - new Date(b.timestamp).getTime(),
-      );
-      setMessages(sortedData);
+      const sortedData = data.sort(byTimestamp);
+      if (showLoading) {
+        setMessages(sortedData);
+        setHasOlder(data.length === MESSAGES_PAGE_SIZE);
+      } else {
+        // Refresh the latest page but keep older pages already loaded
+        const oldestId = sortedData.length ? sortedData[0].id : Infinity;
+        setMessages((prev) => [
+          ...prev.filter((msg) => msg.id < oldestId),
+          ...sortedData,
+        ]);
+      }
 
       // Check if there are any unread messages from the other user
       const hasUnread = data.some(
@@ -178,6 +192,32 @@ export function ChatThread({ chat, onChatUpdated }: ChatThreadProps) {
     }
   };
 
+  const loadOlderMessages = async () => {
+    if (!chat || messages.length === 0) return;
+    const container = scrollContainerRef.current;
+    const previousHeight = container?.scrollHeight ?? 0;
+    try {
+      setIsLoadingOlder(true);
+      setShouldAutoScroll(false);
+      const older = await chatsApi.getMessages(chat.id, {
+        before: messages[0].id,
+        limit: MESSAGES_PAGE_SIZE,
+      });
+      setHasOlder(older.length === MESSAGES_PAGE_SIZE);
+      setMessages((prev) => [...older.sort(byTimestamp), ...prev]);
+      // Keep the messages that were on screen in place
+      requestAnimationFrame(() => {
+        if (container) {
+          container.scrollTop += container.scrollHeight - previousHeight;
+        }
+      });
+    } catch (error) {
+      console.error("Failed to load older messages:", error);
+    } finally {
+      setIsLoadingOlder(false);
+    }
+  };
+
   const handleSendMessage = async (e: React.FormEvent) => {
     e.preventDefault();
     if (!chat || !currentUser) return;
@@ -321,6 +361,21 @@ export function ChatThread({ chat, onChatUpdated }: ChatThreadProps) {
                 className="flex-1 overflow-y-auto"
               >
                 <div className="p-4 space-y-4">
+                  {hasOlder && (
+                    <div className="flex justify-center">
+                      <Button
+                        variant="ghost"
+                        size="sm"
+                        onClick={loadOlderMessages}
+                        disabled={isLoadingOlder}
+                      >
+                        {isLoadingOlder && (
+                          <Loader2 className="h-4 w-4 mr-2 animate-spin" />
+                        )}
+                        {t("chats.loadOlder")}
+                      </Button>
+                    </div>
+                  )}
                   {messages.length === 0 ? (
                     <p className="text-center text-muted-foreground py-8">
                       No messages yet. Start the conversation!
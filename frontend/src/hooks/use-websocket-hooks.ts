@@ -117,15 +117,14 @@ export function useWebSocketFeed(
 }
 
 export function useWebSocketOnline(
-  onUserOnline?: (userId: number, fullName: string) => void,
+  onUserOnline?: (userId: number) => void,
   onUserOffline?: (userId: number) => void
 ) {
   const handleOnlineMessage = useCallback((message: any) => {
-    if (message.type === 'user_online' && onUserOnline) {
-      onUserOnline(message.user_id, message.full_name);
-    } else if (message.type === 'user_offline' && onUserOffline) {
-      onUserOffline(message.user_id);
-    }
+    // Presence arrives as batched diffs limited to the user's connections
+    if (message.type !== 'presence') return;
+    if (onUserOnline) message.online.forEach((userId: number) => onUserOnline(userId));
+    if (onUserOffline) message.offline.forEach((userId: number) => onUserOffline(userId));
   }, [onUserOnline, onUserOffline]);
 
   const { send, isConnected } = useWebSocket(